@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the alpha-beta AI player of the morpion site (websites/morpion/model/ai_player.py).
+
+Builds random teams and mid-game positions (deterministic for a given seed, reached by greedy play),
+lets the AI choose a move in each of them, and reports per grid size: nodes searched per second,
+depth reached within the time budget and time per move. With --games, also plays full games
+of the AI against the greedy player and reports its score.
+
+Example:
+    python bench/bench_ai.py --time-budget 0.5 --positions 20
+    python bench/bench_ai.py --depth 3 --grid-sizes 3 --games 50
+"""
+
+import argparse
+import random
+import statistics
+import sys
+from os import path
+
+from logzero import logger
+
+ROOT_DIR = path.dirname(path.dirname(path.abspath(__file__)))  # root of the repository (where server.py is)
+sys.path.append(path.join(ROOT_DIR, 'websites', 'morpion'))  # models of the morpion site (package model)
+
+from model.game_engine import GameState, greedy_player, play_game  # noqa: E402
+from model.ai_player import SearchPlayer  # noqa: E402
+
+
+def random_team(rng, size):
+    """
+    Build a random team of morpions whose characteristics (each >= 1) sum to 15, as in the morpion site
+    Returns: a tuple of morpions (hp, attack, mana, accuracy)
+    """
+    team = []
+    for _ in range(size):
+        cuts = sorted(rng.sample(range(1, 15), 3))
+        team.append((cuts[0], cuts[1] - cuts[0], cuts[2] - cuts[1], 15 - cuts[2]))
+    return tuple(team)
+
+
+def random_position(rng, grid_size, max_turns):
+    """
+    Build a mid-game position: random teams, then a few turns of greedy play
+    Returns: a GameState which is not finished
+    """
+    while True:
+        state = GameState(random_team(rng, rng.randint(6, 8)), random_team(rng, rng.randint(6, 8)), grid_size, max_turns)
+        for _ in range(rng.randrange(2, 2 * grid_size + 2)):
+            state.step(greedy_player(state, rng), rng)
+            if state.finished:
+                break
+        if not state.finished:
+            return state
+
+
+def bench_positions(player, grid_size, args):
+    """
+    Let the AI choose a move in args.positions random positions on a grid_size grid
+    Returns: a dict of statistics
+    """
+    rng = random.Random(f"{args.seed}-{grid_size}")
+    nodes = depths = 0
+    durations = []
+    for _ in range(args.positions):
+        state = random_position(rng, grid_size, args.max_turns)
+        player.table.clear()
+        player(state)
+        nodes += player.stats["nodes"]
+        depths += player.stats["depth"]
+        durations.append(player.stats["duration"])
+    total = sum(durations)
+    return {"nodes/s": nodes / total if total else 0.0, "depth": depths / args.positions,
+            "ms/move": 1000 * statistics.mean(durations), "max ms/move": 1000 * max(durations)}
+
+
+def bench_games(player, grid_size, args):
+    """
+    Play args.games full games of the AI against the greedy player, each side starting half of the games
+    Returns: the score of the AI (1 point per win, 0.5 per draw) divided by the number of games
+    """
+    rng = random.Random(f"{args.seed}-games-{grid_size}")
+    score = 0.0
+    for game_no in range(args.games):
+        side = game_no % 2
+        players = (player, greedy_player) if side == 0 else (greedy_player, player)
+        state = play_game(random_team(rng, rng.randint(6, 8)), random_team(rng, rng.randint(6, 8)), grid_size, args.max_turns, rng, players)
+        score += 0.5 if state.winner is None else float(state.winner == side)
+    return score / args.games
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark of the morpion AI player")
+    parser.add_argument('--time-budget', default=0.5, type=float, help='thinking time per move in seconds (default 0.5, 0: no limit)')
+    parser.add_argument('--depth', type=int, help='maximum search depth (default: no limit, see --time-budget)')
+    parser.add_argument('--grid-sizes', default='3,4', help='comma-separated grid sizes (default 3,4)')
+    parser.add_argument('--max-turns', default=20, type=int, help='maximum number of turns of a game (default 20)')
+    parser.add_argument('--positions', default=10, type=int, help='number of positions searched per grid size (default 10)')
+    parser.add_argument('--games', default=0, type=int, help='number of games played against the greedy player per grid size (default 0)')
+    parser.add_argument('--seed', default=42, type=int, help='seed of the teams and positions (default 42)')
+    args = parser.parse_args()
+    time_budget = args.time_budget or None
+    if time_budget is None and args.depth is None:
+        parser.error("--depth is required without time budget")
+    player = SearchPlayer(time_budget=time_budget, max_depth=args.depth)
+    for grid_size in (int(size) for size in args.grid_sizes.split(',')):
+        stats = bench_positions(player, grid_size, args)
+        logger.info(f"{grid_size}x{grid_size}: {stats['nodes/s']:.0f} nodes/s, depth {stats['depth']:.1f}, "
+                    f"{stats['ms/move']:.1f} ms/move (max {stats['max ms/move']:.1f})")
+        if args.games:
+            logger.info(f"{grid_size}x{grid_size}: score against greedy {bench_games(player, grid_size, args):.2f} over {args.games} games")
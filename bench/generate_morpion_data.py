@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Synthetic data generator for the morpion schema (others/morpions.sql).
+
+Generates teams, team compositions, games and log lines at a configurable scale, respecting the constraints of the
+schema (stats >= 1 with sum = 15, unique colors, 6 to 8 distinct morpions per team, team1 <> team2,
+winner in {team1, team2} or NULL, (game_id, num) unique). Rows are streamed with COPY by parallel worker processes,
+each one with its own connection; a chunk of games and its log lines are loaded in one transaction.
+Generation is deterministic for a given seed and a given initial content of the tables.
+
+Example:
+    python bench/generate_morpion_data.py --pg-database bench --schema morpion --truncate --teams 100000 --games 10000000 --logs 100000000 --workers 8
+"""
+
+import argparse
+import io
+import os
+import random
+import sys
+from datetime import date, datetime, timedelta
+from multiprocessing import Pool
+from time import perf_counter
+
+import psycopg
+from psycopg import sql
+from logzero import logger
+
+MAX_COLORS = 0xFFFFFF  # colors of generated teams are '#rrggbb' strings (unique by construction)
+MESSAGES = (
+    "L'équipe {t} place un morpion en {c}",
+    "L'équipe {t} attaque le morpion adverse en {c}",
+    "L'équipe {t} lance un sort depuis {c}",
+    "L'équipe {t} rate son attaque en {c}",
+    "Le morpion de l'équipe {t} en {c} est éliminé",
+)
+COPY_BATCH = 10000  # rows written to COPY in one call
+NULL = '\\N'  # NULL in the COPY text format
+
+_worker = dict()  # state of a worker process (connection and shared data), set by init_worker
+
+
+def morpion_stats(rng):
+    """
+    Draw the 4 stats of a morpion: each stat >= 1, and hp + attack + mana + accuracy = 15
+    Returns: a tuple (hp, attack, mana, accuracy)
+    """
+    cuts = sorted(rng.sample(range(1, 15), 3))  # 3 distinct cut points in 1..14 split 15 into 4 positive parts
+    return cuts[0], cuts[1] - cuts[0], cuts[2] - cuts[1], 15 - cuts[2]
+
+
+def timestamp_text(moment):
+    """
+    Format a datetime for the COPY text format
+    """
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def copy_lines(cursor, copy_query, lines):
+    """
+    Stream rows (lines in COPY text format) to a COPY ... FROM STDIN query, in batches
+    """
+    with cursor.copy(copy_query) as copy:
+        buffer = io.StringIO()
+        for i, line in enumerate(lines, 1):
+            buffer.write(line)
+            if i % COPY_BATCH == 0:
+                copy.write(buffer.getvalue())
+                buffer = io.StringIO()
+        copy.write(buffer.getvalue())
+
+
+def init_worker(db_params, schema, shared):
+    """
+    Initializer of a worker process: open its own connection and keep the data shared by all tasks
+    """
+    _worker['connexion'] = connect(db_params, schema)
+    _worker.update(shared)
+
+
+def connect(db_params, schema):
+    """
+    Open a connection using the given schema
+    Returns: a psycopg connection
+    """
+    connexion = psycopg.connect(**db_params)
+    connexion.execute(sql.SQL("SET search_path TO {}").format(sql.Identifier(schema)))
+    connexion.commit()
+    return connexion
+
+
+def generate_teams(task):
+    """
+    Task: generate the teams with ids in [start, end) and their compositions (6 to 8 distinct morpions)
+    Returns: number of teams generated
+    """
+    start, end, seed = task
+    rng = random.Random(f"{seed}-teams-{start}")
+    morpion_ids = _worker['morpion_ids']
+    first_day, nb_days = _worker['first_day'], _worker['nb_days']
+    teams = list()
+    compositions = list()
+    for id_team in range(start, end):
+        created = first_day + timedelta(days=rng.randrange(nb_days))
+        teams.append(f"{id_team}\tÉquipe {id_team}\t#{id_team:06x}\t{created.isoformat()}\n")
+        for morpion_id in rng.sample(morpion_ids, rng.randint(6, 8)):
+            compositions.append(f"{id_team}\t{morpion_id}\n")
+    connexion = _worker['connexion']
+    with connexion.cursor() as cursor:
+        copy_lines(cursor, "COPY team (id_team, name, color, created_at) FROM STDIN", teams)
+        copy_lines(cursor, "COPY team_morpion (team_id, morpion_id) FROM STDIN", compositions)
+    connexion.commit()
+    return end - start
+
+
+def generate_games(task):
+    """
+    Task: generate the games with ids in [start, end) and their log lines, in one transaction
+    Returns: (number of games, number of log lines) generated
+    """
+    start, end, seed = task
+    rng = random.Random(f"{seed}-games-{start}")
+    team_ids, team_created = _worker['team_ids'], _worker['team_created']
+    config_ids, avg_logs, now = _worker['config_ids'], _worker['avg_logs'], _worker['now']
+    games = list()
+    logs = list()
+    for id_game in range(start, end):
+        i1, i2 = rng.sample(range(len(team_ids)), 2)  # two different teams
+        team1, team2 = team_ids[i1], team_ids[i2]
+        not_before = datetime.combine(max(team_created[i1], team_created[i2]), datetime.min.time())  # a team plays after its creation
+        started = not_before + timedelta(seconds=rng.randrange(max(1, int((now - not_before).total_seconds()))))
+        duration = timedelta(seconds=rng.randint(60, 3600))
+        if rng.random() < 0.05:  # game in progress
+            ended, winner = None, None
+        else:
+            ended = started + duration
+            winner = None if rng.random() < 0.1 else rng.choice((team1, team2))  # draw or one of the two teams
+        ended_text = timestamp_text(ended) if ended else NULL
+        winner_text = winner if winner else NULL
+        games.append(f"{id_game}\t{team1}\t{team2}\t{rng.choice(config_ids)}\t{timestamp_text(started)}\t{ended_text}\t{winner_text}\n")
+        nb_logs = rng.randint(1, 2 * avg_logs - 1) if avg_logs > 1 else avg_logs
+        step = duration / max(1, nb_logs)
+        for num in range(1, nb_logs + 1):
+            message = rng.choice(MESSAGES).format(t=rng.choice((team1, team2)), c=f"{rng.randrange(4)},{rng.randrange(4)}")
+            logs.append(f"{id_game}\t{num}\t{timestamp_text(started + step * (num - 1))}\t{message}\n")
+    connexion = _worker['connexion']
+    with connexion.cursor() as cursor:
+        copy_lines(cursor, "COPY game (id_game, team1_id, team2_id, config_id, started_at, ended_at, winner_team_id) FROM STDIN", games)
+        copy_lines(cursor, "COPY logs_entry (game_id, num, created_at, message) FROM STDIN", logs)
+    connexion.commit()
+    return end - start, len(logs)
+
+
+def chunks(start, end, chunk_size, seed):
+    """
+    Split the id range [start, end) into tasks of chunk_size ids
+    Returns: a list of (start, end, seed)
+    """
+    return [(s, min(s + chunk_size, end), seed) for s in range(start, end, chunk_size)]
+
+
+def prepare_reference_data(connexion, args, rng):
+    """
+    Make sure morpions and configs exist (generated when the tables are empty), and return their ids
+    Returns: (list of morpion ids, list of config ids)
+    """
+    with connexion.cursor() as cursor:
+        cursor.execute("SELECT id_morpion FROM morpion ORDER BY id_morpion")
+        morpion_ids = [row[0] for row in cursor.fetchall()]
+        if not morpion_ids:
+            rows = [(f"Morpion {i}", f"t{(i - 1) % 16 + 1}.png", *morpion_stats(rng)) for i in range(1, args.morpions + 1)]
+            cursor.executemany("INSERT INTO morpion (name, image_url, hp, attack, mana, accuracy) VALUES (%s, %s, %s, %s, %s, %s)", rows)
+            cursor.execute("SELECT id_morpion FROM morpion ORDER BY id_morpion")
+            morpion_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT id_config FROM config ORDER BY id_config")
+        config_ids = [row[0] for row in cursor.fetchall()]
+        if not config_ids:
+            rows = [(rng.choice((3, 4)), rng.randint(10, 40)) for _ in range(args.configs)]
+            cursor.executemany("INSERT INTO config (grid_size, max_turns) VALUES (%s, %s)", rows)
+            cursor.execute("SELECT id_config FROM config ORDER BY id_config")
+            config_ids = [row[0] for row in cursor.fetchall()]
+    connexion.commit()
+    if len(morpion_ids) < 8:
+        raise ValueError(f"Au moins 8 morpions sont nécessaires pour composer les équipes ({len(morpion_ids)} en base)")
+    return morpion_ids, config_ids
+
+
+def max_id(connexion, table, column):
+    """
+    Current maximum id of a table (0 if empty)
+    """
+    query = sql.SQL("SELECT COALESCE(MAX({}), 0) FROM {}").format(sql.Identifier(column), sql.Identifier(table))
+    with connexion.cursor() as cursor:
+        cursor.execute(query)
+        return cursor.fetchone()[0]
+
+
+def run_tasks(pool, function, tasks, label):
+    """
+    Run tasks in the worker pool and log the progress
+    Returns: the list of task results
+    """
+    results = list()
+    started = perf_counter()
+    for i, result in enumerate(pool.imap_unordered(function, tasks), 1):
+        results.append(result)
+        if i % max(1, len(tasks) // 20) == 0 or i == len(tasks):
+            logger.info(f"{label} : {i}/{len(tasks)} lots ({perf_counter() - started:.1f}s)")
+    return results
+
+
+def generate(db_params, schema, args):
+    """
+    Generate the data: reference data, then teams (with compositions), then games (with logs), in parallel
+    args: namespace with teams, games, logs, morpions, configs, years, workers, chunk_size, seed, truncate (see the options of the script)
+    Returns: a dict with the number of generated rows per table
+    """
+    rng = random.Random(f"{args.seed}-reference")
+    connexion = connect(db_params, schema)
+    if args.truncate:
+        logger.info("Vidage des tables du schéma morpion")
+        connexion.execute("TRUNCATE logs_entry, game, team_morpion, team, config, morpion RESTART IDENTITY CASCADE")
+        connexion.commit()
+    morpion_ids, config_ids = prepare_reference_data(connexion, args, rng)
+    first_team = max_id(connexion, 'team', 'id_team') + 1
+    if first_team + args.teams > MAX_COLORS:
+        raise ValueError(f"Au plus {MAX_COLORS} équipes peuvent être générées (couleurs uniques)")
+    today = date.today()
+    shared = {'morpion_ids': morpion_ids, 'config_ids': config_ids, 'first_day': today - timedelta(days=365 * args.years), 'nb_days': 365 * args.years,
+              'avg_logs': max(1, round(args.logs / args.games)) if args.games else 0, 'now': datetime.now()}
+    generated = {'team': 0, 'game': 0, 'logs_entry': 0}
+    with Pool(args.workers, initializer=init_worker, initargs=(db_params, schema, shared)) as pool:
+        if args.teams:
+            generated['team'] = sum(run_tasks(pool, generate_teams, chunks(first_team, first_team + args.teams, args.chunk_size, args.seed), "Équipes"))
+    with connexion.cursor() as cursor:
+        cursor.execute("SELECT id_team, created_at FROM team ORDER BY id_team")
+        teams = cursor.fetchall()
+    if args.games and len(teams) < 2:
+        raise ValueError("Au moins 2 équipes sont nécessaires pour générer des parties")
+    shared.update({'team_ids': [t[0] for t in teams], 'team_created': [t[1] for t in teams]})
+    first_game = max_id(connexion, 'game', 'id_game') + 1
+    if args.games:
+        with Pool(args.workers, initializer=init_worker, initargs=(db_params, schema, shared)) as pool:
+            results = run_tasks(pool, generate_games, chunks(first_game, first_game + args.games, max(1, args.chunk_size // max(1, shared['avg_logs'])), args.seed), "Parties")
+        generated['game'] = sum(r[0] for r in results)
+        generated['logs_entry'] = sum(r[1] for r in results)
+    # ids were given explicitly: move the sequences after them, then refresh the planner statistics
+    for table, column in (('team', 'id_team'), ('game', 'id_game')):
+        connexion.execute(sql.SQL("SELECT setval(pg_get_serial_sequence({}, {}), GREATEST((SELECT MAX({}) FROM {}), 1))").format(
+            sql.Literal(table), sql.Literal(column), sql.Identifier(column), sql.Identifier(table)))
+    connexion.commit()
+    connexion.autocommit = True
+    connexion.execute("ANALYZE team, team_stats, team_morpion, game, logs_entry")
+    connexion.close()
+    return generated
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Synthetic data generator for the morpion schema")
+    parser.add_argument('--pg-host', default='localhost', help='PostgreSQL server (default localhost)')
+    parser.add_argument('--pg-port', default=5432, type=int, help='PostgreSQL port (default 5432)')
+    parser.add_argument('--pg-user', default=os.environ.get('PGUSER', 'postgres'), help='PostgreSQL user (default $PGUSER or postgres)')
+    parser.add_argument('--pg-password', default=os.environ.get('PGPASSWORD', ''), help='PostgreSQL password (default $PGPASSWORD)')
+    parser.add_argument('--pg-database', default='bench', help='PostgreSQL database (default bench)')
+    parser.add_argument('--schema', default='morpion', help='schema containing the morpion tables (default morpion)')
+    parser.add_argument('--teams', default=1000, type=int, help='number of teams to generate (default 1000)')
+    parser.add_argument('--games', default=10000, type=int, help='number of games to generate (default 10000)')
+    parser.add_argument('--logs', default=100000, type=int, help='approximate number of log lines to generate (default 100000)')
+    parser.add_argument('--morpions', default=16, type=int, help='number of morpions generated if the table is empty (default 16)')
+    parser.add_argument('--configs', default=10, type=int, help='number of configs generated if the table is empty (default 10)')
+    parser.add_argument('--years', default=3, type=int, help='period (in years, until today) over which dates are spread (default 3)')
+    parser.add_argument('--workers', default=os.cpu_count() or 1, type=int, help='number of worker processes (default: number of CPUs)')
+    parser.add_argument('--chunk-size', default=50000, type=int, help='number of rows loaded per task and transaction (default 50000)')
+    parser.add_argument('--seed', default=42, type=int, help='seed of the random generator (default 42)')
+    parser.add_argument('--truncate', action='store_true', help='empty the morpion tables (and restart ids) before generating')
+    args = parser.parse_args()
+    db_params = dict(host=args.pg_host, port=args.pg_port, user=args.pg_user, password=args.pg_password, dbname=args.pg_database)
+    started = perf_counter()
+    try:
+        generated = generate(db_params, args.schema, args)
+    except (ValueError, psycopg.Error) as e:
+        logger.error(e)
+        sys.exit(1)
+    logger.info(f"Génération terminée en {perf_counter() - started:.1f}s : " + ', '.join(f"{nb} {table}" for table, nb in generated.items()))
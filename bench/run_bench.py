@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the websites served by server.py.
+
+Boots server.py on a website against a PostgreSQL database (optionally loaded with the fixtures of the site),
+sends concurrent requests to each route of routes.toml (scenarios in bench/scenarios.toml), and reports per route:
+throughput, latency percentiles, database queries per request (Server-Timing header) and peak RSS of the server.
+Results are saved as JSON, and can be compared with a previous run (exit code 1 on regression).
+
+Example:
+    python bench/run_bench.py morpion --pg-database bench --load-fixtures --concurrency 8 --requests 500 --output bench/results/morpion.json
+    python bench/run_bench.py morpion --pg-database bench --load-fixtures --generate --gen-teams 100000 --gen-games 1000000 --gen-logs 10000000
+    python bench/run_bench.py morpion --pg-database bench --baseline bench/results/morpion.json --max-regression 0.15
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import tomllib
+from datetime import datetime
+from os import path
+from time import monotonic, perf_counter, sleep
+from urllib.parse import urlencode
+
+import psycopg
+from psycopg import sql
+from logzero import logger
+
+from generate_morpion_data import generate
+
+ROOT_DIR = path.dirname(path.dirname(path.abspath(__file__)))  # root of the repository (where server.py is)
+SCENARIOS_FILE = path.join(ROOT_DIR, 'bench', 'scenarios.toml')
+SERVER_TIMING_DB = re.compile(r'db;dur=([0-9.]+);desc="(\d+) queries"')
+PERCENTILES = (50, 90, 95, 99)
+
+
+def load_toml(file_path):
+    """
+    Load a TOML file
+    Returns: a dict
+    """
+    with open(file_path, 'rb') as f:
+        return tomllib.load(f)
+
+
+def build_requests(site, scenario):
+    """
+    Build the list of requests to send: requests of the scenario, plus a GET for each route of routes.toml which is neither requested nor skipped
+    (routes with parameters or not accepting GET need a scenario)
+    site: name of the website (directory in websites/)
+    scenario: dict of the site in scenarios.toml
+    Returns: a list of dicts {name, route, method, path, form}
+    """
+    requests = list()
+    for r in scenario.get('requests', []):
+        requests.append({'name': r['name'], 'route': r.get('route'), 'method': r.get('method', 'GET').upper(), 'path': r['path'], 'form': r.get('form')})
+    covered = {r['route'] for r in requests} | set(scenario.get('skip', []))
+    routes = load_toml(path.join(ROOT_DIR, 'websites', site, 'routes.toml'))['routes']
+    for route in routes:
+        if route['url'] not in covered and '<' not in route['url'] and 'GET' in [m.upper() for m in route.get('methods', ['GET'])]:
+            requests.append({'name': route['url'] or 'accueil', 'route': route['url'], 'method': 'GET', 'path': '/' + route['url'], 'form': None})
+    return requests
+
+
+def load_fixtures(db_params, scenario):
+    """
+    Load the SQL scripts of the scenario into the database (tables are dropped and re-created by the scripts)
+    """
+    with psycopg.connect(**db_params, autocommit=True) as connexion:
+        if scenario.get('create_schema'):
+            connexion.execute(sql.SQL("CREATE SCHEMA IF NOT EXISTS {}").format(sql.Identifier(scenario['schema'])))
+        for fixture in scenario.get('fixtures', []):
+            logger.info(f"Chargement de {fixture}")
+            with open(path.join(ROOT_DIR, fixture), encoding='utf-8') as infile:
+                connexion.execute(infile.read())  # no parameters: the whole script is sent at once
+
+
+def write_config(args):
+    """
+    Write a temporary database config file for server.py
+    Returns: the file path
+    """
+    fd, config_path = tempfile.mkstemp(suffix='.toml', prefix='bench-config-')
+    with os.fdopen(fd, 'w') as f:
+        for key, value in (('POSTGRESQL_SERVER', args.pg_host), ('POSTGRESQL_USER', args.pg_user), ('POSTGRESQL_PASSWORD', args.pg_password), ('POSTGRESQL_DATABASE', args.pg_database)):
+            f.write(f"{key} = {json.dumps(value)}\n")
+        f.write(f"POSTGRESQL_PORT = {args.pg_port}\n")
+    return config_path
+
+
+def start_server(site, schema, config_path, args):
+    """
+    Start server.py on the website and wait until it accepts connections
+    Returns: the subprocess.Popen object
+    """
+    command = [sys.executable, path.join(ROOT_DIR, 'server.py'), path.join('websites', site), '-c', config_path, '-s', schema, '-p', str(args.port), '-w', str(args.workers)]
+    server = subprocess.Popen(command, cwd=ROOT_DIR, stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL)
+    deadline = monotonic() + args.startup_timeout
+    while monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"server.py s'est arrêté au démarrage (code {server.returncode})")
+        try:
+            socket.create_connection(('127.0.0.1', args.port), timeout=1).close()
+            return server
+        except OSError:
+            sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"server.py n'écoute pas sur le port {args.port} après {args.startup_timeout}s")
+
+
+def stop_server(server):
+    """
+    Stop server.py (and its workers in pre-fork mode)
+    """
+    server.terminate()
+    try:
+        server.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+def server_pids(pid):
+    """
+    List the processes of the server: the main process and its children (workers in pre-fork mode)
+    Returns: a list of pids (Linux only, empty list elsewhere)
+    """
+    pids = [pid]
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                pids.extend(int(child) for child in f.read().split())
+    except OSError:
+        return []
+    return pids
+
+
+def reset_peak_rss(pids):
+    """
+    Reset the peak RSS (VmHWM) of the server processes, so the next measure only covers the current route
+    """
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/clear_refs", 'w') as f:
+                f.write('5')
+        except OSError:
+            pass
+
+
+def peak_rss_kb(pids):
+    """
+    Sum of the peak RSS (VmHWM, in kB) of the server processes
+    Returns: an integer, or None if not available
+    """
+    total = None
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        total = (total or 0) + int(line.split()[1])
+        except OSError:
+            pass
+    return total
+
+
+def send_request(connexion, request):
+    """
+    Send one request on a persistent connection
+    Returns: (status code, latency in seconds, database time in ms or None, number of queries or None)
+    """
+    body = None
+    headers = dict()
+    if request['form'] is not None:
+        body = urlencode(request['form'], doseq=True)
+        headers['Content-Type'] = 'application/x-www-form-urlencoded'
+    started = perf_counter()
+    connexion.request(request['method'], request['path'], body=body, headers=headers)
+    response = connexion.getresponse()
+    response.read()
+    latency = perf_counter() - started
+    match = SERVER_TIMING_DB.search(response.getheader('Server-Timing') or '')
+    if match:
+        return response.status, latency, float(match.group(1)), int(match.group(2))
+    return response.status, latency, None, None
+
+
+def load_route(request, args):
+    """
+    Send args.requests requests for a route, using args.concurrency clients (threads with a persistent connection each)
+    Returns: a list of samples (status, latency, db time, nb queries) and the elapsed time
+    """
+    samples = list()
+    lock = threading.Lock()
+    remaining = [args.requests]
+
+    def client():
+        connexion = http.client.HTTPConnection('127.0.0.1', args.port, timeout=args.request_timeout)
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    break
+                remaining[0] -= 1
+            sample = (None, None, None, None)
+            for _ in range(2):  # like browsers, retry once on a new connection if the server closed the idle one
+                try:
+                    sample = send_request(connexion, request)
+                    break
+                except (OSError, http.client.HTTPException):
+                    connexion.close()
+                    connexion = http.client.HTTPConnection('127.0.0.1', args.port, timeout=args.request_timeout)
+            with lock:
+                samples.append(sample)
+        connexion.close()
+
+    threads = [threading.Thread(target=client) for _ in range(args.concurrency)]
+    started = perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples, perf_counter() - started
+
+
+def percentile(sorted_values, p):
+    """
+    Percentile p (nearest-rank) of a sorted list
+    """
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+
+def summarize(request, samples, elapsed, rss_kb):
+    """
+    Compute the statistics of a route from its samples
+    Returns: a dict
+    """
+    ok = [s for s in samples if s[0] is not None and s[0] < 400]
+    latencies = sorted(s[1] * 1000 for s in ok)
+    queries = [s[3] for s in ok if s[3] is not None]
+    db_times = [s[2] for s in ok if s[2] is not None]
+    return {
+        'method': request['method'],
+        'path': request['path'],
+        'requests': len(samples),
+        'errors': len(samples) - len(ok),
+        'throughput_rps': round(len(ok) / elapsed, 2) if elapsed > 0 else None,
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies), 3) if latencies else None,
+            **{f"p{p}": round(percentile(latencies, p), 3) if latencies else None for p in PERCENTILES},
+            'max': round(latencies[-1], 3) if latencies else None,
+        },
+        'db_queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+        'db_time_ms_mean': round(sum(db_times) / len(db_times), 3) if db_times else None,
+        'peak_rss_kb': rss_kb,
+    }
+
+
+def compare(results, baseline, max_regression):
+    """
+    Compare the results with a baseline run: throughput drop or p95 latency increase above max_regression (ratio) is a regression
+    Returns: a list of messages describing the regressions
+    """
+    regressions = list()
+    for name, route in results['routes'].items():
+        old = baseline.get('routes', {}).get(name)
+        if not old:
+            continue
+        if old['throughput_rps'] and route['throughput_rps'] is not None and route['throughput_rps'] < old['throughput_rps'] * (1 - max_regression):
+            regressions.append(f"{name} : débit {route['throughput_rps']} req/s (référence {old['throughput_rps']})")
+        old_p95, new_p95 = old['latency_ms'].get('p95'), route['latency_ms'].get('p95')
+        if old_p95 and new_p95 is not None and new_p95 > old_p95 * (1 + max_regression):
+            regressions.append(f"{name} : latence p95 {new_p95} ms (référence {old_p95} ms)")
+        if old.get('db_queries_per_request') is not None and route['db_queries_per_request'] is not None and route['db_queries_per_request'] > old['db_queries_per_request']:
+            regressions.append(f"{name} : {route['db_queries_per_request']} requêtes SQL par page (référence {old['db_queries_per_request']})")
+    return regressions
+
+
+def print_report(results):
+    """
+    Print a summary table of the results
+    """
+    print(f"{'route':<32} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'SQL/req':>8} {'err':>5} {'RSS kB':>9}")
+    for name, r in results['routes'].items():
+        lat = r['latency_ms']
+        cells = [(r['throughput_rps'], 9), (lat['p50'], 9), (lat['p95'], 9), (lat['p99'], 9), (r['db_queries_per_request'], 8), (r['errors'], 5), (r['peak_rss_kb'], 9)]
+        print(f"{name:<32} " + ' '.join(f"{'-' if value is None else value:>{width}}" for value, width in cells))
+
+
+def git_commit():
+    """
+    Current git commit of the repository (to identify the run)
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(args):
+    """
+    Run the benchmark of a website
+    Returns: the exit code of the script
+    """
+    scenario = load_toml(SCENARIOS_FILE)[args.site]
+    schema = args.schema or scenario['schema']
+    db_params = dict(host=args.pg_host, port=args.pg_port, user=args.pg_user, password=args.pg_password, dbname=args.pg_database)
+    if args.load_fixtures:
+        load_fixtures(db_params, scenario)
+    if args.generate:  # scale up the fixtures with synthetic data
+        if not scenario.get('generator'):
+            logger.error(f"Pas de générateur de données pour le site {args.site}")
+            return 2
+        options = argparse.Namespace(teams=args.gen_teams, games=args.gen_games, logs=args.gen_logs, morpions=16, configs=10, years=3,
+                                     workers=args.gen_workers, chunk_size=50000, seed=args.seed, truncate=False)
+        logger.info(f"Génération de données : {generate(db_params, schema, options)}")
+    requests = build_requests(args.site, scenario)
+    config_path = write_config(args)
+    server = start_server(args.site, schema, config_path, args)
+    results = {
+        'meta': {'site': args.site, 'schema': schema, 'commit': git_commit(), 'date': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+                 'concurrency': args.concurrency, 'requests_per_route': args.requests, 'workers': args.workers,
+                 'generated': {'teams': args.gen_teams, 'games': args.gen_games, 'logs': args.gen_logs, 'seed': args.seed} if args.generate else None},
+        'routes': dict(),
+    }
+    try:
+        pids = server_pids(server.pid)
+        for request in requests:
+            logger.info(f"{request['method']} {request['path']} ({request['name']})")
+            connexion = http.client.HTTPConnection('127.0.0.1', args.port, timeout=args.request_timeout)
+            for _ in range(args.warmup):
+                send_request(connexion, request)
+            connexion.close()
+            reset_peak_rss(pids)
+            samples, elapsed = load_route(request, args)
+            results['routes'][request['name']] = summarize(request, samples, elapsed, peak_rss_kb(pids))
+    finally:
+        stop_server(server)
+        os.remove(config_path)
+    print_report(results)
+    if args.output:
+        os.makedirs(path.dirname(path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        logger.info(f"Résultats enregistrés dans {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        for message in regressions:
+            logger.error(f"Régression : {message}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark of a website served by server.py")
+    parser.add_argument('site', choices=sorted(load_toml(SCENARIOS_FILE)), help='website to benchmark (directory in websites/)')
+    parser.add_argument('--pg-host', default='localhost', help='PostgreSQL server (default localhost)')
+    parser.add_argument('--pg-port', default=5432, type=int, help='PostgreSQL port (default 5432)')
+    parser.add_argument('--pg-user', default=os.environ.get('PGUSER', 'postgres'), help='PostgreSQL user (default $PGUSER or postgres)')
+    parser.add_argument('--pg-password', default=os.environ.get('PGPASSWORD', ''), help='PostgreSQL password (default $PGPASSWORD)')
+    parser.add_argument('--pg-database', default='bench', help='PostgreSQL database (default bench)')
+    parser.add_argument('-s', '--schema', default=None, help='schema used by the website (default: schema of the scenario)')
+    parser.add_argument('--load-fixtures', action='store_true', help='(re)load the SQL fixtures of the site before the benchmark')
+    parser.add_argument('--generate', action='store_true', help='add synthetic data (bench/generate_morpion_data.py) before the benchmark')
+    parser.add_argument('--gen-teams', default=1000, type=int, help='number of generated teams (default 1000)')
+    parser.add_argument('--gen-games', default=10000, type=int, help='number of generated games (default 10000)')
+    parser.add_argument('--gen-logs', default=100000, type=int, help='approximate number of generated log lines (default 100000)')
+    parser.add_argument('--gen-workers', default=os.cpu_count() or 1, type=int, help='number of generator processes (default: number of CPUs)')
+    parser.add_argument('--seed', default=42, type=int, help='seed of the data generator (default 42)')
+    parser.add_argument('-p', '--port', default=4343, type=int, help='port of the benchmarked server (default 4343)')
+    parser.add_argument('-w', '--workers', default=1, type=int, help='number of server workers (default 1)')
+    parser.add_argument('-c', '--concurrency', default=4, type=int, help='number of concurrent clients (default 4)')
+    parser.add_argument('-n', '--requests', default=200, type=int, help='number of requests per route (default 200)')
+    parser.add_argument('--warmup', default=5, type=int, help='number of warm-up requests per route (default 5)')
+    parser.add_argument('--request-timeout', default=30, type=float, help='client timeout of a request in seconds (default 30)')
+    parser.add_argument('--startup-timeout', default=30, type=float, help='maximum time for the server to start in seconds (default 30)')
+    parser.add_argument('-o', '--output', default=None, help='JSON file where results are saved')
+    parser.add_argument('--baseline', default=None, help='JSON results of a previous run to compare with')
+    parser.add_argument('--max-regression', default=0.2, type=float, help='tolerated regression ratio against the baseline (default 0.2)')
+    parser.add_argument('-v', '--verbose', action='store_true', help='show the logs of the server')
+    sys.exit(run(parser.parse_args()))
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Run a tournament between morpion teams and record its games in the database.
+
+Teams (with their morpions) and the game config are read from the morpion schema, games are played by the game engine
+of the morpion site (websites/morpion/model/game_engine.py) in a pool of worker processes, and the finished games are
+inserted into the game table by batches, with their binary records
+(replayable on the game page of the site). The tournament is deterministic for a given seed, whatever the number of workers.
+
+Example:
+    python bench/run_tournament.py --pg-database bench --config 1 --max-teams 200 --format round-robin --workers 8
+    python bench/run_tournament.py --pg-database bench --config 4 --teams 1,2,3,4,5,6 --format swiss --rounds 3 --dry-run
+"""
+
+import argparse
+import os
+import sys
+from os import path
+from time import perf_counter
+
+import psycopg
+from psycopg import sql
+from logzero import logger
+
+ROOT_DIR = path.dirname(path.dirname(path.abspath(__file__)))  # root of the repository (where server.py is)
+sys.path.append(path.join(ROOT_DIR, 'websites', 'morpion'))  # models of the morpion site (package model)
+
+from model.model_pg import get_config, get_team_compositions, insert_games  # noqa: E402
+from model.tournament import Tournament, FORMATS, GAMES_BATCH_SIZE  # noqa: E402
+from model.ai_player import PLAYERS  # noqa: E402
+
+
+def connect(db_params, schema):
+    """
+    Open a connection using the given schema
+    Returns: a psycopg connection
+    """
+    connexion = psycopg.connect(**db_params, autocommit=True)
+    connexion.execute(sql.SQL("SET search_path TO {}").format(sql.Identifier(schema)))
+    return connexion
+
+
+def load_teams(connexion, args):
+    """
+    Load the compositions of the teams of the tournament (teams without morpion are left out)
+    Returns: a dict {id_team: tuple of morpions (hp, attack, mana, accuracy)}
+    """
+    team_ids = [int(team_id) for team_id in args.teams.split(',')] if args.teams else None
+    teams = get_team_compositions(connexion, team_ids)
+    if args.max_teams:
+        teams = {team_id: teams[team_id] for team_id in sorted(teams)[:args.max_teams]}
+    return teams
+
+
+def run(args):
+    """
+    Load the teams and the config, run the tournament and log the ranking
+    Returns: the final ranking
+    """
+    db_params = dict(host=args.pg_host, port=args.pg_port, user=args.pg_user, password=args.pg_password, dbname=args.pg_database)
+    with connect(db_params, args.schema) as connexion:
+        config = get_config(connexion, args.config)
+        if config is None:
+            raise ValueError(f"La configuration {args.config} n'existe pas")
+        teams = load_teams(connexion, args)
+        tournament = Tournament(teams, config, args.format, args.rounds, args.double, args.seed, (args.player, args.player))
+        logger.info(f"Tournoi {args.format} : {len(teams)} équipes, {tournament.nb_rounds} rondes, {tournament.nb_games} parties, "
+                    f"grille {config['grid_size']}x{config['grid_size']}, {config['max_turns']} tours maximum")
+        save = None if args.dry_run else (lambda games, records: insert_games(connexion, games, records))
+        return tournament.run(args.workers, save, batch_size=args.batch_size)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Tournament between morpion teams")
+    parser.add_argument('--pg-host', default='localhost', help='PostgreSQL server (default localhost)')
+    parser.add_argument('--pg-port', default=5432, type=int, help='PostgreSQL port (default 5432)')
+    parser.add_argument('--pg-user', default=os.environ.get('PGUSER', 'postgres'), help='PostgreSQL user (default $PGUSER or postgres)')
+    parser.add_argument('--pg-password', default=os.environ.get('PGPASSWORD', ''), help='PostgreSQL password (default $PGPASSWORD)')
+    parser.add_argument('--pg-database', default='bench', help='PostgreSQL database (default bench)')
+    parser.add_argument('--schema', default='morpion', help='schema containing the morpion tables (default morpion)')
+    parser.add_argument('--config', required=True, type=int, help='id of the game config (grid size, max turns)')
+    parser.add_argument('--teams', help='comma-separated ids of the teams (default: all the teams with morpions)')
+    parser.add_argument('--max-teams', type=int, help='keep only the first N teams (by id)')
+    parser.add_argument('--format', default='round-robin', choices=FORMATS, help='tournament format (default round-robin)')
+    parser.add_argument('--rounds', type=int, help='number of rounds of a swiss tournament (default: log2 of the number of teams)')
+    parser.add_argument('--double', action='store_true', help='round-robin: each pair of teams plays twice, each team starting once')
+    parser.add_argument('--player', default='greedy', choices=sorted(PLAYERS), help='strategy of both teams (default greedy)')
+    parser.add_argument('--workers', default=os.cpu_count() or 1, type=int, help='number of worker processes (default: number of CPUs)')
+    parser.add_argument('--seed', default=42, type=int, help='seed of the tournament (default 42)')
+    parser.add_argument('--batch-size', default=GAMES_BATCH_SIZE, type=int, help=f'number of games inserted per transaction (default {GAMES_BATCH_SIZE})')
+    parser.add_argument('--top', default=10, type=int, help='number of teams of the ranking displayed at the end (default 10)')
+    parser.add_argument('--dry-run', action='store_true', help='play the games without recording them')
+    args = parser.parse_args()
+    started = perf_counter()
+    try:
+        ranking = run(args)
+    except (ValueError, RuntimeError, psycopg.Error) as e:
+        logger.error(e)
+        sys.exit(1)
+    logger.info(f"Tournoi terminé en {perf_counter() - started:.1f}s")
+    for rank, line in enumerate(ranking[:args.top], 1):
+        logger.info(f"{rank:>3}. équipe {line['team_id']} : {line['points']} pts ({line['wins']} V, {line['draws']} N, {line['losses']} D)")
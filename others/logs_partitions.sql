@@ -0,0 +1,173 @@
+-- ============================================================
+-- Migration : partitionnement mensuel de LOGS_ENTRY et table de cumul
+-- À lancer une fois, après morpions.sql (schéma "morpion"), serveur arrêté.
+--
+-- 1) logs_entry devient une table partitionnée par mois sur created_at
+--    (une partition logs_entry_AAAA_MM par mois, plus une partition par défaut
+--    pour les dates hors des partitions créées) ;
+-- 2) logs_entry_monthly cumule le nombre de lignes de journal par (mois, partie),
+--    tenue à jour par des triggers à chaque INSERT / UPDATE / DELETE sur logs_entry :
+--    les statistiques mensuelles de la page d'accueil lisent cette petite table
+--    au lieu de regrouper tout le journal ;
+-- 3) rétention : logs_entry_drop_partitions(n) supprime instantanément (DROP TABLE)
+--    les partitions de plus de n mois. Le cumul n'est pas modifié par la suppression
+--    d'une partition : les statistiques des mois supprimés restent disponibles.
+--
+-- Entretien (partitions des mois à venir, rétention) : model_pg.maintain_logs_partitions,
+-- lancé en tâche de fond au démarrage du site (init.py).
+--
+-- Attention : la clé primaire d'une table partitionnée doit contenir la colonne de
+-- partitionnement, elle devient donc (game_id, num, created_at).
+-- ============================================================
+
+BEGIN;
+
+SET search_path TO morpion, public;
+
+DO $$
+BEGIN
+  IF (SELECT relkind FROM pg_class WHERE oid = 'logs_entry'::regclass) = 'p' THEN
+    RAISE EXCEPTION 'logs_entry est déjà partitionnée : migration déjà appliquée';
+  END IF;
+END $$;
+
+LOCK TABLE logs_entry IN ACCESS EXCLUSIVE MODE;
+ALTER TABLE logs_entry RENAME TO logs_entry_old;
+ALTER TABLE logs_entry_old RENAME CONSTRAINT logs_entry_pkey TO logs_entry_old_pkey;
+
+-- ============================================================
+-- Table LOGS_ENTRY partitionnée par mois
+-- ============================================================
+
+CREATE TABLE logs_entry (
+  game_id    INTEGER   NOT NULL REFERENCES game(id_game)
+                        ON DELETE CASCADE,           -- suppression d'une partie => suppression de son journal
+  num        INTEGER   NOT NULL CHECK (num > 0),     -- numéro d'ordre de la ligne dans la partie
+  created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  message    TEXT      NOT NULL,
+  PRIMARY KEY (game_id, num, created_at)             -- la clé de partitionnement doit faire partie de la clé primaire
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE logs_entry_default PARTITION OF logs_entry DEFAULT;
+
+-- Crée (si besoin) la partition du mois contenant la date month_start, et retourne son nom.
+-- Les lignes de ce mois déjà rangées dans la partition par défaut y sont déplacées
+-- (directement entre partitions : les triggers de cumul, définis sur logs_entry, ne sont pas déclenchés).
+CREATE OR REPLACE FUNCTION logs_entry_create_partition(month_start DATE) RETURNS TEXT
+LANGUAGE plpgsql SET search_path FROM CURRENT AS $$
+DECLARE
+  first_day DATE := date_trunc('month', month_start)::date;
+  next_month DATE := (date_trunc('month', month_start) + INTERVAL '1 month')::date;
+  partition_name TEXT := 'logs_entry_' || to_char(month_start, 'YYYY_MM');
+BEGIN
+  -- les entretiens concurrents (plusieurs processus du serveur) sont sérialisés jusqu'à la fin de la transaction
+  PERFORM pg_advisory_xact_lock(hashtext('logs_entry_partitions'));
+  IF to_regclass(partition_name) IS NOT NULL THEN
+    RETURN partition_name;
+  END IF;
+  EXECUTE format('CREATE TABLE %I (LIKE logs_entry INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', partition_name);
+  EXECUTE format('WITH moved AS (DELETE FROM logs_entry_default WHERE created_at >= %L AND created_at < %L RETURNING *)
+                  INSERT INTO %I SELECT * FROM moved', first_day, next_month, partition_name);
+  EXECUTE format('ALTER TABLE logs_entry ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', partition_name, first_day, next_month);
+  RETURN partition_name;
+END $$;
+
+-- Supprime les partitions mensuelles antérieures aux keep_months derniers mois (mois courant compris),
+-- et retourne le nombre de partitions supprimées.
+CREATE OR REPLACE FUNCTION logs_entry_drop_partitions(keep_months INTEGER) RETURNS INTEGER
+LANGUAGE plpgsql SET search_path FROM CURRENT AS $$
+DECLARE
+  oldest_kept DATE := (date_trunc('month', CURRENT_DATE) - make_interval(months => keep_months - 1))::date;
+  partition_name TEXT;
+  nb_dropped INTEGER := 0;
+BEGIN
+  PERFORM pg_advisory_xact_lock(hashtext('logs_entry_partitions'));
+  FOR partition_name IN
+    SELECT c.relname
+    FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'logs_entry'::regclass AND c.relname ~ '^logs_entry_\d{4}_\d{2}$'
+      AND to_date(substring(c.relname FROM '\d{4}_\d{2}$'), 'YYYY_MM') < oldest_kept
+    ORDER BY c.relname
+  LOOP
+    EXECUTE format('DROP TABLE %I', partition_name);
+    nb_dropped := nb_dropped + 1;
+  END LOOP;
+  RETURN nb_dropped;
+END $$;
+
+-- Partitions des mois présents dans le journal, jusqu'à 3 mois après le mois courant
+SELECT logs_entry_create_partition(month::date)
+FROM generate_series(
+  date_trunc('month', COALESCE((SELECT MIN(created_at) FROM logs_entry_old), CURRENT_TIMESTAMP)),
+  GREATEST(date_trunc('month', CURRENT_TIMESTAMP) + INTERVAL '3 months',
+           date_trunc('month', COALESCE((SELECT MAX(created_at) FROM logs_entry_old), CURRENT_TIMESTAMP))),
+  INTERVAL '1 month'
+) AS month;
+
+INSERT INTO logs_entry (game_id, num, created_at, message)
+SELECT game_id, num, created_at, message FROM logs_entry_old;
+
+DROP TABLE logs_entry_old;
+
+-- ============================================================
+-- Table LOGS_ENTRY_MONTHLY : nombre de lignes de journal par (mois, partie)
+-- ============================================================
+
+CREATE TABLE logs_entry_monthly (
+  month_start DATE    NOT NULL,                      -- premier jour du mois
+  game_id     INTEGER NOT NULL REFERENCES game(id_game)
+                        ON DELETE CASCADE,
+  nb_logs     INTEGER NOT NULL CHECK (nb_logs >= 0),
+  PRIMARY KEY (month_start, game_id)                 -- les statistiques parcourent la table dans l'ordre des mois
+);
+
+CREATE INDEX idx_logs_entry_monthly_game ON logs_entry_monthly (game_id);  -- suppression en cascade d'une partie
+
+INSERT INTO logs_entry_monthly (month_start, game_id, nb_logs)
+SELECT date_trunc('month', created_at)::date, game_id, COUNT(*)
+FROM logs_entry
+GROUP BY 1, 2;
+
+-- Met à jour le cumul avec les lignes insérées (new_rows) et/ou supprimées (old_rows) par une requête :
+-- trigger de niveau instruction, donc un seul INSERT ... ON CONFLICT et un seul UPDATE par requête,
+-- quel que soit le nombre de lignes écrites.
+CREATE OR REPLACE FUNCTION logs_entry_monthly_sync() RETURNS TRIGGER
+LANGUAGE plpgsql SET search_path FROM CURRENT AS $$
+BEGIN
+  IF TG_OP IN ('DELETE', 'UPDATE') THEN
+    WITH removed AS (
+      SELECT date_trunc('month', created_at)::date AS month_start, game_id, COUNT(*) AS nb_logs
+      FROM old_rows GROUP BY 1, 2
+    )
+    UPDATE logs_entry_monthly m SET nb_logs = m.nb_logs - r.nb_logs
+    FROM removed r
+    WHERE m.month_start = r.month_start AND m.game_id = r.game_id;
+    DELETE FROM logs_entry_monthly
+    WHERE nb_logs = 0
+      AND (month_start, game_id) IN (SELECT date_trunc('month', created_at)::date, game_id FROM old_rows);
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    INSERT INTO logs_entry_monthly (month_start, game_id, nb_logs)
+    SELECT date_trunc('month', created_at)::date, game_id, COUNT(*)
+    FROM new_rows GROUP BY 1, 2
+    ORDER BY 1, 2                                    -- ordre fixe des verrous entre écritures concurrentes
+    ON CONFLICT (month_start, game_id) DO UPDATE SET nb_logs = logs_entry_monthly.nb_logs + EXCLUDED.nb_logs;
+  END IF;
+  RETURN NULL;
+END $$;
+
+CREATE TRIGGER logs_entry_monthly_insert AFTER INSERT ON logs_entry
+  REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION logs_entry_monthly_sync();
+CREATE TRIGGER logs_entry_monthly_update AFTER UPDATE ON logs_entry
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION logs_entry_monthly_sync();
+CREATE TRIGGER logs_entry_monthly_delete AFTER DELETE ON logs_entry
+  REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION logs_entry_monthly_sync();
+
+-- Notifications du suivi en direct des parties (fonction définie dans morpions.sql) : le trigger
+-- de l'ancienne table a été supprimé avec elle
+CREATE TRIGGER logs_entry_live AFTER INSERT ON logs_entry
+  REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION logs_entry_notify();
+
+COMMIT;
+
+ANALYZE logs_entry, logs_entry_monthly;
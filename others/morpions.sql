@@ -12,7 +12,12 @@ SET search_path TO morpion, public;
 -- dans le bon ordre (tables dépendantes -> tables de base)
 -- ============================================================
 
+DROP TABLE IF EXISTS logs_entry_monthly CASCADE;  -- cumul du journal (voir logs_partitions.sql), dépend de game
+DROP TABLE IF EXISTS game_record  CASCADE;  -- dépend de game
+DROP TABLE IF EXISTS matchup_team  CASCADE;  -- dépend de team
+DROP TABLE IF EXISTS matchup_morpion CASCADE;  -- dépend de morpion
 DROP TABLE IF EXISTS logs_entry   CASCADE;  -- dépend de game
+DROP TABLE IF EXISTS team_stats   CASCADE;  -- dépend de team
 DROP TABLE IF EXISTS game         CASCADE;  -- dépend de team et config
 DROP TABLE IF EXISTS team_morpion CASCADE;  -- dépend de team et morpion
 DROP TABLE IF EXISTS config       CASCADE;
@@ -132,6 +137,198 @@ CREATE TABLE logs_entry (
   PRIMARY KEY (game_id, num)                         -- unique par (partie, numéro)
 );
 
+-- ============================================================
+-- Table GAME_RECORD : enregistrement binaire des coups d'une partie
+-- - format compact de taille fixe par coup (voir websites/morpion/model/game_record.py)
+-- - table à part : la liste des parties ne lit pas les enregistrements
+-- ============================================================
+
+CREATE TABLE game_record (
+  game_id    INTEGER  PRIMARY KEY REFERENCES game(id_game)
+                        ON DELETE CASCADE,           -- suppression d'une partie => suppression de son enregistrement
+  nb_moves   SMALLINT NOT NULL CHECK (nb_moves >= 0),
+  moves      BYTEA    NOT NULL                       -- en-tête, morpions, coups et instants des coups
+);
+
+-- ============================================================
+-- Tables MATCHUP_MORPION et MATCHUP_TEAM : résultats de parties simulées
+-- entre deux morpions (duels) et entre deux équipes (voir websites/morpion/model/matchups.py)
+-- - une ligne par paire (a < b), recalculée quand l'empreinte de la paire
+--   (caractéristiques des adversaires, paramètres de simulation) change
+-- - supprimée avec un des deux adversaires
+-- ============================================================
+
+CREATE TABLE matchup_morpion (
+  morpion_a   INTEGER   NOT NULL REFERENCES morpion(id_morpion) ON DELETE CASCADE,
+  morpion_b   INTEGER   NOT NULL REFERENCES morpion(id_morpion) ON DELETE CASCADE,
+  fingerprint TEXT      NOT NULL,                    -- empreinte de la paire lors de la simulation
+  trials      INTEGER   NOT NULL CHECK (trials > 0), -- nombre de parties simulées
+  wins_a      INTEGER   NOT NULL CHECK (wins_a >= 0),
+  wins_b      INTEGER   NOT NULL CHECK (wins_b >= 0),
+  computed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (morpion_a, morpion_b),
+  CHECK (morpion_a < morpion_b),
+  CHECK (wins_a + wins_b <= trials)                  -- les autres parties sont nulles
+);
+
+CREATE TABLE matchup_team (
+  team_a      INTEGER   NOT NULL REFERENCES team(id_team) ON DELETE CASCADE,
+  team_b      INTEGER   NOT NULL REFERENCES team(id_team) ON DELETE CASCADE,
+  fingerprint TEXT      NOT NULL,
+  trials      INTEGER   NOT NULL CHECK (trials > 0),
+  wins_a      INTEGER   NOT NULL CHECK (wins_a >= 0),
+  wins_b      INTEGER   NOT NULL CHECK (wins_b >= 0),
+  computed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (team_a, team_b),
+  CHECK (team_a < team_b),
+  CHECK (wins_a + wins_b <= trials)
+);
+
+-- ============================================================
+-- INDEX : la clé étrangère ne crée pas d'index côté table référençante.
+-- Sans ces index, chaque recherche des parties d'une équipe (liste des
+-- équipes, suppression) et chaque vérification ON DELETE RESTRICT / SET NULL
+-- lors de la suppression d'une équipe parcourt toute la table game.
+-- ============================================================
+
+CREATE INDEX idx_game_team1  ON game (team1_id);
+CREATE INDEX idx_game_team2  ON game (team2_id);
+CREATE INDEX idx_game_winner ON game (winner_team_id);
+CREATE INDEX idx_matchup_morpion_b ON matchup_morpion (morpion_b);  -- duels où le morpion est le second, suppression en cascade
+CREATE INDEX idx_matchup_team_b    ON matchup_team (team_b);
+CREATE INDEX idx_team_created      ON team (created_at DESC, id_team DESC);  -- liste des équipes triée (pagination par curseur)
+CREATE INDEX idx_team_name         ON team (name, id_team);
+
+-- ============================================================
+-- Table TEAM_STATS : nombre de parties jouées et gagnées par équipe
+-- - une ligne par équipe, créée avec l'équipe
+-- - tenue à jour par des triggers à chaque INSERT / UPDATE / DELETE sur game
+-- - la liste des équipes triée par parties ou victoires lit une page de
+--   l'index, au lieu de compter les parties de toutes les équipes
+-- ============================================================
+
+CREATE TABLE team_stats (
+  team_id     INTEGER PRIMARY KEY REFERENCES team(id_team)
+                        ON DELETE CASCADE,
+  games_count INTEGER NOT NULL DEFAULT 0,             -- parties jouées (équipe 1 ou 2)
+  wins        INTEGER NOT NULL DEFAULT 0             -- parties gagnées
+);
+
+CREATE INDEX idx_team_stats_games ON team_stats (games_count DESC, team_id DESC);
+CREATE INDEX idx_team_stats_wins  ON team_stats (wins DESC, team_id DESC);
+
+-- Ligne de compteurs des équipes créées par une requête
+CREATE OR REPLACE FUNCTION team_stats_create() RETURNS TRIGGER
+LANGUAGE plpgsql SET search_path FROM CURRENT AS $$
+BEGIN
+  INSERT INTO team_stats (team_id)
+  SELECT id_team FROM new_rows ORDER BY id_team
+  ON CONFLICT (team_id) DO NOTHING;
+  RETURN NULL;
+END $$;
+
+CREATE TRIGGER team_stats_insert AFTER INSERT ON team
+  REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION team_stats_create();
+
+-- Met à jour les compteurs avec les parties insérées (new_rows, +1) et/ou supprimées (old_rows, -1) par une requête :
+-- trigger de niveau instruction, un seul INSERT ... ON CONFLICT par requête, quel que soit le nombre de parties.
+-- Un UPDATE qui ne change ni les équipes ni le vainqueur (ex : date de fin) ne modifie aucun compteur.
+CREATE OR REPLACE FUNCTION team_stats_sync() RETURNS TRIGGER
+LANGUAGE plpgsql SET search_path FROM CURRENT AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    INSERT INTO team_stats (team_id, games_count, wins)
+    SELECT team_id, SUM(games), SUM(wins)
+    FROM (SELECT team1_id AS team_id, 1 AS games, 0 AS wins FROM new_rows
+          UNION ALL SELECT team2_id, 1, 0 FROM new_rows
+          UNION ALL SELECT winner_team_id, 0, 1 FROM new_rows WHERE winner_team_id IS NOT NULL) d
+    GROUP BY team_id
+    ORDER BY team_id                                 -- ordre fixe des verrous entre écritures concurrentes
+    ON CONFLICT (team_id) DO UPDATE SET games_count = team_stats.games_count + EXCLUDED.games_count,
+                                        wins = team_stats.wins + EXCLUDED.wins;
+  ELSIF TG_OP = 'DELETE' THEN
+    INSERT INTO team_stats (team_id, games_count, wins)
+    SELECT team_id, -SUM(games), -SUM(wins)
+    FROM (SELECT team1_id AS team_id, 1 AS games, 0 AS wins FROM old_rows
+          UNION ALL SELECT team2_id, 1, 0 FROM old_rows
+          UNION ALL SELECT winner_team_id, 0, 1 FROM old_rows WHERE winner_team_id IS NOT NULL) d
+    GROUP BY team_id
+    ORDER BY team_id
+    ON CONFLICT (team_id) DO UPDATE SET games_count = team_stats.games_count + EXCLUDED.games_count,
+                                        wins = team_stats.wins + EXCLUDED.wins;
+  ELSE  -- UPDATE : différence entre les nouvelles et les anciennes lignes
+    INSERT INTO team_stats (team_id, games_count, wins)
+    SELECT team_id, SUM(games), SUM(wins)
+    FROM (SELECT team1_id AS team_id, 1 AS games, 0 AS wins FROM new_rows
+          UNION ALL SELECT team2_id, 1, 0 FROM new_rows
+          UNION ALL SELECT winner_team_id, 0, 1 FROM new_rows WHERE winner_team_id IS NOT NULL
+          UNION ALL SELECT team1_id, -1, 0 FROM old_rows
+          UNION ALL SELECT team2_id, -1, 0 FROM old_rows
+          UNION ALL SELECT winner_team_id, 0, -1 FROM old_rows WHERE winner_team_id IS NOT NULL) d
+    GROUP BY team_id
+    HAVING SUM(games) <> 0 OR SUM(wins) <> 0
+    ORDER BY team_id
+    ON CONFLICT (team_id) DO UPDATE SET games_count = team_stats.games_count + EXCLUDED.games_count,
+                                        wins = team_stats.wins + EXCLUDED.wins;
+  END IF;
+  RETURN NULL;
+END $$;
+
+CREATE TRIGGER team_stats_game_insert AFTER INSERT ON game
+  REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION team_stats_sync();
+CREATE TRIGGER team_stats_game_update AFTER UPDATE ON game
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION team_stats_sync();
+CREATE TRIGGER team_stats_game_delete AFTER DELETE ON game
+  REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION team_stats_sync();
+
+-- ============================================================
+-- NOTIFICATIONS : suivi en direct des parties en cours
+-- (page partie/<id>/direct, flux d'événements du serveur).
+-- Chaque nouvelle ligne de journal et chaque fin de partie d'une partie
+-- en cours envoie une notification sur le canal morpion_live :
+--   {"topic": "<id_game>", "event": "log" | "state", "id": ..., "data": {...}}
+-- Le serveur écoute le canal (LISTEN, une connexion par processus) et
+-- relaie chaque notification aux navigateurs qui suivent la partie.
+-- Les notifications sont envoyées à la validation de la transaction
+-- (rien n'est envoyé si elle est annulée).
+-- ============================================================
+
+-- Lignes de journal insérées par une requête (trigger de niveau instruction :
+-- une seule jointure avec game par requête), parties terminées exclues
+CREATE OR REPLACE FUNCTION logs_entry_notify() RETURNS TRIGGER
+LANGUAGE plpgsql SET search_path FROM CURRENT AS $$
+BEGIN
+  PERFORM pg_notify('morpion_live', json_build_object(
+            'topic', n.game_id::text, 'event', 'log', 'id', n.num,
+            'data', json_build_object('num', n.num, 'created_at', n.created_at,
+                                      'message', left(n.message, 1000))  -- une notification est limitée à 8000 octets
+          )::text)
+  FROM (SELECT * FROM new_rows ORDER BY game_id, num) n
+  JOIN game g ON g.id_game = n.game_id
+  WHERE g.ended_at IS NULL;
+  RETURN NULL;
+END $$;
+
+CREATE TRIGGER logs_entry_live AFTER INSERT ON logs_entry
+  REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION logs_entry_notify();
+
+-- Changement d'état d'une partie (fin, vainqueur)
+CREATE OR REPLACE FUNCTION game_notify() RETURNS TRIGGER
+LANGUAGE plpgsql SET search_path FROM CURRENT AS $$
+BEGIN
+  PERFORM pg_notify('morpion_live', json_build_object(
+            'topic', NEW.id_game::text, 'event', 'state',
+            'data', json_build_object('ended_at', NEW.ended_at, 'winner_team_id', NEW.winner_team_id,
+                                      'winner_name', (SELECT name FROM team WHERE id_team = NEW.winner_team_id))
+          )::text);
+  RETURN NULL;
+END $$;
+
+CREATE TRIGGER game_live AFTER UPDATE OF ended_at, winner_team_id ON game
+  FOR EACH ROW
+  WHEN (OLD.ended_at IS DISTINCT FROM NEW.ended_at OR OLD.winner_team_id IS DISTINCT FROM NEW.winner_team_id)
+  EXECUTE FUNCTION game_notify();
+
 -- ============================================================
 -- INSERTS INICIALES
 -- ============================================================
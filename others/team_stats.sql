@@ -0,0 +1,115 @@
+-- ============================================================
+-- Migration : compteurs de parties par équipe (table TEAM_STATS)
+-- Pour une base créée avant l'ajout de team_stats à morpions.sql (schéma "morpion").
+-- Idempotente : peut être relancée, les compteurs sont alors recalculés.
+--
+-- 1) index des tris de la liste des équipes (date de création, nom) ;
+-- 2) table team_stats (parties jouées et gagnées par équipe) et ses index ;
+-- 3) triggers qui tiennent les compteurs à jour (création d'équipe, INSERT / UPDATE / DELETE sur game) ;
+-- 4) calcul des compteurs à partir des parties existantes.
+--
+-- team et game sont verrouillées en écriture pendant la migration : aucune partie
+-- ne peut être ajoutée entre le calcul des compteurs et la création des triggers.
+-- ============================================================
+
+BEGIN;
+
+SET search_path TO morpion, public;
+
+LOCK TABLE team, game IN SHARE ROW EXCLUSIVE MODE;
+
+CREATE INDEX IF NOT EXISTS idx_team_created ON team (created_at DESC, id_team DESC);  -- liste des équipes triée (pagination par curseur)
+CREATE INDEX IF NOT EXISTS idx_team_name    ON team (name, id_team);
+
+CREATE TABLE IF NOT EXISTS team_stats (
+  team_id     INTEGER PRIMARY KEY REFERENCES team(id_team)
+                        ON DELETE CASCADE,
+  games_count INTEGER NOT NULL DEFAULT 0,             -- parties jouées (équipe 1 ou 2)
+  wins        INTEGER NOT NULL DEFAULT 0             -- parties gagnées
+);
+
+CREATE INDEX IF NOT EXISTS idx_team_stats_games ON team_stats (games_count DESC, team_id DESC);
+CREATE INDEX IF NOT EXISTS idx_team_stats_wins  ON team_stats (wins DESC, team_id DESC);
+
+-- Ligne de compteurs des équipes créées par une requête
+CREATE OR REPLACE FUNCTION team_stats_create() RETURNS TRIGGER
+LANGUAGE plpgsql SET search_path FROM CURRENT AS $$
+BEGIN
+  INSERT INTO team_stats (team_id)
+  SELECT id_team FROM new_rows ORDER BY id_team
+  ON CONFLICT (team_id) DO NOTHING;
+  RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS team_stats_insert ON team;
+CREATE TRIGGER team_stats_insert AFTER INSERT ON team
+  REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION team_stats_create();
+
+-- Met à jour les compteurs avec les parties insérées (new_rows, +1) et/ou supprimées (old_rows, -1) par une requête :
+-- trigger de niveau instruction, un seul INSERT ... ON CONFLICT par requête, quel que soit le nombre de parties.
+-- Un UPDATE qui ne change ni les équipes ni le vainqueur (ex : date de fin) ne modifie aucun compteur.
+CREATE OR REPLACE FUNCTION team_stats_sync() RETURNS TRIGGER
+LANGUAGE plpgsql SET search_path FROM CURRENT AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    INSERT INTO team_stats (team_id, games_count, wins)
+    SELECT team_id, SUM(games), SUM(wins)
+    FROM (SELECT team1_id AS team_id, 1 AS games, 0 AS wins FROM new_rows
+          UNION ALL SELECT team2_id, 1, 0 FROM new_rows
+          UNION ALL SELECT winner_team_id, 0, 1 FROM new_rows WHERE winner_team_id IS NOT NULL) d
+    GROUP BY team_id
+    ORDER BY team_id                                 -- ordre fixe des verrous entre écritures concurrentes
+    ON CONFLICT (team_id) DO UPDATE SET games_count = team_stats.games_count + EXCLUDED.games_count,
+                                        wins = team_stats.wins + EXCLUDED.wins;
+  ELSIF TG_OP = 'DELETE' THEN
+    INSERT INTO team_stats (team_id, games_count, wins)
+    SELECT team_id, -SUM(games), -SUM(wins)
+    FROM (SELECT team1_id AS team_id, 1 AS games, 0 AS wins FROM old_rows
+          UNION ALL SELECT team2_id, 1, 0 FROM old_rows
+          UNION ALL SELECT winner_team_id, 0, 1 FROM old_rows WHERE winner_team_id IS NOT NULL) d
+    GROUP BY team_id
+    ORDER BY team_id
+    ON CONFLICT (team_id) DO UPDATE SET games_count = team_stats.games_count + EXCLUDED.games_count,
+                                        wins = team_stats.wins + EXCLUDED.wins;
+  ELSE  -- UPDATE : différence entre les nouvelles et les anciennes lignes
+    INSERT INTO team_stats (team_id, games_count, wins)
+    SELECT team_id, SUM(games), SUM(wins)
+    FROM (SELECT team1_id AS team_id, 1 AS games, 0 AS wins FROM new_rows
+          UNION ALL SELECT team2_id, 1, 0 FROM new_rows
+          UNION ALL SELECT winner_team_id, 0, 1 FROM new_rows WHERE winner_team_id IS NOT NULL
+          UNION ALL SELECT team1_id, -1, 0 FROM old_rows
+          UNION ALL SELECT team2_id, -1, 0 FROM old_rows
+          UNION ALL SELECT winner_team_id, 0, -1 FROM old_rows WHERE winner_team_id IS NOT NULL) d
+    GROUP BY team_id
+    HAVING SUM(games) <> 0 OR SUM(wins) <> 0
+    ORDER BY team_id
+    ON CONFLICT (team_id) DO UPDATE SET games_count = team_stats.games_count + EXCLUDED.games_count,
+                                        wins = team_stats.wins + EXCLUDED.wins;
+  END IF;
+  RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS team_stats_game_insert ON game;
+CREATE TRIGGER team_stats_game_insert AFTER INSERT ON game
+  REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION team_stats_sync();
+DROP TRIGGER IF EXISTS team_stats_game_update ON game;
+CREATE TRIGGER team_stats_game_update AFTER UPDATE ON game
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION team_stats_sync();
+DROP TRIGGER IF EXISTS team_stats_game_delete ON game;
+CREATE TRIGGER team_stats_game_delete AFTER DELETE ON game
+  REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION team_stats_sync();
+
+-- Compteurs des équipes existantes (recalculés si la migration est relancée)
+INSERT INTO team_stats (team_id, games_count, wins)
+SELECT t.id_team, COALESCE(SUM(d.games), 0), COALESCE(SUM(d.wins), 0)
+FROM team t
+LEFT JOIN (SELECT team1_id AS team_id, 1 AS games, 0 AS wins FROM game
+           UNION ALL SELECT team2_id, 1, 0 FROM game
+           UNION ALL SELECT winner_team_id, 0, 1 FROM game WHERE winner_team_id IS NOT NULL) d ON d.team_id = t.id_team
+GROUP BY t.id_team
+ORDER BY t.id_team
+ON CONFLICT (team_id) DO UPDATE SET games_count = EXCLUDED.games_count, wins = EXCLUDED.wins;
+
+ANALYZE team_stats;
+
+COMMIT;
@@ -5,10 +5,11 @@
 #########################################
 
 import sys
+import html
 import os
-from http.server import BaseHTTPRequestHandler, HTTPServer, SimpleHTTPRequestHandler
+from http.server import BaseHTTPRequestHandler, HTTPServer
 from logzero import logger
-from urllib.parse import urlparse, parse_qs
+from urllib.parse import urlparse, parse_qs, unquote
 from os import path
 import tomllib
 from time import sleep
@@ -20,47 +21,343 @@ import argparse
 import pathlib
 from shutil import rmtree
 import importlib.util
+import signal
+import socket
+import select
+from time import monotonic, perf_counter
+import queue
+import threading
+import logging
+import logzero
+from webserver import TEMPLATES_DIR
+from webserver.db import DB_STATS, DEADLINE, RequestTimeout, deadline_expired, InstrumentedCursor, WebConnection
+from webserver.cache import RESPONSE_CACHE_MAX_ENTRIES, TableGenerations, ResponseCache, FragmentCacheExtension, ReadMemo
+from webserver.jobs import JobQueue, create_jobs_dir
+from webserver.events import SSE_RETRY, EventHub, format_event
+from webserver.router import Router
+from webserver.logs import access_logger, start_log_pipeline, stop_log_pipeline
+from webserver.multipart import parse_multipart
+from webserver.prefork import WorkerStats, create_limits, log_stats, serve_prefork
 
 # module global variables (directly used by views and templates)
 SESSION = dict()  # session content is persistent between request
 REQUEST_VARS = dict()  # request variables are not persistent (only for the current request)
 GET = dict()
 POST = dict()
+FILES = dict()  # uploaded files of a multipart POST request: {name: [{'filename': ..., 'content_type': ..., 'content': bytes}, ...]}
+
+STREAM_BUFFER_SIZE = 64 * 1024  # streamed responses are sent in chunks of (at least) this size
+RETRY_AFTER = 2  # delay (seconds) suggested to clients in 503 responses when the server is saturated
+ACCEPT_GRACE = 0.05  # a busy worker waits this long (seconds) before taking a new connection, so that an idle worker takes it first
+
+
+class CountingWriter:
+    """
+    Wrapper of the output stream of a connection counting the bytes written (headers and body)
+    """
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.count = 0
+
+    def write(self, data):
+        self.count += len(data)
+        return self.raw.write(data)
+
+    def __getattr__(self, name):  # flush, close, closed...
+        return getattr(self.raw, name)
 
 
 class WebHandler(BaseHTTPRequestHandler):
 
-    _routes = dict()  # class variable for storing routes
+    _router = Router()  # class variable for storing routes
+    _static_prefix = None  # only files under this directory (the served website) are sent as static files
+    protocol_version = 'HTTP/1.1'  # persistent connections (every response must be framed with Content-Length)
+
+    def setup(self):
+        """
+        Prepare the connection: socket timeout and counter of requests served on this connection
+        """
+        self.timeout = self.server.keepalive_timeout  # also protects the (single-threaded) server from silent clients
+        self._requests_on_connection = self.server.requests_served  # not 0 for a parked connection served again
+        super().setup()
+        self.wfile = CountingWriter(self.wfile)  # bytes sent, for the access log
+
+    def handle(self):
+        """
+        Process the requests of a connection while it is kept alive (idle timeout, max requests, other clients waiting)
+        """
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection and self._wait_next_request():
+            self.handle_one_request()
+
+    def _wait_next_request(self):
+        """
+        Wait for the next request on a kept-alive connection
+        Returns: True if a request arrived, False otherwise: idle timeout (the connection is closed), or a new client is waiting
+            while this connection is idle (the connection is parked by the server until its next request, see WebServer.park)
+        """
+        if self._has_buffered_request():  # pipelined request already read from the socket: select would not report it
+            return True
+        deadline = monotonic() + self.server.keepalive_timeout
+        while True:
+            remaining = deadline - monotonic()
+            if remaining <= 0:  # idle timeout
+                return False
+            if select.select([self.connection], [], [], min(remaining, ACCEPT_GRACE))[0]:
+                return True
+            if self.server.has_waiting_clients():  # a new client waits: serve it, the connection stays open
+                self.server.parking = (self.client_address, deadline, self._requests_on_connection)
+                return False
+
+    def _has_buffered_request(self):
+        """
+        Returns: True if bytes of a next request are already in the read buffer of the connection (without blocking)
+        """
+        timeout = self.connection.gettimeout()
+        self.connection.setblocking(False)  # peek only reads the socket if the buffer is empty: no wait if nothing was received
+        try:
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            self.connection.settimeout(timeout)
+
+    def _keep_alive(self):
+        """
+        Check whether the connection can be kept open after the current response
+        Returns: a boolean
+        """
+        return not self.close_connection and self._requests_on_connection < self.server.keepalive_max_requests
+
+    def send_response(self, code, message=None):
+        """
+        Send the response status line, and keep the status code for the worker metrics
+        """
+        self._response_code = code
+        super().send_response(code, message)
+
+    def handle_one_request(self):
+        """
+        Process a single HTTP request, then record its status code in the worker metrics
+        """
+        self._response_code = None
+        self._request_started = perf_counter()
+        self._requests_on_connection += 1
+        self._route_url = None
+        self._route = None
+        self._cache_status = None
+        self._events_backlog = None
+        self.wfile.count = 0
+        super().handle_one_request()
+        if self._response_code is not None:
+            self.server.record_response(self._response_code)
+            if access_logger.handlers:
+                self._log_access()
+
+    def _log_access(self):
+        """
+        Write the access log line of the request (formatted as JSON by the log writer thread)
+        """
+        access_logger.info({
+            'time': self.log_date_time_string(),
+            'pid': os.getpid(),
+            'client': self.client_address[0],
+            'method': self.command,
+            'path': self.path,
+            'route': self._route_url,
+            'status': self._response_code,
+            'bytes': self.wfile.count,
+            'duration_ms': round((perf_counter() - self._request_started) * 1000, 3),
+            'db_ms': round(DB_STATS['time'] * 1000, 3),
+            'db_queries': DB_STATS['queries'],
+            'memo_hits': DB_STATS['memo_hits'],
+            'cache': self._cache_status,
+        })
+
+    def log_request(self, code='-', size='-'):
+        """
+        Log the request line, unless the JSON access log is enabled (it replaces this line)
+        """
+        if not access_logger.handlers:
+            super().log_request(code, size)
+
+    def log_message(self, format, *args):
+        """
+        Log a message of BaseHTTPRequestHandler through the logger (instead of writing it on stderr in the request path)
+        """
+        logger.info("%s - " + format, self.address_string(), *args)
 
-    def _set_response(self, response_code=200, mime_type='text/html; charset=utf-8'):
+    def _set_response(self, response_code=200, mime_type='text/html; charset=utf-8', content_length=0, headers=None):
         """
         Prepare a HTTP response for a request.
         response_code: HTTP status code - https://en.wikipedia.org/wiki/List_of_HTTP_status_codes
         mime_type: type du contenu de la réponse
+        content_length: size (in bytes) of the body which will be written after the headers
+        headers: optional dict of additional headers
         """
         self.send_response(response_code)
         self.send_header('Content-type', mime_type)
+        self.send_header('Content-Length', str(content_length))
+        for name, value in (headers or dict()).items():
+            self.send_header(name, value)
+        self._send_connection_header()
         self.end_headers()
 
-    def redirect(self, new_url, mime_type='text/html; charset=utf-8'):
+    def _send_connection_header(self):
+        """
+        Announce whether the connection is kept alive after this response
+        """
+        if self._keep_alive():
+            self.send_header('Connection', 'keep-alive')
+            self.send_header('Keep-Alive', f"timeout={int(self.server.keepalive_timeout)}, max={self.server.keepalive_max_requests - self._requests_on_connection}")
+        else:
+            self.send_header('Connection', 'close')  # also sets self.close_connection
+
+    def _send_content(self, content, response_code=200, mime_type='text/html; charset=utf-8', headers=None):
+        """
+        Send a complete HTTP response (headers and body)
+        content: body of the response (bytes)
+        headers: optional dict of additional headers
+        """
+        self._set_response(response_code, mime_type, len(content), headers)
+        self.wfile.write(content)
+
+    def _send_route_response(self, content, cache_status=None):
+        """
+        Send the response of a route: a rendered template, or a stream provided by the controller
+        content: a string (HTML), a dict {'chunks': iterable of bytes, 'mime_type': ..., 'filename': ... (optional)},
+            or a dict {'topic': ..., 'initial': [...]} for an event stream (see EventHub)
+        cache_status: HIT or MISS for the routes with a cache policy (X-Cache header)
+        """
+        self._cache_status = cache_status
+        if isinstance(content, str):
+            headers = self._timing_headers()
+            if cache_status:
+                headers['X-Cache'] = cache_status
+            self._send_content(content.encode('utf-8'), headers=headers)
+        elif 'topic' in content:
+            self._send_event_stream(content['topic'], content.get('initial', []))
+        else:
+            self._send_stream(content['chunks'], content.get('mime_type', 'application/octet-stream'), content.get('filename'))
+
+    def _send_stream(self, chunks, mime_type, filename=None):
+        """
+        Send a response whose size is unknown in advance (chunked transfer encoding), without keeping the whole content in memory
+        chunks: iterable of bytes (closed at the end if it is a generator)
+        mime_type: type du contenu de la réponse
+        filename: if provided, the content is proposed as a file to download
+        """
+        chunked = self.request_version != 'HTTP/1.0'  # HTTP/1.0 clients: raw content, end of content = end of connection
+        self.send_response(200)
+        self.send_header('Content-type', mime_type)
+        if filename:
+            self.send_header('Content-Disposition', f'attachment; filename="{filename}"')
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+            self._send_connection_header()
+        else:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        buffer = bytearray()
+        try:
+            for data in chunks:
+                buffer += data
+                if len(buffer) >= STREAM_BUFFER_SIZE:
+                    self._write_chunk(buffer, chunked)
+                    buffer = bytearray()
+            if buffer:
+                self._write_chunk(buffer, chunked)
+            if chunked:
+                self.wfile.write(b'0\r\n\r\n')  # last chunk
+        except Exception as e:  # headers already sent: the truncated response (no last chunk) is the only way to signal the error
+            logger.error(f"Erreur pendant l'envoi du flux : {e}")
+            self.close_connection = True
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+    def _send_event_stream(self, topic, initial):
+        """
+        Start an event stream (Server-Sent Events): send the headers and the initial events, then hand the connection over to the event hub,
+        which sends the notifications of the channel of the route (sse_channel) for the topic. The worker is free for other requests.
+        topic: topic of the notifications sent to this client
+        initial: list of events sent first, dicts {'data': ..., 'event': ... (optional), 'id': ... (optional)}
+        """
+        channel = self._route['sse_channel']
+        if channel is None:
+            logger.error(f"La route {self._route['url']} fournit un flux d'événements sans sse_channel dans le fichier des routes")
+            self._send_error_page(500, "Flux d'événements non configuré pour cette URL.")
+            return
+        if not self.server.events.has_room() or self._events_backlog is None:
+            self._send_unavailable("Trop de flux d'événements ouverts, réessayez dans quelques instants.")
+            return
+        self.send_response(200)
+        self.send_header('Content-type', 'text/event-stream; charset=utf-8')
+        self.send_header('Cache-Control', 'no-store')
+        self.send_header('X-Accel-Buffering', 'no')  # no buffering by a reverse proxy (nginx)
+        self.send_header('Connection', 'close')  # the connection belongs to the event hub after this response
+        self.end_headers()
+        data = bytearray(f"retry: {SSE_RETRY}\n\n".encode('ascii'))
+        for event in initial:
+            data += format_event(event.get('data'), event.get('event'), event.get('id'))
+        try:
+            self.wfile.write(data)
+            self.wfile.flush()
+        except OSError:  # client already gone
+            return
+        sent_ids = {str(event['id']) for event in initial if event.get('id') is not None}
+        self.server.events.subscribe(channel, topic, self.connection, self._events_backlog, sent_ids)
+
+    def _write_chunk(self, data, chunked):
+        """
+        Write a block of a streamed response (with its chunk framing if needed)
+        """
+        if chunked:
+            self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b'\r\n')
+        else:
+            self.wfile.write(data)
+
+    def _timing_headers(self):
+        """
+        Build the Server-Timing header of a route response (database time and number of queries, total time), used by the benchmarks
+        Returns: a dict of headers
+        """
+        total_ms = (perf_counter() - self._request_started) * 1000
+        return {'Server-Timing': f"db;dur={DB_STATS['time'] * 1000:.3f};desc=\"{DB_STATS['queries']} queries\", memo;desc=\"{DB_STATS['memo_hits']} hits\", app;dur={total_ms:.3f}"}
+
+    def _send_error_page(self, response_code, message, headers=None):
+        """
+        Send an error page without closing the connection (unlike send_error)
+        response_code: HTTP status code
+        message: explanation displayed in the page
+        headers: optional dict of additional headers
+        """
+        content = (self.error_message_format % {'code': response_code, 'message': html.escape(message, quote=False), 'explain': self.responses[response_code][1]}).encode('utf-8', 'replace')
+        self._send_content(content, response_code, self.error_content_type, headers)
+
+    def redirect(self, new_url):
         """
         Prepare a HTTP response with redirect to another URL.
         new_url : the destination URL
-        mime_type: type du contenu de la réponse
         """
         self.send_response(303)  # code SEE_OTHER
-        self.send_header('Location', new_url, mime_type=mime_type)
+        self.send_header('Location', new_url)
+        self.send_header('Content-Length', '0')
+        self._send_connection_header()
         self.end_headers()
 
-    def match_route(self, url_path):
+    def match_route(self, route):
         """
-        When URL matches a route (fully or first component only), calls the associated controller and template files
-        url_path: (part of) URL which matches a route
-        Returns: a string contaaining the rendering of the template for the given route 
+        Calls the controller and template files of the route matching the URL
+        route: dict describing the route (see Router)
+        Returns: a string contaaining the rendering of the template for the given route, or the dict REQUEST_VARS['stream'] if the controller streams its response,
+            or the dict REQUEST_VARS['events'] if the controller starts an event stream
         """
-        global SESSION, REQUEST_VARS, GET, POST
-        controleur_file = WebHandler._routes[url_path][0]  # get controller filename corresponding to url_path
-        template_name = WebHandler._routes[url_path][1]  # get template filename corresponding to url_path
+        global SESSION, REQUEST_VARS, GET, POST, FILES
+        controleur_file = route['controleur']  # get controller filename of the route
+        template_name = route['template']  # get template filename of the route
         try:   # import controller file
             spec_controleur = importlib.util.spec_from_file_location("controleur", controleur_file)
             controleur = importlib.util.module_from_spec(spec_controleur)
@@ -69,11 +366,16 @@ class WebHandler(BaseHTTPRequestHandler):
             controleur.REQUEST_VARS = REQUEST_VARS
             controleur.POST = POST
             controleur.GET = GET
+            controleur.FILES = FILES
             spec_controleur.loader.exec_module(controleur)
         except Exception as e:  # print controller error and exit
             traceback.print_exc()
             logger.error(f"Erreur ({controleur_file}) : {e}")
             sys.exit(1)
+        if REQUEST_VARS.get('stream') is not None:  # the controller provides the content of the response itself (e.g., file export): no template
+            return REQUEST_VARS['stream']
+        if REQUEST_VARS.get('events') is not None:  # the controller starts an event stream (Server-Sent Events): no template
+            return REQUEST_VARS['events']
         '''# old version to run controller with exec (many issues such as using classes, import problems, function that cannot call another function)
         with open(controleur_file) as infile:  # execute controller file
             try:
@@ -95,37 +397,163 @@ class WebHandler(BaseHTTPRequestHandler):
 
     def match_url(self):
         """
-        Process an URL for building a response: direct file, path fully matching a route, first component matching a route, or 404 error
+        Process an URL for building a response: route (with its parameters), static file of the website, or 404 error.
+        Only paths under the website directory are looked up on the filesystem, so dynamic routes never cost a stat call.
         """
+        global REQUEST_VARS
         url_path = self.path[1:]  #  remove leading slash
-        url_components = url_path.split('/')
-        if path.isfile(url_path):  # file on the filesystem (image, css, etc.)
-            rawfile = open(url_path, 'rb').read()
-            mimetype = mimetypes.MimeTypes().guess_type(url_path)[0]
-            self._set_response(mime_type=mimetype)
-            self.wfile.write(rawfile)
-        elif url_path in WebHandler._routes:  # load a route (full match)
-            html_content = self.match_route(url_path)
-            self._set_response()
-            self.wfile.write(html_content.encode('utf-8'))
-        elif len(url_components) > 0 and url_components[0] in WebHandler._routes:  # load a route (first component matching)
-            global REQUEST_VARS
-            REQUEST_VARS['url_components'] = url_components  # components may be used by controllers and views
-            html_content = self.match_route(url_components[0])
-            self._set_response()
-            self.wfile.write(html_content.encode('utf-8'))
+        if url_path.startswith('_jobs/'):  # status of a background job (polled by the pages)
+            self._send_job_status(url_path[len('_jobs/'):])
+            return
+        route, params = WebHandler._router.match(url_path)
+        if route is not None:  # load a route
+            if route['methods'] and self.command not in route['methods']:
+                self._send_error_page(405, f"Méthode {self.command} non autorisée pour cette URL.", {'Allow': ', '.join(route['methods'])})
+                return
+            self._route_url = route['url']
+            self._route = route
+            REQUEST_VARS['route_params'] = params  # typed parameters of the route (e.g., {'schema': ..., 'table': ...})
+            REQUEST_VARS['url_components'] = url_path.split('/')  # components may be used by controllers and views
+            REQUEST_VARS['last_event_id'] = self.headers.get('Last-Event-ID')  # identifier of the last event received by a reconnecting event stream
+            self._dispatch_route(route)
+        elif (file_path := self._static_file_path(url_path)) is not None:  # file of the website (image, css, etc.)
+            with open(file_path, 'rb') as infile:
+                rawfile = infile.read()
+            mimetype = mimetypes.MimeTypes().guess_type(file_path)[0] or 'application/octet-stream'
+            self._send_content(rawfile, mime_type=mimetype)
         else:  # error 404
             logger.error(f"Error 404: unable to retrieve file {url_path}")
-            SimpleHTTPRequestHandler.send_error(self, 404, "Aucune route/fichier ne correspond à l'URL demandée.")
+            self._send_error_page(404, "Aucune route/fichier ne correspond à l'URL demandée.")
+
+    def _send_job_status(self, job_id):
+        """
+        Send the status of a background job as JSON (404 if the job is unknown or forgotten)
+        job_id: identifier of the job (see webserver.jobs.Job)
+        """
+        status_file = self.server.jobs.status_file(job_id)
+        if status_file is None:
+            self._send_error_page(404, "Tâche inconnue.")
+            return
+        try:
+            with open(status_file, 'rb') as file:
+                content = file.read()
+        except OSError:
+            self._send_error_page(404, "Tâche inconnue ou expirée.")
+            return
+        self._send_content(content, mime_type='application/json; charset=utf-8', headers={'Cache-Control': 'no-store'})
+
+    def _dispatch_route(self, route):
+        """
+        Serve a route within the admission limits (in-flight requests of all workers, concurrency of the route): 503 if they are reached
+        route: dict describing the route (see Router)
+        """
+        acquired = []
+        try:
+            if self.server.inflight is not None:  # wait for a slot (bounded by the queue timeout)
+                if not self.server.inflight.acquire(True, self.server.queue_timeout):
+                    self._send_unavailable("Le serveur est saturé, réessayez dans quelques instants.")
+                    return
+                acquired.append(self.server.inflight)
+            if route['semaphore'] is not None:  # expensive route: no wait, so that cheap routes are not delayed
+                if not route['semaphore'].acquire(False):
+                    self._send_unavailable(f"Trop de requêtes simultanées sur cette page (maximum {route['max_concurrency']}), réessayez dans quelques instants.")
+                    return
+                acquired.append(route['semaphore'])
+            self._serve_route(route)
+        except RequestTimeout:
+            logger.error(f"Requête {self.command} {self.path} interrompue : délai de {self.server.request_timeout} s dépassé")
+            self._send_unavailable("Le traitement de la requête a dépassé le délai autorisé.")
+        finally:
+            for semaphore in acquired:
+                semaphore.release()
+
+    def _serve_route(self, route):
+        """
+        Serve a route: from the response cache if possible, otherwise by running its controller and template (within the request deadline)
+        route: dict describing the route (see Router)
+        """
+        if route['sse_channel'] is not None:  # event stream: LISTEN before the controller reads the initial events (see EventHub)
+            self._events_backlog = self.server.events.open_backlog(route['sse_channel'])
+            try:
+                self._send_route_response(self._run_route(route))
+            finally:
+                if self._events_backlog is not None:
+                    self.server.events.close_backlog(self._events_backlog)
+            return
+        policy = route['cache'] if self.command == 'GET' else None  # only GET requests are cached (POST may modify data)
+        if policy is None:
+            self._send_route_response(self._run_route(route))
+            return
+        key = self._cache_key(policy)
+        content = self.server.response_cache.get(key)
+        if content is not None:  # cached page: neither controller nor template
+            self._send_route_response(content, 'HIT')
+            return
+        generations = self.server.response_cache.snapshot(policy['tables'])
+        content = self._run_route(route)
+        if isinstance(content, str) and not REQUEST_VARS.get('no_cache'):  # a controller may refuse caching of its page
+            self.server.response_cache.put(key, content, policy['ttl'], policy['tables'], generations)
+        self._send_route_response(content, 'MISS')
+
+    def _run_route(self, route):
+        """
+        Run the controller and template of a route, interrupted (RequestTimeout) if the request deadline is reached.
+        The response itself (e.g., a long stream) is sent after the deadline is disarmed.
+        Returns: the result of match_route
+        """
+        timeout = self.server.request_timeout
+        if not timeout:
+            return self.match_route(route)
+        DEADLINE.update(armed=True, in_db=False, expired=False)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            return self.match_route(route)
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            DEADLINE.update(armed=False, expired=False)
+
+    def _send_unavailable(self, message):
+        """
+        Send a 503 error page with a Retry-After header
+        """
+        self._send_error_page(503, message, {'Retry-After': str(RETRY_AFTER)})
+
+    def _cache_key(self, policy):
+        """
+        Build the key of a page in the response cache: path, query parameters and session values the page varies on
+        policy: cache policy of the route (see WebServer.extract_routes_from_file)
+        """
+        query = tuple(sorted((name, tuple(values)) for name, values in GET.items())) if policy['vary_query'] else ()
+        session = tuple(repr(SESSION.get(name)) for name in policy['vary_session'])
+        return ('page', self.path, query, session)
+
+    def _static_file_path(self, url_path):
+        """
+        Find the file of the website directory designated by a path (no stat call for other paths)
+        url_path: path of the URL, without leading slash (possibly percent-encoded)
+        Returns: the (decoded) path of the file, or None if it is not an existing file of the website directory
+        """
+        file_path = path.normpath(unquote(url_path))
+        if file_path.startswith(WebHandler._static_prefix) and path.isfile(file_path):
+            return file_path
+        return None
 
     def reinit_global_variables(self):
         """
-        Reinitialization of variables REQUEST_VARS, GET and POST
+        Reinitialization of variables REQUEST_VARS, GET, POST and FILES (and database statistics and memoized reads of the request)
         """
-        global REQUEST_VARS, GET, POST
+        global REQUEST_VARS, GET, POST, FILES
         REQUEST_VARS = dict()
         GET = dict()
         POST = dict()
+        FILES = dict()
+        DB_STATS['queries'] = 0
+        DB_STATS['time'] = 0.0
+        DB_STATS['memo_hits'] = 0
+        connexion = SESSION.get('CONNEXION')
+        if isinstance(connexion, WebConnection) and connexion.memo is not None:
+            connexion.memo.new_request()
+        self.server.jobs.apply_completed()  # results of the background jobs finished meanwhile
 
     def do_GET(self):
         """
@@ -136,42 +564,80 @@ class WebHandler(BaseHTTPRequestHandler):
         url_parts = urlparse('http://' + self.client_address[0] + self.path)
         self.path = url_parts[2]  # keep only path without parameters
         GET = parse_qs(url_parts.query)  # store parameters in GET
-        logger.debug(f"{url_parts}\nGET = {GET}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s\nGET = %s", url_parts, GET)
         self.match_url()
 
     def do_POST(self):
         """
-        Process a POST request by retrieving posted data
+        Process a POST request by retrieving posted data (url-encoded form, or multipart form with uploaded files stored in FILES)
         """
         self.reinit_global_variables()
-        global POST
-        content_length = int(self.headers['Content-Length']) # size of POST data
-        post_data = self.rfile.read(content_length).decode('utf-8') # POST data
+        global POST, FILES
+        content_length = int(self.headers.get('Content-Length', 0)) # size of POST data (always read, so the connection can be reused)
+        post_data = self.rfile.read(content_length) # POST data
         url_parts = urlparse('http://' + self.client_address[0] + self.path)
-        POST = parse_qs(post_data)
-        logger.debug(f"{url_parts}\nPOST = {POST}")
+        self.path = url_parts[2]  # keep only path without parameters
+        content_type = self.headers.get('Content-Type', '')
+        if content_type.startswith('multipart/form-data'):
+            POST, FILES = parse_multipart(content_type, post_data)
+        else:
+            POST = parse_qs(post_data.decode('utf-8'))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s\nPOST = %s\nFILES = %s", url_parts, POST, {name: [f['filename'] for f in files] for name, files in FILES.items()})
         self.match_url()
 
 
 class WebServer(HTTPServer):
 
+    request_queue_size = 128  # backlog of the listen socket
+
     def __init__(self, address, handler, directory, **kwargs):
         """
         Initialize the web server: check exposed directory, load routes file, load database config file, load init file
         """
         global SESSION
         SESSION = dict()
+        # metrics (possibly shared with a supervisor process)
+        self.stats = kwargs.get('stats') or WorkerStats(1)
+        self.stats_slot = kwargs.get('stats_slot', 0)
+        # persistent connections (HTTP/1.1 keep-alive)
+        self.keepalive_timeout = kwargs.get('keepalive_timeout') or 5  # idle time (seconds) before closing a connection
+        self.keepalive_max_requests = kwargs.get('keepalive_max_requests') or 100  # requests served on a connection before closing it
+        # admission control: bounded queue of accepted connections, in-flight requests and concurrency per route (semaphores possibly shared with other workers)
+        self.pending = queue.Queue(maxsize=kwargs.get('queue_size') or 16)  # connections waiting for the worker: (socket, address, time of accept, requests served)
+        self.idle = dict()  # parked persistent connections, idle while other clients are served: socket -> (address, idle deadline, requests served)
+        self.idle_lock = threading.Lock()
+        self.parking = None  # (address, idle deadline, requests served) if the connection being processed must be parked instead of closed
+        self.requests_served = 0  # requests already served on the connection being processed
+        self._wakeup = socket.socketpair()  # wakes the acceptor thread up when a connection is parked
+        self._wakeup[1].setblocking(False)
+        self.queue_timeout = kwargs.get('queue_timeout') or 10  # maximum wait (seconds) of a connection in the queue, or for an in-flight slot
+        self.request_timeout = kwargs.get('request_timeout') or 0  # deadline (seconds) of controller + template + database for a request (0: none)
+        self.inflight = kwargs.get('inflight')  # semaphore limiting the requests processed at the same time by all workers (None: no limit)
+        self.route_semaphores = kwargs.get('route_semaphores') or dict()  # url -> semaphore of the routes with max_concurrency
+        self._busy = threading.Event()  # set while the worker processes a connection
+        self._stopping = False
+        if self.request_timeout:
+            signal.signal(signal.SIGALRM, deadline_expired)
+        # response and fragment cache, invalidated by the writes on the database (counters possibly shared with other workers)
+        self.generations = kwargs.get('generations') or TableGenerations()
+        self.no_cache = kwargs.get('no_cache')
+        self.response_cache = ResponseCache(self.generations, 0 if self.no_cache else RESPONSE_CACHE_MAX_ENTRIES)
+        self.memo_ttl = kwargs.get('memo_ttl') or 0  # memoized reads of the models are kept for the request only (0) or for memo_ttl seconds
         # check directory to serve
         self.directory = directory
         if self.directory is None or not path.isdir(self.directory):
             logger.error(f"Directory {self.directory} does not exist (or is not readable).")
             sys.exit(1)
         SESSION['DIRECTORY'] = directory
+        SESSION['WORKER_SLOT'] = self.stats_slot  # index of the worker in pre-fork mode (0: single process or first worker), e.g. to run startup jobs once
         sys.path.append(self.directory)  # served directory is added to path for searching packages
         # check routing
         self.routes_file = kwargs.get('routes_file')
-        routes = self.extract_routes_from_file(self.routes_file)  # load routes
-        handler._routes = routes
+        handler._router = self.extract_routes_from_file(self.routes_file)  # load routes
+        static_prefix = path.normpath(self.directory)
+        handler._static_prefix = '' if static_prefix == '.' else static_prefix + os.sep
         # check and load database config file
         self.no_db = kwargs.get('no_db')  # True if not using database
         if self.no_db is False:  # load DB config
@@ -180,6 +646,12 @@ class WebServer(HTTPServer):
             if kwargs.get('schema'):  # schema name provided, replaces the config file schema name
                 config['POSTGRESQL_SCHEMA'] = kwargs.get('schema')
             self.connect_database(config)  # connect to PostgreSQL using config
+        # background jobs (status files in a directory possibly shared with other workers)
+        self.jobs_dir = kwargs.get('jobs_dir') or create_jobs_dir()
+        self.jobs = JobQueue(self.jobs_dir, None if self.no_db else self.connect_job_database, kwargs.get('job_workers', 2), kwargs.get('job_retention') or 600)
+        SESSION['JOBS'] = self.jobs
+        # event streams (Server-Sent Events) fed by the notifications of the database (one listener connection for all the clients of the worker)
+        self.events = EventHub(None if self.no_db else self.connect_job_database)
         # check and execute init_file
         self.init_file = kwargs.get('init_file')
         check_init = self.check_exists_file(self.init_file)
@@ -188,11 +660,167 @@ class WebServer(HTTPServer):
                 exec(infile.read())  # security issues, but we assume that the script is run locally only
         # setup jinja templates
         self.env = Environment(  # class variable for Jinja template environment (templates_dir doit être en premier)
-            loader=FileSystemLoader([kwargs.get('templates_dir'), self.directory, self.directory + '/templates', ]),
-            autoescape=select_autoescape()
+            loader=FileSystemLoader([kwargs.get('templates_dir'), self.directory, self.directory + '/templates', TEMPLATES_DIR]),
+            autoescape=select_autoescape(),
+            extensions=[FragmentCacheExtension]
         )
+        self.env.fragment_cache = self.response_cache
         self.env.globals['url_for'] = self.url_for  # function that can be called within template
-        super().__init__(address, handler)
+        listen_socket = kwargs.get('listen_socket')  # socket already bound by a supervisor (pre-fork mode)
+        super().__init__(address, handler, bind_and_activate=listen_socket is None)
+        if listen_socket is not None:  # replace the unbound socket created by HTTPServer by the inherited one
+            self.socket.close()
+            self.socket = listen_socket
+            self.server_address = listen_socket.getsockname()
+            self.server_name, self.server_port = self.server_address[:2]
+
+    def serve_forever(self, poll_interval=0.5):
+        """
+        Serve the connections: an acceptor thread accepts the connections into a bounded queue (or rejects them with a 503 when it is full),
+        the main thread processes the queued connections one by one (connections which waited too long are rejected with a 503)
+        """
+        self._stopping = False
+        self.socket.setblocking(False)  # accept() must not block when another worker took the connection
+        threading.Thread(target=self._accept_connections, name='acceptor', daemon=True).start()
+        try:
+            while not self._stopping:
+                try:
+                    connection, client_address, accepted, self.requests_served = self.pending.get(timeout=poll_interval)
+                except queue.Empty:
+                    continue
+                if monotonic() - accepted > self.queue_timeout:  # the client has waited too long: shed the request
+                    self.reject(connection)
+                    continue
+                self._busy.set()
+                self.parking = None
+                try:
+                    self.process_request(connection, client_address)
+                except Exception:
+                    self.handle_error(connection, client_address)
+                    self.shutdown_request(connection)
+                finally:
+                    self._busy.clear()
+        finally:
+            self._stopping = True
+
+    def _accept_connections(self):
+        """
+        Body of the acceptor thread: accept connections into the queue. A busy worker lets idle workers take new connections first,
+        and only takes the connections still waiting after ACCEPT_GRACE (all workers busy).
+        The parked connections are queued again when their next request arrives (see park).
+        """
+        while not self._stopping:
+            try:
+                with self.idle_lock:
+                    idle = list(self.idle)
+                ready = select.select([self.socket, self._wakeup[0]] + idle, [], [], 0.5)[0]
+                if self._wakeup[0] in ready:
+                    self._wakeup[0].recv(4096)
+                self._resume_idle([connection for connection in ready if connection in idle])
+                if self.socket not in ready:
+                    continue
+                if self._busy.is_set() or not self.pending.empty():
+                    sleep(ACCEPT_GRACE)
+                    if not select.select([self.socket], [], [], 0)[0]:  # taken by another worker
+                        continue
+                connection, client_address = self.socket.accept()
+            except (BlockingIOError, InterruptedError):  # taken by another worker
+                continue
+            except (OSError, ValueError):  # socket closed
+                break
+            try:
+                self.pending.put_nowait((connection, client_address, monotonic(), 0))
+            except queue.Full:  # saturated: fast rejection
+                logger.warning(f"File d'attente pleine ({self.pending.maxsize} connexions) : requête de {client_address[0]} rejetée (503)")
+                self.reject(connection)
+
+    def park(self, connection, client_address, deadline, requests_served):
+        """
+        Set an idle persistent connection aside while other clients are served, instead of closing it:
+        the acceptor thread queues it again when its next request arrives, or closes it at its idle deadline
+        """
+        with self.idle_lock:
+            self.idle[connection] = (client_address, deadline, requests_served)
+        try:
+            self._wakeup[1].send(b'\0')
+        except BlockingIOError:  # acceptor thread already woken up
+            pass
+
+    def _resume_idle(self, ready):
+        """
+        Queue again the parked connections which received data (next request, or end of connection), close the expired ones
+        ready: parked connections reported readable by select
+        """
+        now = monotonic()
+        with self.idle_lock:
+            resumed = [(connection, self.idle.pop(connection)) for connection in ready if connection in self.idle]
+            expired = [connection for connection, (_, deadline, _) in self.idle.items() if deadline <= now]
+            for connection in expired:
+                del self.idle[connection]
+        for connection in expired:
+            super().shutdown_request(connection)
+        for connection, (client_address, _, requests_served) in resumed:
+            try:
+                self.pending.put_nowait((connection, client_address, now, requests_served))
+            except queue.Full:  # saturated: fast rejection
+                self.reject(connection)
+
+    def reject(self, connection):
+        """
+        Answer a connection with a minimal 503 response (without reading the request) and close it
+        """
+        body = b"<html><body><h1>503 Service Unavailable</h1><p>Serveur satur\xc3\xa9, r\xc3\xa9essayez dans quelques instants.</p></body></html>"
+        try:
+            connection.setblocking(True)
+            connection.settimeout(1)
+            connection.sendall(b"HTTP/1.1 503 Service Unavailable\r\nContent-Type: text/html; charset=utf-8\r\nRetry-After: " + str(RETRY_AFTER).encode('ascii')
+                               + b"\r\nContent-Length: " + str(len(body)).encode('ascii') + b"\r\nConnection: close\r\n\r\n" + body)
+        except OSError:
+            pass
+        self.record_response(503)
+        super().shutdown_request(connection)  # not self.shutdown_request: also called by the acceptor thread (see parking)
+
+    def has_waiting_clients(self):
+        """
+        Returns: True if connections wait for this worker (in its queue or on the listen socket)
+        """
+        return not self.pending.empty() or bool(select.select([self.socket], [], [], 0)[0])
+
+    def shutdown(self):
+        self._stopping = True
+
+    def shutdown_request(self, request):
+        """
+        Close a connection after its last request, unless it has been handed over to the event hub or parked (see park)
+        """
+        if self.events.owns(request):
+            return
+        if self.parking is not None:
+            self.park(request, *self.parking)
+            self.parking = None
+            return
+        super().shutdown_request(request)
+
+    def server_close(self):
+        self._stopping = True
+        self.jobs.stop()
+        self.events.stop()
+        super().server_close()
+        while not self.pending.empty():  # connections accepted but not served
+            self.shutdown_request(self.pending.get_nowait()[0])
+        with self.idle_lock:
+            idle, self.idle = list(self.idle), dict()
+        for connection in idle:
+            super().shutdown_request(connection)
+        for wakeup in self._wakeup:
+            wakeup.close()
+
+    def record_response(self, response_code):
+        """
+        Record a response in the metrics of this server (worker)
+        response_code: HTTP status code of the response
+        """
+        self.stats.record(self.stats_slot, response_code)
 
     def url_for(self, static_file):
         """
@@ -231,11 +859,11 @@ class WebServer(HTTPServer):
 
     def extract_routes_from_file(self, routes_file):
         """
-        Read the routes file (list of dicts) and check/transform the routes as a dict of tuples
+        Read the routes file (list of dicts), check the routes and compile them into a Router
         routes_file: file path for routes
-        Returns: a dictionary object containing routes as {url1: (controleur1, template1), url2: (controleur2, template2), ...}
+        Returns: a Router object, whose routes are dicts {'url': ..., 'controleur': ..., 'template': ..., 'methods': ..., 'cache': ..., 'max_concurrency': ..., 'semaphore': ..., 'sse_channel': ...}
         """
-        output_routes = dict()
+        router = Router()
         check_file = self.check_exists_file(routes_file)
         if not check_file:  # if no route file, exit
             sys.exit(1)
@@ -244,16 +872,40 @@ class WebServer(HTTPServer):
             url = r['url']
             controleur = r['controleur']
             template = r['template']
+            methods = [m.upper() for m in r.get('methods', [])]  # allowed HTTP methods (all if empty)
+            cache = self.parse_cache_policy(url, r.get('cache'))
+            max_concurrency = r.get('max_concurrency')  # maximum number of requests processed at the same time on this route (all workers)
             controleur_filepath = path.join(self.directory, controleur)
             template_filepath = path.join(self.directory, template)
             if not path.isfile(controleur_filepath):
                 logger.warning(f"Le fichier {controleur_filepath} (pour la route {url}) n'existe pas !")
-            else:
-                output_routes[url] = (controleur_filepath, template)
-        logger.info(f"Fichier {routes_file} : {len(output_routes)} routes trouvées")
-        return output_routes
+                continue
+            try:
+                router.add(url, {'url': url, 'controleur': controleur_filepath, 'template': template, 'methods': methods, 'cache': cache,
+                                 'max_concurrency': max_concurrency, 'semaphore': self.route_semaphores.get(url), 'sse_channel': r.get('sse_channel')})
+            except ValueError as e:
+                logger.error(f"Fichier {routes_file} : {e}")
+                sys.exit(1)
+        logger.info(f"Fichier {routes_file} : {len(router)} routes trouvées")
+        return router
+
+    def parse_cache_policy(self, url, cache):
+        """
+        Check the cache policy of a route, e.g. cache = { ttl = 60, vary_query = true, vary_session = ["USER"], tables = ["team", "game"] }
+        ttl: time to live of a cached page (seconds)
+        vary_query: the query parameters are part of the cache key (default true)
+        vary_session: SESSION keys whose values are part of the cache key (default none)
+        tables: tables the page depends on, a write on them invalidates the page (default: any table)
+        Returns: a dict, or None if the route is not cached (or exit on an invalid policy)
+        """
+        if cache is None:
+            return None
+        if not isinstance(cache, dict) or not isinstance(cache.get('ttl'), (int, float)) or cache['ttl'] <= 0:
+            logger.error(f"Politique de cache invalide pour la route {url} (ttl positif obligatoire) : {cache}")
+            sys.exit(1)
+        return {'ttl': cache['ttl'], 'vary_query': cache.get('vary_query', True), 'vary_session': list(cache.get('vary_session', [])), 'tables': cache.get('tables')}
 
-    def get_connexion(self, host, username, password, db, schema, port):
+    def get_connexion(self, host, username, password, db, schema, port, statement_timeout=0):
         """
         Connect to the database using provided parameters
         host: database server
@@ -261,10 +913,12 @@ class WebServer(HTTPServer):
         db: name of the database to connect to
         schema: database schema to use
         port: database port on which the server listens
+        statement_timeout: maximum duration (seconds) of a query, cancelled by PostgreSQL beyond (0: no limit)
         Returns: a database connection object (link), or None
         """
+        options = f"-c statement_timeout={int(statement_timeout * 1000)}" if statement_timeout else None
         try:
-            connexion = psycopg.connect(host=host, user=username, password=password, dbname=db, port=port, autocommit=True)
+            connexion = WebConnection.connect(host=host, user=username, password=password, dbname=db, port=port, autocommit=True, cursor_factory=InstrumentedCursor, options=options)
             cursor = psycopg.ClientCursor(connexion)  # client-side cursor (because of the SET query)
             cursor.execute("SET search_path TO %s", [schema])  # set path to database schema
         except Exception as e:
@@ -272,6 +926,19 @@ class WebServer(HTTPServer):
             return None
         return connexion
 
+    def connect_job_database(self):
+        """
+        Open a database connection for a job thread (same configuration as the connection of the requests)
+        Returns: a database connection object (exception on error)
+        """
+        config = self.db_config
+        connexion = self.get_connexion(config['POSTGRESQL_SERVER'], config['POSTGRESQL_USER'], config['POSTGRESQL_PASSWORD'], config['POSTGRESQL_DATABASE'], config.get('POSTGRESQL_SCHEMA', 'public'), config.get('POSTGRESQL_PORT', 5432))
+        if connexion is None:
+            raise RuntimeError("Connexion au SGBD impossible pour la tâche")
+        connexion.in_request = False
+        connexion.add_write_listener(self.generations.bump)  # writes of jobs invalidate cached pages, fragments and memoized reads
+        return connexion
+
     def connect_database(self, config):
         """
         Manage the connection to the database: extract values from config, manage connection error or success
@@ -279,7 +946,8 @@ class WebServer(HTTPServer):
         Returns: True (or exit with code 2 on error)
         """
         global SESSION
-        connexion = self.get_connexion(config['POSTGRESQL_SERVER'], config['POSTGRESQL_USER'], config['POSTGRESQL_PASSWORD'], config['POSTGRESQL_DATABASE'], config.get('POSTGRESQL_SCHEMA', 'public'), config.get('POSTGRESQL_PORT', 5432))
+        self.db_config = config
+        connexion = self.get_connexion(config['POSTGRESQL_SERVER'], config['POSTGRESQL_USER'], config['POSTGRESQL_PASSWORD'], config['POSTGRESQL_DATABASE'], config.get('POSTGRESQL_SCHEMA', 'public'), config.get('POSTGRESQL_PORT', 5432), self.request_timeout)
         if connexion is None:
             logger.error("Erreur de connexion au SGBD. Vérifiez les paramètres saisis dans le fichier de configuration toml.")
             sys.exit(2)
@@ -291,6 +959,9 @@ class WebServer(HTTPServer):
             SESSION["SCHEMA"] = config.get('POSTGRESQL_SCHEMA', 'public')
             SESSION["DB_PORT"] = config.get('POSTGRESQL_PORT', 5432)
             SESSION["CONNEXION"] = connexion
+            connexion.add_write_listener(self.generations.bump)  # writes invalidate cached pages, fragments and memoized reads
+            if not self.no_cache:
+                connexion.memo = ReadMemo(self.generations, self.memo_ttl)
         return True
 
 
@@ -308,9 +979,47 @@ def create_boilerplate(directory):
     with open(path.join(directory, 'init.py'), 'w') as file:
         file.write("\"\"\"\nFicher initialisation (eg, constantes chargées au démarrage dans la session)\n\"\"\"")
     with open(path.join(directory, 'routes.toml'), 'w') as file:
-        file.write("# Définition d'un tableau de routes au format TOML (https://toml.io/)\n# - url : chemin dans l'URL\n# - controleur : chemin vers le fichier du controleur\n# - template : chemin vers le fichier de template")
+        file.write("# Définition d'un tableau de routes au format TOML (https://toml.io/)\n# - url : chemin dans l'URL, avec éventuellement des paramètres typés (ex : \"t/<schema>/<table>\", \"partie/<int:id>\")\n#   dont les valeurs sont disponibles dans REQUEST_VARS['route_params']\n# - controleur : chemin vers le fichier du controleur\n# - template : chemin vers le fichier de template\n# - methods (optionnel) : méthodes HTTP autorisées (ex : [\"GET\"]), toutes par défaut\n# - max_concurrency (optionnel) : nombre maximum de requêtes traitées en même temps sur la route (503 au-delà)\n# - sse_channel (optionnel) : canal PostgreSQL (LISTEN) des flux d'événements démarrés par le controleur avec REQUEST_VARS['events']")
     return True
 
+
+def build_server(args, server_address, limits=None, **kwargs):
+    """
+    Create a WebServer from the script arguments
+    args: parsed arguments of the script
+    server_address: (host, port) on which the server listens
+    limits: semaphores of admission control (see create_limits), created if not provided
+    kwargs: additional parameters for WebServer (e.g., listen_socket, stats, stats_slot, generations in pre-fork mode)
+    Returns: a WebServer object
+    """
+    if limits is None:
+        limits = create_limits(args)
+    start_log_pipeline(args.access_log)  # in the process which serves (after fork in pre-fork mode)
+    return WebServer(server_address, WebHandler, directory=args.directory, routes_file=args.routes, config_db_file=args.config_db, init_file=args.init, templates_dir=args.templates, schema=args.schema, no_db=args.no_db, keepalive_timeout=args.keepalive_timeout, keepalive_max_requests=args.keepalive_max, no_cache=args.no_cache, memo_ttl=args.memo_ttl, job_workers=args.job_workers, job_retention=args.job_retention,
+                     queue_size=args.queue_size, queue_timeout=args.queue_timeout, request_timeout=args.request_timeout, **limits, **kwargs)  # dashes (no-db) are converted into underscores (no_db)
+
+
+def run_worker(args, server_address, listen_socket, stats, slot, generations, limits, jobs_dir):
+    """
+    Body of a forked worker: create its own WebServer (own DB connection, own caches) on the inherited socket, and serve forever
+    Never returns (the worker process exits with the code of the server)
+    """
+    exit_code = 1
+    try:
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))  # graceful stop requested by the supervisor
+        httpd = build_server(args, server_address, listen_socket=listen_socket, stats=stats, stats_slot=slot, generations=generations, limits=limits, jobs_dir=jobs_dir)
+        httpd.serve_forever()
+    except KeyboardInterrupt:  # Ctrl-C is sent to the whole process group, the supervisor decides what to do
+        exit_code = 0
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else 1
+    except Exception:
+        traceback.print_exc()
+    finally:
+        stop_log_pipeline()  # os._exit does not run atexit functions
+        os._exit(exit_code)  # do not run the code of the supervisor after fork
+
+
 #########################################################
 # main: process script arguments, and run/reboot server
 #########################################################
@@ -322,11 +1031,26 @@ if __name__ == '__main__':
     parser.add_argument('-c', '--config-db', default="config-bd.toml", help='filepath of the required database configuration TOML file (default config-bd.toml)')
     parser.add_argument('-i', '--init', default=argparse.SUPPRESS, help='filepath of an optional init python file, executed once at startup (default <directory>/init.py)')
     parser.add_argument('-n', '--no-db', action='store_true')
+    parser.add_argument('--no-cache', action='store_true', help='disable the response cache of routes, the {%% cache %%} fragments and the memoization of model reads')
+    parser.add_argument('--memo-ttl', default=0, type=float, help='keep the memoized results of model reads for this time (seconds) across requests, until a write on their tables (default 0: current request only)')
+    parser.add_argument('--log-level', default='debug', choices=['debug', 'info', 'warning', 'error'], help='minimum level of the messages of the server log (default debug)')
+    parser.add_argument('--access-log', default=None, help="file receiving one JSON line per request (route, status, bytes, durations), '-' for standard output (default: none)")
+    parser.add_argument('--job-workers', default=2, type=int, help='number of threads running the background jobs of controllers, per worker (default 2, 0: jobs run during the request)')
+    parser.add_argument('--job-retention', default=600, type=float, help='time (seconds) during which the status of a finished job can be polled (default 600)')
     parser.add_argument('-p', '--port', default=4242, type=int, help='port on which web server listens')
+    parser.add_argument('--host', default='127.0.0.1', help="address on which web server listens (default 127.0.0.1, '' for all interfaces)")
+    parser.add_argument('--keepalive-timeout', default=5, type=float, help='idle time (seconds) before closing a persistent connection (default 5)')
+    parser.add_argument('--keepalive-max', default=100, type=int, help='maximum number of requests served on a persistent connection (default 100)')
+    parser.add_argument('--max-inflight', default=0, type=int, help='maximum number of requests processed at the same time by all workers, others wait up to --queue-timeout then get a 503 (default 0: no limit)')
+    parser.add_argument('--queue-size', default=16, type=int, help='maximum number of accepted connections waiting for a worker, beyond which new connections get a 503 (default 16)')
+    parser.add_argument('--queue-timeout', default=10, type=float, help='maximum wait (seconds) of a request before being processed, beyond which it gets a 503 (default 10)')
+    parser.add_argument('--request-timeout', default=0, type=float, help='deadline (seconds) of a request for controller, template and database queries, beyond which it gets a 503 (default 0: no deadline)')
+    parser.add_argument('-w', '--workers', default=1, type=int, help='number of worker processes (pre-fork mode when > 1, default 1)')
     parser.add_argument('-r', '--routes', default=argparse.SUPPRESS, help='filepath of the required routes TOML file (default <directory>/routes.tml)')
     parser.add_argument('-s', '--schema', default=None, help='schema name for database (it replaces the schema name in config file if present)')
     parser.add_argument('-t', '--templates', default=argparse.SUPPRESS, help='filepath of an additional templates directory')
     args = parser.parse_args()
+    logzero.loglevel(getattr(logging, args.log_level.upper()))
     if args.boilerplate:  # special option to create a new empty website (does not run server)
         success = create_boilerplate(args.directory)
         if success:
@@ -341,16 +1065,24 @@ if __name__ == '__main__':
     if 'templates' not in args:  # if no template directory, default value set to <directory>
         args.templates = path.join(args.directory)
 
-    server_address = ('127.0.0.1', args.port)  # '127.0.0.1' ('' is for all interfaces)
+    server_address = (args.host, args.port)  # '127.0.0.1' ('' is for all interfaces)
+    httpd = None
     while True:
         try:
-            httpd = WebServer(server_address, WebHandler, directory=args.directory, routes_file=args.routes, config_db_file=args.config_db, init_file=args.init, templates_dir=args.templates, schema=args.schema, no_db=args.no_db)  # dashes (no-db) are converted into underscores (no_db)
-            logger.info(f"Démarrage du serveur httpd pour exposer {args.directory}...")
-            logger.info(f"Redémarrez ou quitter le serveur avec Ctrl-C. Mais vous devez arrêter puis relancer le serveur si vous modifiez un fichier du modèle, le fichier de routes ou celui d'initialisation.")
-            logger.info(f"Allez sur http://localhost:{args.port}/")
-            httpd.serve_forever()
+            if args.workers > 1:  # pre-fork mode: the supervisor never serves requests itself
+                logger.info(f"Démarrage du serveur httpd ({args.workers} workers) pour exposer {args.directory}...")
+                logger.info(f"Allez sur http://localhost:{args.port}/")
+                serve_prefork(args, server_address, args.workers, run_worker)
+            else:
+                httpd = build_server(args, server_address)
+                logger.info(f"Démarrage du serveur httpd pour exposer {args.directory}...")
+                logger.info(f"Redémarrez ou quitter le serveur avec Ctrl-C. Mais vous devez arrêter puis relancer le serveur si vous modifiez un fichier du modèle, le fichier de routes ou celui d'initialisation.")
+                logger.info(f"Allez sur http://localhost:{args.port}/")
+                httpd.serve_forever()
         except KeyboardInterrupt:
             try:
+                if httpd is not None:
+                    log_stats(httpd.stats)
                 logger.info("Redémarrage du serveur dans 2 secondes...")
                 logger.info("Appuyer sur Ctrl-C à nouveau pour quitter.")
                 sleep(1)
@@ -359,9 +1091,10 @@ if __name__ == '__main__':
                 for p in pathlib.Path(args.directory).rglob('__pycache__'):
                     logger.info(f"Suppression du répertoire de cache {p}")
                     rmtree(p, True)
-                httpd.server_close()
+                if httpd is not None:
+                    httpd.server_close()
             except KeyboardInterrupt:  # exit
                 break
     logger.info('Arrêt du server httpd.')
-    httpd.server_close()
-
+    if httpd is not None:
+        httpd.server_close()
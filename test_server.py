@@ -0,0 +1,188 @@
+from server import Router
+
+
+def make_router():
+    router = Router()
+    router.add('', {'name': 'index'})
+    router.add('equipe', {'name': 'equipes'})
+    router.add('partie/<int:id>', {'name': 'partie'})
+    router.add('partie/<int:id>/direct', {'name': 'direct'})
+    router.add('serie/<nom>', {'name': 'serie'})
+    return router
+
+
+def test_int_parameter():
+    route, params = make_router().match('partie/42/direct')
+    assert route['name'] == 'direct' and params == {'id': 42}
+
+
+def test_int_parameter_rejects_non_digits():
+    assert make_router().match('partie/abc') == (None, None)
+
+
+def test_str_parameter_is_decoded():
+    route, params = make_router().match('serie/AC%2FDC%20live')
+    assert route['name'] == 'serie' and params == {'nom': 'AC/DC live'}
+
+
+def test_static_prefix_and_root():
+    router = make_router()
+    assert router.match('equipe/xyz')[0]['name'] == 'equipes'
+    assert router.match('')[0]['name'] == 'index'
+    assert router.match('inconnu') == (None, None)
+
+
+# ---------------------------------------------------------------------
+# Persistent connections (a WebServer without database on a minimal site)
+# ---------------------------------------------------------------------
+
+import socket  # noqa: E402
+import threading  # noqa: E402
+from contextlib import contextmanager  # noqa: E402
+from time import monotonic, sleep  # noqa: E402
+
+import pytest  # noqa: E402
+
+from server import WebServer, WebHandler  # noqa: E402
+
+
+@contextmanager
+def serve(site, **kwargs):
+    """
+    Run a WebServer without database on a minimal site: routes page (?n=...) and lente (controller sleeping ?s=... seconds)
+    """
+    (site / 'templates').mkdir(exist_ok=True)
+    (site / 'controleurs').mkdir(exist_ok=True)
+    (site / 'routes.toml').write_text('[[routes]]\nurl = "page"\ncontroleur = "controleurs/page.py"\ntemplate = "templates/page.html"\n'
+                                      '[[routes]]\nurl = "lente"\ncontroleur = "controleurs/lente.py"\ntemplate = "templates/page.html"\n')
+    (site / 'controleurs' / 'page.py').write_text("REQUEST_VARS['n'] = GET.get('n', ['?'])[0]\n")
+    (site / 'controleurs' / 'lente.py').write_text("from time import sleep\nsleep(float(GET['s'][0]))\nREQUEST_VARS['n'] = 'lente'\n")
+    (site / 'templates' / 'page.html').write_text("page {{ REQUEST_VARS['n'] }}")
+    server = WebServer(('127.0.0.1', 0), WebHandler, directory=str(site), routes_file=str(site / 'routes.toml'),
+                       init_file=str(site / 'init.py'), templates_dir=str(site), no_db=True, **{'keepalive_timeout': 3, **kwargs})
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        thread.join(timeout=5)
+        server.server_close()
+
+
+@pytest.fixture
+def web_server(tmp_path):
+    with serve(tmp_path) as server:
+        yield server
+
+
+def connect(server):
+    client = socket.create_connection(server.server_address, timeout=2)
+    return client, client.makefile('rb')
+
+
+def request(n):
+    return f"GET /page?n={n} HTTP/1.1\r\nHost: test\r\n\r\n".encode('ascii')
+
+
+def read_response(reader):
+    """
+    Read a response framed by its Content-Length: (status line, headers, body)
+    """
+    status = reader.readline().decode('latin-1').strip()
+    headers = {}
+    for line in iter(reader.readline, b'\r\n'):
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return status, headers, reader.read(int(headers['content-length']))
+
+
+def test_keep_alive_responses_are_framed_by_content_length(web_server):
+    client, reader = connect(web_server)
+    for n in (1, 2, 3):
+        client.sendall(request(n))
+        status, headers, body = read_response(reader)
+        assert status.endswith('200 OK') and headers['connection'] == 'keep-alive'
+        assert body == f"page {n}".encode()
+    client.close()
+
+
+def test_pipelined_requests_do_not_wait_for_the_idle_timeout(web_server):
+    client, reader = connect(web_server)
+    started = monotonic()
+    client.sendall(request(1) + request(2))  # the second request is read with the first one (buffered)
+    assert [read_response(reader)[2] for _ in range(2)] == [b"page 1", b"page 2"]
+    assert monotonic() - started < 1
+    client.close()
+
+
+def test_idle_connection_is_parked_not_closed_for_another_client(web_server):
+    first, first_reader = connect(web_server)
+    first.sendall(request(1))
+    assert read_response(first_reader)[2] == b"page 1"
+    second, second_reader = connect(web_server)  # served while the first connection is idle
+    started = monotonic()
+    second.sendall(request(2))
+    assert read_response(second_reader)[2] == b"page 2"
+    assert monotonic() - started < 1
+    first.sendall(request(3))  # the first connection is still open
+    assert read_response(first_reader)[2] == b"page 3"
+    first.close()
+    second.close()
+
+
+# ---------------------------------------------------------------------
+# Admission control (load shedding)
+# ---------------------------------------------------------------------
+
+def get(server, url):
+    """
+    Send a request on a new connection (without waiting for the response)
+    """
+    client, reader = connect(server)
+    client.sendall(f"GET {url} HTTP/1.1\r\nHost: test\r\nConnection: close\r\n\r\n".encode('ascii'))
+    return client, reader
+
+
+def test_full_queue_is_shed_with_503(tmp_path):
+    with serve(tmp_path, queue_size=1) as server:
+        busy = get(server, '/lente?s=0.8')
+        sleep(0.2)  # processed by the worker
+        queued = get(server, '/page?n=2')
+        sleep(0.2)  # in the queue
+        status, headers, _ = read_response(get(server, '/page?n=3')[1])
+        assert status.endswith('503 Service Unavailable') and headers['retry-after'] == '2'
+        assert read_response(busy[1])[2] == b"page lente"
+        assert read_response(queued[1])[2] == b"page 2"
+
+
+def test_request_waiting_beyond_the_queue_timeout_is_shed(tmp_path):
+    with serve(tmp_path, queue_timeout=0.2) as server:
+        busy = get(server, '/lente?s=0.6')
+        sleep(0.1)
+        late = get(server, '/page?n=2')
+        assert read_response(late[1])[0].endswith('503 Service Unavailable')
+        assert read_response(busy[1])[2] == b"page lente"
+
+
+def test_route_concurrency_limit_answers_503_without_waiting(tmp_path):
+    semaphore = threading.BoundedSemaphore(1)
+    with serve(tmp_path, route_semaphores={'page': semaphore}) as server:
+        semaphore.acquire()  # the only slot is taken (e.g., by another worker)
+        started = monotonic()
+        status, headers, body = read_response(get(server, '/page?n=1')[1])
+        assert status.endswith('503 Service Unavailable') and 'retry-after' in headers
+        assert monotonic() - started < 0.5
+        semaphore.release()
+        assert read_response(get(server, '/page?n=2')[1])[2] == b"page 2"
+
+
+def test_inflight_limit_waits_up_to_the_queue_timeout(tmp_path):
+    inflight = threading.BoundedSemaphore(1)
+    with serve(tmp_path, inflight=inflight, queue_timeout=0.3) as server:
+        inflight.acquire()  # all the slots are taken by other workers
+        started = monotonic()
+        assert read_response(get(server, '/page?n=1')[1])[0].endswith('503 Service Unavailable')
+        assert 0.25 < monotonic() - started < 2
+        inflight.release()
+        assert read_response(get(server, '/page?n=2')[1])[2] == b"page 2"
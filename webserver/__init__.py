@@ -0,0 +1,20 @@
+#########################################
+#  Etudiants : ne pas modifier ce fichier
+#########################################
+
+"""
+Infrastructure of server.py (the web server of the websites), one module per concern:
+  - db: database connection of the server (statistics, deadline of the requests, detection of writes)
+  - cache: response and fragment cache, memoization of model reads, write counters shared by the workers
+  - router: compiled route table
+  - jobs: background jobs of the controllers
+  - events: Server-Sent Events fed by PostgreSQL notifications
+  - logs: logging out of the request path and JSON access log
+  - multipart: parsing of multipart/form-data requests
+  - prefork: pre-fork mode (supervisor, shared metrics and admission limits)
+and templates/, the templates shared by all the websites (ex : _job.html, widget following a background job).
+"""
+
+from os import path
+
+TEMPLATES_DIR = path.join(path.dirname(__file__), 'templates')  # last directory of the template loader of every website
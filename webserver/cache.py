@@ -0,0 +1,173 @@
+#########################################
+#  Etudiants : ne pas modifier ce fichier
+#########################################
+
+"""
+Response and fragment cache, memoization of the read functions of the models, write counters of the tables shared by the workers
+"""
+
+import zlib
+from collections import OrderedDict
+from copy import deepcopy
+from multiprocessing.sharedctypes import RawArray
+from time import monotonic
+from jinja2 import nodes
+from jinja2.ext import Extension
+from webserver.db import DB_STATS
+
+RESPONSE_CACHE_MAX_ENTRIES = 256  # maximum number of cached pages and fragments (per worker)
+FRAGMENT_CACHE_TTL = 60  # default time to live (seconds) of a fragment cached with {% cache %}
+TABLE_GENERATION_SLOTS = 1024  # number of shared write counters (table names are hashed into these slots)
+READ_MEMO_MAX_ENTRIES = 512  # maximum number of memoized results of model read functions (per worker)
+
+
+class TableGenerations:
+    """
+    Write counters of the tables, in an anonymous shared memory created before fork (so that a write in a worker invalidates the caches of all workers).
+    Table names are hashed into slots; slot 0 counts the writes on unknown tables, slot 1 counts all the writes.
+    A cached entry stores the counters of the tables it depends on, and is valid while these counters are unchanged.
+    """
+
+    def __init__(self, nb_slots=TABLE_GENERATION_SLOTS):
+        self.nb_slots = nb_slots
+        self.counters = RawArray('Q', nb_slots)  # no lock: a lost increment is very unlikely and only delays an invalidation until the next write
+
+    def slots(self, tables):
+        """
+        Slots of a list of tables (None: any table)
+        """
+        if tables is None:
+            return (0, 1)
+        return (0,) + tuple(sorted({zlib.crc32(t.lower().encode('utf-8')) % (self.nb_slots - 2) + 2 for t in tables}))
+
+    def snapshot(self, slots):
+        return tuple(self.counters[slot] for slot in slots)
+
+    def bump(self, tables):
+        """
+        Record a write on the given tables (None: unknown tables, every cached entry becomes invalid)
+        Used as write listener of the database connection
+        """
+        if tables is None:
+            self.counters[0] += 1
+        else:
+            for slot in self.slots(tables)[1:]:
+                self.counters[slot] += 1
+        self.counters[1] += 1
+
+
+class ResponseCache:
+    """
+    LRU cache of rendered pages and template fragments, with a time to live per entry,
+    invalidated by the writes on the tables each entry depends on (see TableGenerations).
+    """
+
+    def __init__(self, generations, max_entries=RESPONSE_CACHE_MAX_ENTRIES):
+        self.generations = generations
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (expiration time, content, slots of the tables, counters of the slots), from least to most recently used
+
+    def get(self, key):
+        """
+        Returns: the cached content for the key, or None if absent, expired or invalidated by a write
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires, content, slots, generations = entry
+        if expires < monotonic() or self.generations.snapshot(slots) != generations:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return content
+
+    def put(self, key, content, ttl, tables=None, generations=None):
+        """
+        Store a content
+        ttl: time to live (seconds)
+        tables: names of the tables the content depends on (None: any table)
+        generations: counters of these tables read (with snapshot) before computing the content, so that a write made meanwhile
+        (e.g., by another worker) invalidates it (default: current counters)
+        """
+        slots = self.generations.slots(tables)
+        self.entries[key] = (monotonic() + ttl, content, slots, self.generations.snapshot(slots) if generations is None else generations)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def snapshot(self, tables=None):
+        """
+        Returns: the current counters of the tables (None: any table), to be given to put
+        """
+        return self.generations.snapshot(self.generations.slots(tables))
+
+
+class FragmentCacheExtension(Extension):
+    """
+    Jinja extension caching the rendering of a block of template:
+        {% cache "name", ttl, "table1", "table2" %} ... {% endcache %}
+    name: key of the fragment (e.g. "series" or "serie-" ~ id), ttl: time to live in seconds (default FRAGMENT_CACHE_TTL),
+    followed by the tables the fragment depends on (default: any table)
+    """
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render', [nodes.List(args)]), [], [], body).set_lineno(lineno)
+
+    def _render(self, args, caller):
+        cache = self.environment.fragment_cache
+        key = ('fragment', args[0])
+        content = cache.get(key)
+        if content is None:
+            ttl = args[1] if len(args) > 1 else FRAGMENT_CACHE_TTL
+            tables = list(args[2:]) or None
+            generations = cache.snapshot(tables)
+            content = caller()
+            cache.put(key, content, ttl, tables, generations)
+        return content
+
+
+class ReadMemo:
+    """
+    Memoization of the read functions of the models (connexion.memo, see the memoize_read decorator of the models):
+    a function called again with the same arguments returns its previous result without querying the database.
+    Results are kept for the current request only (ttl=0), or for ttl seconds across requests,
+    and are invalidated by the writes on the tables they depend on (see TableGenerations), including the writes of the same request.
+    Results are copied, so that a controller modifying a result does not modify the memoized one.
+    """
+
+    def __init__(self, generations, ttl=0, max_entries=READ_MEMO_MAX_ENTRIES):
+        self.ttl = ttl
+        self.cache = ResponseCache(generations, max_entries)
+
+    def call(self, function, tables, connexion, args, kwargs):
+        """
+        Call function(connexion, *args, **kwargs), or return its memoized result
+        tables: names of the tables read by the function (None: any table)
+        """
+        key = (function.__module__, function.__qualname__, args, tuple(sorted(kwargs.items())))
+        try:
+            entry = self.cache.get(key)
+        except TypeError:  # unhashable arguments (e.g., list): not memoized
+            return function(connexion, *args, **kwargs)
+        if entry is not None:
+            DB_STATS['memo_hits'] += 1
+            return deepcopy(entry[0])
+        generations = self.cache.snapshot(tables)
+        result = function(connexion, *args, **kwargs)
+        if result is not None:  # None: error, queried again next time
+            self.cache.put(key, (deepcopy(result),), self.ttl or float('inf'), tables, generations)
+        return result
+
+    def new_request(self):
+        """
+        Forget the results of the previous request (unless they are kept across requests)
+        """
+        if not self.ttl:
+            self.cache.entries.clear()
@@ -0,0 +1,204 @@
+#########################################
+#  Etudiants : ne pas modifier ce fichier
+#########################################
+
+"""
+Database connection of the server: statistics and deadline of the current request, detection of the writes
+"""
+
+import re
+from contextlib import contextmanager
+from time import perf_counter
+import psycopg
+from logzero import logger
+
+DB_STATS = {'queries': 0, 'time': 0.0, 'memo_hits': 0}  # number of queries, time (seconds) spent in the database and memoized reads for the current request
+DEADLINE = {'armed': False, 'in_db': False, 'expired': False}  # state of the deadline of the current request (see RequestTimeout)
+
+
+class RequestTimeout(BaseException):
+    """
+    Raised (by SIGALRM) when a request exceeds its deadline (--request-timeout).
+    BaseException, so that it is not caught by the `except Exception` of controllers and models.
+    During a database call, it is raised when the call returns (interrupting psycopg could break the connection),
+    the query itself being stopped by the statement_timeout of the connection.
+    """
+
+
+def deadline_expired(signum, frame):
+    """
+    SIGALRM handler: interrupt the current request
+    """
+    if DEADLINE['in_db']:
+        DEADLINE['expired'] = True
+    elif DEADLINE['armed']:
+        raise RequestTimeout()
+
+
+class InstrumentedCursor(psycopg.Cursor):
+    """
+    Cursor used for the database connection of the server: counts queries and database time of the current request in DB_STATS,
+    and reports the executed statements to the connection (detection of writes for cache invalidation)
+    """
+
+    def execute(self, query, params=None, **kwargs):
+        if not getattr(self.connection, 'in_request', True):  # connection of a job thread: not part of the current request
+            result = super().execute(query, params, **kwargs)
+            self.connection.statement_executed(query, self.statusmessage, self.rowcount)
+            return result
+        started = perf_counter()
+        DEADLINE['in_db'] = True
+        try:
+            result = super().execute(query, params, **kwargs)
+        finally:
+            DEADLINE['in_db'] = False
+            DB_STATS['queries'] += 1
+            DB_STATS['time'] += perf_counter() - started
+            if DEADLINE['expired'] and DEADLINE['armed']:  # deadline reached during the query
+                raise RequestTimeout()
+        if isinstance(self.connection, WebConnection):
+            self.connection.statement_executed(query, self.statusmessage, self.rowcount)
+        return result
+
+    def executemany(self, query, params_seq, **kwargs):
+        if not getattr(self.connection, 'in_request', True):  # connection of a job thread: not part of the current request
+            result = super().executemany(query, params_seq, **kwargs)
+            self.connection.statement_executed(query, self.statusmessage, self.rowcount)
+            return result
+        started = perf_counter()
+        DEADLINE['in_db'] = True
+        try:
+            result = super().executemany(query, params_seq, **kwargs)
+        finally:
+            DEADLINE['in_db'] = False
+            DB_STATS['queries'] += 1
+            DB_STATS['time'] += perf_counter() - started
+            if DEADLINE['expired'] and DEADLINE['armed']:  # deadline reached during the query
+                raise RequestTimeout()
+        if isinstance(self.connection, WebConnection):
+            self.connection.statement_executed(query, self.statusmessage, self.rowcount)
+        return result
+
+
+class WebConnection(psycopg.Connection):
+    """
+    Database connection of the server: detects the statements modifying data and notifies the write listeners
+    (e.g., invalidation of the response cache) with the names of the modified tables,
+    including the tables referencing them by a foreign key (ON DELETE CASCADE, SET NULL...).
+    Model functions can also notify writes that cannot be detected (e.g., in a SQL function) with connexion.notify_write(table, ...).
+    In pipeline mode, the command status of a statement is only known at the synchronization: the statements are checked
+    from their text when the pipeline exits.
+    """
+
+    DML_COMMANDS = ('INSERT', 'UPDATE', 'DELETE', 'MERGE', 'TRUNCATE', 'COPY')
+    DDL_COMMANDS = ('CREATE', 'ALTER', 'DROP')
+    LEADING_COMMENTS = re.compile(r"^(\s+|--[^\n]*(\n|$)|/\*.*?\*/)+", re.DOTALL)
+    IDENTIFIER = r'(?:"[^"]+"|\w+)(?:\s*\.\s*(?:"[^"]+"|\w+))?'
+    TARGET = re.compile(r"^(?:insert\s+into|update|delete\s+from|merge\s+into|copy|truncate(?:\s+table)?)\s+(?:only\s+)?(" + IDENTIFIER + r"(?:\s*,\s*(?:only\s+)?" + IDENTIFIER + r")*)", re.IGNORECASE)
+    COPY_FROM = re.compile(r"^copy\s+" + IDENTIFIER + r"(\s*\([^)]*\))?\s+from\b", re.IGNORECASE)
+    WRITE_IN_QUERY = re.compile(r"\b(insert|update|delete|merge)\b", re.IGNORECASE)
+    in_request = True  # False for the connections of job threads (not counted in DB_STATS, no request deadline)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.write_listeners = []  # functions called with a set of table names (None: any table may have been modified)
+        self.memo = None  # memoization of the read functions of the models (ReadMemo), None if disabled
+        self._referencing = None  # foreign key graph {table: set of tables referencing it}, loaded on first write
+        self._pipelined = []  # statements executed in the current pipeline, checked when it exits
+
+    @contextmanager
+    def pipeline(self):
+        """
+        Switch the connection into pipeline mode (see psycopg), then check the statements executed in the pipeline
+        (also on error: in autocommit mode, the statements before the error are committed)
+        """
+        outermost = self._pipeline is None
+        try:
+            with super().pipeline() as pipeline:
+                yield pipeline
+        finally:
+            if outermost:
+                statements, self._pipelined = self._pipelined, []
+                for query in statements:
+                    text = self._query_text(query)
+                    self._check_write(text, text.split(None, 1)[0].upper() if text.strip() else '', None)
+
+    def add_write_listener(self, listener):
+        self.write_listeners.append(listener)
+
+    def notify_write(self, *tables):
+        """
+        Notify the write listeners that the given tables (and the tables referencing them) have been modified
+        tables: names of the modified tables (none: any table may have been modified)
+        """
+        modified = self.with_referencing_tables(tables) if tables else None
+        for listener in self.write_listeners:
+            listener(modified)
+
+    def statement_executed(self, query, statusmessage, rowcount):
+        """
+        Detect whether an executed statement modified data or schema, and notify the write listeners
+        query: executed query (string, bytes or psycopg sql object)
+        statusmessage: command status returned by PostgreSQL (e.g. "INSERT 0 1", "SELECT 3")
+        rowcount: number of rows affected by the statement
+        """
+        if not self.write_listeners:
+            return
+        if not statusmessage:
+            if self._pipeline is not None:  # pipeline mode: no command status before the synchronization
+                self._pipelined.append(query)
+            return
+        self._check_write(self._query_text(query), statusmessage.split(' ', 1)[0], rowcount)
+
+    def _check_write(self, text, command, rowcount):
+        """
+        Notify the write listeners if a statement modified data or schema
+        text: text of the statement (without leading comments)
+        command: first word of the command status (e.g. "INSERT"), or of the statement in pipeline mode
+        rowcount: number of rows affected by the statement (None: unknown)
+        """
+        if command in self.DDL_COMMANDS:  # the schema may have changed (including foreign keys)
+            self._referencing = None
+            self.notify_write()
+            return
+        if command in self.DML_COMMANDS:
+            if rowcount == 0 or (command == 'COPY' and not self.COPY_FROM.match(text)):  # nothing was modified (or COPY ... TO)
+                return
+            match = self.TARGET.match(text)
+            if match is None:  # e.g., WITH ... INSERT: unknown tables
+                self.notify_write()
+            else:
+                self.notify_write(*[re.split(r"\s*\.\s*", t.strip())[-1].strip('"') for t in re.split(r"\s*,\s*(?:only\s+)?", match.group(1), flags=re.IGNORECASE)])
+        elif command in ('SELECT', 'WITH') and text[:4].lower() == 'with' and self.WRITE_IN_QUERY.search(text):  # data-modifying CTE
+            self.notify_write()
+
+    def _query_text(self, query):
+        if isinstance(query, bytes):
+            query = query.decode('utf-8', 'replace')
+        elif not isinstance(query, str):  # psycopg sql object
+            query = query.as_string(self)
+        return self.LEADING_COMMENTS.sub('', query)
+
+    def with_referencing_tables(self, tables):
+        """
+        Add to a list of tables the tables referencing them (directly or transitively) by a foreign key
+        Returns: a set of table names, or None if the foreign keys cannot be read
+        """
+        if self._referencing is None:
+            try:
+                with psycopg.Cursor(self) as cursor:  # plain cursor: not counted, not reported as a statement
+                    cursor.execute("SELECT DISTINCT confrelid::regclass::text, conrelid::regclass::text FROM pg_catalog.pg_constraint WHERE contype = 'f'")
+                    self._referencing = dict()
+                    for referenced, referencing in cursor.fetchall():
+                        self._referencing.setdefault(referenced.split('.')[-1].strip('"'), set()).add(referencing.split('.')[-1].strip('"'))
+            except psycopg.Error as e:
+                logger.warning(f"Lecture des clés étrangères impossible ({e})")
+                return None
+        modified = set()
+        to_visit = [t.lower() if not t.startswith('"') else t.strip('"') for t in tables]
+        while to_visit:
+            table = to_visit.pop()
+            if table not in modified:
+                modified.add(table)
+                to_visit.extend(self._referencing.get(table, ()))
+        return modified
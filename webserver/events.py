@@ -0,0 +1,237 @@
+#########################################
+#  Etudiants : ne pas modifier ce fichier
+#########################################
+
+"""
+Server-Sent Events fed by the notifications of the database (LISTEN/NOTIFY)
+"""
+
+import json
+import threading
+from time import monotonic, sleep
+import psycopg
+from psycopg import sql
+from logzero import logger
+
+SSE_MAX_CLIENTS = 1000  # maximum number of event stream clients (Server-Sent Events) per worker, beyond which new clients get a 503
+SSE_HEARTBEAT = 15  # interval (seconds) between two comments sent to the event stream clients (keeps proxies open, detects closed connections)
+SSE_SEND_TIMEOUT = 2  # an event stream client which does not accept an event within this time (seconds) is disconnected
+SSE_RETRY = 2000  # reconnection delay (milliseconds) advised to the browsers when an event stream is closed
+SSE_LISTEN_TIMEOUT = 5  # maximum wait (seconds) of a new event stream for the LISTEN of its channel, beyond which the client gets a 503
+
+
+def format_event(data, event=None, event_id=None):
+    """
+    Format a Server-Sent Event
+    data: content of the event (serialized as JSON unless it is a string)
+    event: optional type of the event (listened in the browser with EventSource.addEventListener)
+    event_id: optional identifier of the event, sent back by the browser in the Last-Event-ID header when it reconnects
+    Returns: the event (bytes)
+    """
+    if not isinstance(data, str):
+        data = json.dumps(data, ensure_ascii=False, default=str)
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in data.split('\n'))
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+
+class EventHub:
+    """
+    Server-Sent Events of a worker. A route with a sse_channel (PostgreSQL channel) in the routes file can hand its connection over to the hub:
+        REQUEST_VARS['events'] = {'topic': '42', 'initial': [{'event': 'log', 'id': 3, 'data': {...}}, ...]}
+    The initial events are sent, then the connection is kept by the hub and the worker serves other requests.
+    A single listener thread (with its own database connection, opened with the first client) LISTENs on the channels,
+    and writes each notification to the clients subscribed to its topic: one database connection per worker, whatever the number of clients.
+    A notification payload is a JSON object {"topic": ..., "event": ... (optional), "id": ... (optional), "data": ...},
+    e.g. sent by a trigger: pg_notify('channel', json_build_object('topic', NEW.game_id::text, 'event', 'log', 'data', ...)::text).
+    If the listener connection is lost, the clients are disconnected: browsers reconnect with Last-Event-ID and catch up.
+    No notification is lost between the read of the initial events by the controller and the subscription of the client:
+    the server opens a backlog of the channel (LISTEN done) before running the controller, and subscribe sends the notifications
+    recorded in the backlog meanwhile, except those whose id is already among the initial events.
+    """
+
+    def __init__(self, connect=None):
+        self.connect = connect  # function returning a new database connection (None: no database)
+        self.clients = dict()  # (channel, topic) -> set of sockets
+        self.channels = set()  # channels to LISTEN
+        self.listened = set()  # channels LISTENed by the current listener connection
+        self.backlogs = []  # notifications received while controllers read their initial events (see open_backlog)
+        self.lock = threading.Lock()
+        self.listening = threading.Condition(self.lock)  # notified when channels are LISTENed
+        self.thread = None
+        self._stopping = False
+
+    def __len__(self):
+        with self.lock:
+            return sum(len(sockets) for sockets in self.clients.values())
+
+    def has_room(self):
+        """
+        Returns: True if a new client can subscribe (database available, SSE_MAX_CLIENTS not reached)
+        """
+        return self.connect is not None and len(self) < SSE_MAX_CLIENTS
+
+    def open_backlog(self, channel):
+        """
+        Record the notifications of a channel from now on, before a controller reads the initial events of a stream (see subscribe)
+        channel: PostgreSQL channel
+        Returns: the backlog, or None if the channel is not LISTENed within SSE_LISTEN_TIMEOUT (no database, database unavailable)
+        """
+        if self.connect is None:
+            return None
+        backlog = {'channel': channel, 'messages': [], 'lost': False}
+        with self.lock:
+            self.channels.add(channel)
+            self._start()
+            if not self.listening.wait_for(lambda: channel in self.listened, SSE_LISTEN_TIMEOUT):
+                return None
+            self.backlogs.append(backlog)  # LISTEN is effective (autocommit): notifications committed after this point are received
+        return backlog
+
+    def close_backlog(self, backlog):
+        """
+        Stop recording the notifications of a backlog (no effect if subscribe already used it)
+        """
+        with self.lock:
+            if backlog in self.backlogs:
+                self.backlogs.remove(backlog)
+
+    def subscribe(self, channel, topic, connection, backlog=None, sent_ids=()):
+        """
+        Keep a client connection, which will receive the notifications of the channel for the topic
+        channel: PostgreSQL channel, topic: value of the "topic" key of the payloads sent to this client
+        connection: socket of the client (the response headers and initial events have already been sent)
+        backlog: optional backlog opened before the read of the initial events, whose notifications for the topic are sent first
+        sent_ids: identifiers (strings) of the initial events, whose notifications in the backlog are not sent twice
+        Returns: True if the client is subscribed, False if the connection must be closed (client gone, or notifications lost)
+        """
+        connection.settimeout(SSE_SEND_TIMEOUT)  # a slow client must not block the other clients
+        with self.lock:
+            if backlog is not None:
+                if backlog in self.backlogs:
+                    self.backlogs.remove(backlog)
+                if backlog['lost']:  # listener connection lost meanwhile: the browser reconnects and catches up
+                    return False
+                missed = [format_event(message.get('data'), message.get('event'), message.get('id')) for message in backlog['messages']
+                          if str(message['topic']) == str(topic) and (message.get('id') is None or str(message['id']) not in sent_ids)]
+                try:  # sent with the lock held, so that the following notifications are sent after them
+                    if missed:
+                        connection.sendall(b''.join(missed))
+                except OSError:
+                    return False
+            self.clients.setdefault((channel, str(topic)), set()).add(connection)
+            self.channels.add(channel)
+            self._start()
+        return True
+
+    def _start(self):
+        """
+        Start the listener thread if needed (lock held)
+        """
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._listen, name='events', daemon=True)
+            self.thread.start()
+
+    def _listen(self):
+        """
+        Body of the listener thread: LISTEN on the channels, dispatch the notifications, send heartbeats
+        """
+        connexion = None
+        last_heartbeat = monotonic()
+        while not self._stopping:
+            try:
+                if connexion is None or connexion.closed:
+                    connexion = self.connect()
+                with self.lock:
+                    channels = self.channels - self.listened
+                for channel in channels:
+                    connexion.execute(sql.SQL("LISTEN {}").format(sql.Identifier(channel)))
+                if channels:
+                    with self.lock:
+                        self.listened.update(channels)
+                        self.listening.notify_all()
+                for notify in connexion.notifies(timeout=1.0):
+                    self._dispatch(notify.channel, notify.payload)
+            except (psycopg.Error, RuntimeError) as e:
+                logger.error(f"Écoute des notifications interrompue ({e}) : déconnexion des clients des flux d'événements")
+                if connexion is not None:
+                    connexion.close()
+                connexion = None
+                with self.lock:
+                    self.listened.clear()
+                    for backlog in self.backlogs:
+                        backlog['lost'] = True
+                self._disconnect_all()
+                sleep(1)
+            if monotonic() - last_heartbeat >= SSE_HEARTBEAT:
+                last_heartbeat = monotonic()
+                with self.lock:
+                    sockets = set().union(*self.clients.values()) if self.clients else set()
+                self._send(sockets, b': ping\n\n')
+        if connexion is not None:
+            connexion.close()
+
+    def _dispatch(self, channel, payload):
+        """
+        Send a notification to the clients subscribed to its topic
+        """
+        try:
+            message = json.loads(payload)
+            topic = str(message['topic'])
+        except (ValueError, TypeError, KeyError):
+            logger.warning(f"Notification ignorée sur le canal {channel} (JSON avec une clé topic attendu) : {payload[:200]}")
+            return
+        with self.lock:
+            sockets = set(self.clients.get((channel, topic), ()))
+            for backlog in self.backlogs:
+                if backlog['channel'] == channel:
+                    backlog['messages'].append(message)
+        if sockets:
+            self._send(sockets, format_event(message.get('data'), message.get('event'), message.get('id')))
+
+    def _send(self, sockets, data):
+        """
+        Write data to client sockets, and forget the clients which are disconnected (or too slow)
+        """
+        closed = []
+        for connection in sockets:
+            try:
+                connection.sendall(data)
+            except OSError:
+                closed.append(connection)
+        if closed:
+            with self.lock:
+                for key in list(self.clients):
+                    self.clients[key].difference_update(closed)
+                    if not self.clients[key]:
+                        del self.clients[key]
+            for connection in closed:
+                connection.close()
+
+    def owns(self, connection):
+        """
+        Returns: True if the connection has been handed over to the hub (the server must not close it)
+        """
+        with self.lock:
+            return any(connection in sockets for sockets in self.clients.values())
+
+    def _disconnect_all(self):
+        with self.lock:
+            sockets = set().union(*self.clients.values()) if self.clients else set()
+            self.clients.clear()
+        for connection in sockets:
+            connection.close()
+
+    def stop(self):
+        """
+        Stop the listener thread and close the client connections
+        """
+        self._stopping = True
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+            self.thread = None
+        self._disconnect_all()
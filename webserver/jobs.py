@@ -0,0 +1,251 @@
+#########################################
+#  Etudiants : ne pas modifier ce fichier
+#########################################
+
+"""
+Background jobs of the controllers (SESSION['JOBS']), with status files shared by the workers
+"""
+
+import atexit
+import json
+import os
+import queue
+import re
+import secrets
+import tempfile
+import threading
+from collections import OrderedDict
+from os import path
+from shutil import rmtree
+from time import monotonic, time
+from logzero import logger
+
+JOB_MAX_PENDING = 64  # maximum number of jobs waiting for a job thread (per worker), beyond which submit refuses new jobs
+JOB_MAX_RETAINED = 100  # maximum number of finished jobs whose status is kept (per worker)
+JOB_PROGRESS_INTERVAL = 0.5  # minimum interval (seconds) between two writes of the status of a running job
+
+
+class Job:
+    """
+    Background job submitted by a controller (see JobQueue): its status is written as JSON in the jobs directory,
+    so that it can be polled on /_jobs/<id> whatever the worker which serves the polling request.
+    """
+
+    PENDING, RUNNING, DONE, FAILED = 'en attente', 'en cours', 'terminé', 'échec'
+
+    def __init__(self, title, function, args, kwargs, on_done, jobs_dir):
+        self.id = secrets.token_hex(8)  # not guessable: the status may contain the result of another session
+        self.title = title
+        self.function, self.args, self.kwargs = function, args, kwargs
+        self.on_done = on_done  # function called with the job in the main thread once finished (e.g., update of SESSION)
+        self.status_file = path.join(jobs_dir, self.id + '.json')
+        self.state = Job.PENDING
+        self.done, self.total, self.message = 0, None, None  # progress
+        self.result = None
+        self.error = None
+        self.created, self.started, self.finished = time(), None, None
+        self.connexion = None  # database connection of the job thread which runs the job
+        self._last_write = 0
+
+    def progress(self, done, total=None, message=None):
+        """
+        Report the progress of the job (called by the job function)
+        done: number of steps done, total: number of steps (None: unknown), message: optional description of the current step
+        """
+        self.done, self.total, self.message = done, total, message
+        if monotonic() - self._last_write >= JOB_PROGRESS_INTERVAL:
+            self.write_status()
+
+    @property
+    def is_finished(self):
+        return self.state in (Job.DONE, Job.FAILED)
+
+    def as_dict(self):
+        return {'id': self.id, 'title': self.title, 'state': self.state, 'finished': self.is_finished,
+                'done': self.done, 'total': self.total, 'message': self.message, 'error': self.error, 'result': self.result,
+                'created': self.created, 'started': self.started, 'finished_at': self.finished,
+                'duration': round((self.finished or time()) - self.started, 3) if self.started else None}
+
+    def write_status(self):
+        """
+        Write the status of the job (atomically: a polling request never reads a partial file)
+        """
+        self._last_write = monotonic()
+        tmp_file = self.status_file + '.tmp'
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as file:
+                json.dump(self.as_dict(), file, ensure_ascii=False, default=str)
+            os.replace(tmp_file, self.status_file)
+        except OSError as e:
+            logger.warning(f"Écriture de l'état de la tâche {self.id} impossible ({e})")
+
+
+class JobQueue:
+    """
+    Pool of job threads running long operations out of the request path (SESSION['JOBS'] in controllers):
+        job = SESSION['JOBS'].submit("Suppression de l'équipe", function, arg1, ..., on_done=callback)
+    function is called as function(job, arg1, ...) in a job thread, with job.connexion its own database connection
+    (writes invalidate the caches as the writes of the requests) and job.progress(...) to report its progress;
+    its return value (JSON-serializable) is the result of the job. on_done(job) is called in the main thread
+    (before the next request), where SESSION may be modified safely.
+    With no job thread (--job-workers 0), jobs are run immediately during the request.
+    Finished jobs are forgotten after `retention` seconds, or when more than JOB_MAX_RETAINED jobs are finished.
+    """
+
+    def __init__(self, jobs_dir, connect=None, nb_threads=2, retention=600):
+        self.jobs_dir = jobs_dir
+        self.connect = connect  # function returning a new database connection (None: no database)
+        self.retention = retention
+        self.jobs = OrderedDict()  # id -> Job, in submission order
+        self.pending = queue.Queue(maxsize=JOB_MAX_PENDING)
+        self.completed = queue.SimpleQueue()  # finished jobs whose on_done has not been called yet
+        self.lock = threading.Lock()
+        self._connexion = None  # connection of the synchronous jobs (no job thread)
+        self.threads = [threading.Thread(target=self._run_jobs, name=f'job-{i}', daemon=True) for i in range(nb_threads)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, title, function, *args, on_done=None, **kwargs):
+        """
+        Submit a job
+        Returns: the Job object, or None if too many jobs are waiting
+        """
+        self.prune()
+        job = Job(title, function, args, kwargs, on_done, self.jobs_dir)
+        with self.lock:
+            self.jobs[job.id] = job
+        job.write_status()
+        if not self.threads:  # no job thread: synchronous execution
+            if self._connexion is None and self.connect is not None:
+                self._connexion = self.connect()
+            self._run(job, self._connexion)
+            self.apply_completed()
+            return job
+        try:
+            self.pending.put_nowait(job)
+        except queue.Full:
+            logger.warning(f"File des tâches pleine ({JOB_MAX_PENDING}) : tâche « {title} » refusée")
+            self._forget(job)
+            return None
+        logger.info(f"Tâche {job.id} « {title} » soumise")
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def status_file(self, job_id):
+        """
+        Path of the status file of a job in the jobs directory (None if job_id is not a valid job identifier)
+        """
+        return path.join(self.jobs_dir, job_id + '.json') if re.fullmatch(r'[0-9a-f]{16}', job_id) else None
+
+    def status(self, job_id):
+        """
+        Read the status of a job from its status file, written by the worker which runs the job
+        (unlike get, it works whatever the worker which submitted the job)
+        Returns: a dict (see Job.as_dict), or None if the job is unknown or forgotten
+        """
+        status_file = self.status_file(job_id)
+        if status_file is None:
+            return None
+        try:
+            with open(status_file, encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _run_jobs(self):
+        """
+        Body of a job thread: run the submitted jobs with the own database connection of the thread
+        """
+        connexion = None
+        while True:
+            try:
+                job = self.pending.get(timeout=5)
+            except queue.Empty:
+                self.prune()
+                continue
+            if job is None:  # stop requested
+                break
+            try:
+                if self.connect is not None and (connexion is None or connexion.closed or connexion.broken):
+                    connexion = self.connect()
+            except Exception as e:
+                connexion = None
+                logger.error(f"Connexion de la tâche {job.id} au SGBD impossible ({e})")
+            self._run(job, connexion)
+        if connexion is not None:
+            connexion.close()
+
+    def _run(self, job, connexion):
+        job.connexion = connexion
+        job.state, job.started = Job.RUNNING, time()
+        job.write_status()
+        try:
+            job.result = job.function(job, *job.args, **job.kwargs)
+            job.state = Job.DONE
+        except Exception as e:
+            job.state, job.error = Job.FAILED, str(e)
+            logger.exception(f"Échec de la tâche {job.id} « {job.title} »")
+        job.finished = time()
+        job.connexion = None
+        job.write_status()
+        logger.info(f"Tâche {job.id} « {job.title} » : {job.state} en {job.finished - job.started:.3f} s")
+        self.completed.put(job)
+
+    def apply_completed(self):
+        """
+        Call the on_done functions of the jobs finished since the last call (in the main thread, before each request)
+        """
+        while True:
+            try:
+                job = self.completed.get_nowait()
+            except queue.Empty:
+                break
+            if job.on_done is not None and job.state == Job.DONE:
+                try:
+                    job.on_done(job)
+                except Exception:
+                    logger.exception(f"Erreur lors de la prise en compte de la tâche {job.id}")
+
+    def prune(self):
+        """
+        Forget the finished jobs older than the retention delay, or beyond JOB_MAX_RETAINED finished jobs
+        """
+        with self.lock:
+            finished = [job for job in self.jobs.values() if job.is_finished]
+        now = time()
+        for i, job in enumerate(finished):
+            if now - job.finished > self.retention or len(finished) - i > JOB_MAX_RETAINED:
+                self._forget(job)
+
+    def _forget(self, job):
+        with self.lock:
+            self.jobs.pop(job.id, None)
+        try:
+            os.remove(job.status_file)
+        except OSError:
+            pass
+
+    def stop(self):
+        """
+        Stop the job threads once the pending jobs are finished (running jobs are not interrupted)
+        """
+        for thread in self.threads:
+            self.pending.put(None)
+        for thread in self.threads:
+            thread.join(timeout=5)
+        self.threads = []
+        if self._connexion is not None:
+            self._connexion.close()
+            self._connexion = None
+
+
+def create_jobs_dir():
+    """
+    Create the directory of the status files of background jobs (removed at exit)
+    Returns: path of the directory
+    """
+    jobs_dir = tempfile.mkdtemp(prefix='server-jobs-')
+    atexit.register(rmtree, jobs_dir, True)
+    return jobs_dir
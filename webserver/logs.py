@@ -0,0 +1,143 @@
+#########################################
+#  Etudiants : ne pas modifier ce fichier
+#########################################
+
+"""
+Logging out of the request path (log pipeline per process) and JSON access log
+"""
+
+import atexit
+import json
+import logging
+import queue
+import sys
+import threading
+from logging.handlers import QueueHandler
+from logzero import logger
+
+LOG_BATCH_SIZE = 256  # maximum number of log records written at once by the log writer thread
+
+access_logger = logging.getLogger('access')  # one JSON line per request (--access-log), written by the log pipeline
+access_logger.propagate = False
+access_logger.setLevel(logging.INFO)
+
+
+class LogPipeline:
+    """
+    Logging out of the request path: the loggers put their records in a queue (LazyQueueHandler),
+    and a background thread formats them and writes them by batches (one write and one flush per stream and per batch).
+    Arguments of log calls are formatted by the writer thread (lazy formatting): they must not be modified after the call.
+    Threads do not survive fork, so each worker process starts its own pipeline (see start_log_pipeline).
+    """
+
+    def __init__(self, loggers):
+        self.queue = queue.SimpleQueue()
+        self.targets = []  # (logger, its original handlers), restored by stop
+        for log in loggers:
+            if not log.handlers:  # e.g., no access log
+                continue
+            self.targets.append((log, log.handlers[:]))
+            log.handlers = [LazyQueueHandler(self.queue, log.handlers[:])]
+        self.thread = threading.Thread(target=self._write_records, name='log-writer', daemon=True)
+        self.thread.start()
+
+    def _write_records(self):
+        """
+        Body of the writer thread: wait for a record, then write it with the records queued meanwhile
+        """
+        stopping = False
+        while not stopping:
+            batch = [self.queue.get()]
+            while len(batch) < LOG_BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:  # stop requested (sentinel)
+                stopping = True
+                batch = [record for record in batch if record is not None]
+            self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        texts = dict()  # stream handler -> formatted lines
+        for record in batch:
+            for handler in record.log_handlers:
+                if record.levelno < handler.level:
+                    continue
+                try:
+                    if isinstance(handler, logging.StreamHandler):
+                        texts.setdefault(handler, []).append(handler.format(record) + handler.terminator)
+                    else:
+                        handler.handle(record)
+                except Exception:
+                    handler.handleError(record)
+        for handler, lines in texts.items():
+            with handler.lock:
+                try:
+                    handler.stream.write(''.join(lines))
+                    handler.flush()
+                except Exception:
+                    pass
+
+    def stop(self):
+        """
+        Write the pending records, stop the writer thread and give back their handlers to the loggers
+        """
+        self.queue.put(None)
+        self.thread.join(timeout=5)
+        for log, handlers in self.targets:
+            log.handlers = handlers
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    Handler putting the records in the queue of the log pipeline, with the handlers that will write them, without formatting them
+    """
+
+    def __init__(self, log_queue, handlers):
+        super().__init__(log_queue)
+        self.log_handlers = handlers
+
+    def prepare(self, record):
+        record.log_handlers = self.log_handlers
+        return record
+
+
+class JsonLineFormatter(logging.Formatter):
+    """
+    Formatter of the access log: a record whose message is a dict is written as one JSON line
+    """
+
+    def format(self, record):
+        if isinstance(record.msg, dict):
+            return json.dumps(record.msg, ensure_ascii=False, default=str)
+        return super().format(record)
+
+
+LOG_PIPELINE = None  # log pipeline of the current process
+
+
+def start_log_pipeline(access_log=None):
+    """
+    Start the log pipeline of the current process (once per process), with the access log if requested
+    access_log: path of the JSON access log file ('-': standard output, None: no access log)
+    """
+    global LOG_PIPELINE
+    if LOG_PIPELINE is not None and LOG_PIPELINE.thread.is_alive():
+        return
+    if access_log and not access_logger.handlers:
+        handler = logging.StreamHandler(sys.stdout) if access_log == '-' else logging.FileHandler(access_log, encoding='utf-8')
+        handler.setFormatter(JsonLineFormatter())
+        access_logger.addHandler(handler)
+    LOG_PIPELINE = LogPipeline([logger, access_logger])
+    atexit.register(stop_log_pipeline)
+
+
+def stop_log_pipeline():
+    """
+    Flush and stop the log pipeline of the current process (synchronous logging afterwards)
+    """
+    global LOG_PIPELINE
+    if LOG_PIPELINE is not None:
+        LOG_PIPELINE.stop()
+        LOG_PIPELINE = None
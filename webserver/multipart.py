@@ -0,0 +1,35 @@
+#########################################
+#  Etudiants : ne pas modifier ce fichier
+#########################################
+
+"""
+Parsing of the body of multipart/form-data requests (forms with uploaded files)
+"""
+
+from email.parser import BytesParser
+from email.policy import HTTP
+
+
+def parse_multipart(content_type, post_data):
+    """
+    Parse the body of a multipart/form-data POST request
+    content_type: value of the Content-Type header (with the boundary)
+    post_data: body of the request (bytes)
+    Returns: a tuple (dict of fields {name: [values]} as parse_qs, dict of files {name: [{'filename', 'content_type', 'content'}]})
+    """
+    fields, files = dict(), dict()
+    message = BytesParser(policy=HTTP).parsebytes(b'Content-Type: ' + content_type.encode('latin-1') + b'\r\n\r\n' + post_data)
+    if not message.is_multipart():
+        return fields, files
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        if name is None:
+            continue
+        content = part.get_payload(decode=True) or b''
+        filename = part.get_filename()
+        if filename is not None:  # uploaded file (an empty file input is sent with an empty filename)
+            if filename:
+                files.setdefault(name, []).append({'filename': filename, 'content_type': part.get_content_type(), 'content': content})
+        else:
+            fields.setdefault(name, []).append(content.decode(part.get_content_charset() or 'utf-8'))
+    return fields, files
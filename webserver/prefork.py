@@ -0,0 +1,159 @@
+#########################################
+#  Etudiants : ne pas modifier ce fichier
+#########################################
+
+"""
+Pre-fork mode: supervisor of the worker processes, metrics and admission limits shared by the workers
+"""
+
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import tomllib
+from multiprocessing.sharedctypes import RawArray
+from time import monotonic, sleep
+from logzero import logger
+from webserver.cache import TableGenerations
+from webserver.jobs import create_jobs_dir
+
+WORKER_RESTART_DELAY = 1  # minimum lifetime (seconds) of a worker before it is considered as crashing at startup
+WORKER_MAX_FAST_FAILURES = 5  # supervisor gives up after this number of consecutive crashes at startup
+STATS_LOG_INTERVAL = 60  # interval (seconds) between two logs of the aggregated metrics of workers
+
+
+class WorkerStats:
+    """
+    Request counters shared between the supervisor and its workers (one slot per worker).
+    Counters are stored in an anonymous shared memory created before fork, so the supervisor can aggregate them.
+    """
+
+    FIELDS = ('requests', 'errors_4xx', 'errors_5xx')
+
+    def __init__(self, nb_slots):
+        self.nb_slots = nb_slots
+        self.counters = RawArray('Q', nb_slots * len(self.FIELDS))  # no lock: each slot is written by a single process
+
+    def record(self, slot, response_code):
+        """
+        Record a response sent by the worker using the given slot
+        slot: index of the worker
+        response_code: HTTP status code of the response
+        """
+        base = slot * len(self.FIELDS)
+        self.counters[base] += 1
+        if 400 <= response_code < 500:
+            self.counters[base + 1] += 1
+        elif response_code >= 500:
+            self.counters[base + 2] += 1
+
+    def totals(self):
+        """
+        Aggregate the counters of all workers
+        Returns: a dict {field: total}
+        """
+        nb_fields = len(self.FIELDS)
+        return {field: sum(self.counters[slot * nb_fields + i] for slot in range(self.nb_slots)) for i, field in enumerate(self.FIELDS)}
+
+
+def create_limits(args):
+    """
+    Create the semaphores of admission control, before fork so that they are shared by all workers:
+    one for the requests processed at the same time (--max-inflight), one per route with max_concurrency in the routes file
+    args: parsed arguments of the script
+    Returns: a dict {'inflight': semaphore or None, 'route_semaphores': {url: semaphore}}
+    """
+    route_semaphores = dict()
+    try:
+        with open(args.routes, 'rb') as file:
+            routes = tomllib.load(file).get('routes', [])
+    except (OSError, tomllib.TOMLDecodeError):  # errors are reported when the server loads the routes
+        routes = []
+    for r in routes:
+        max_concurrency = r.get('max_concurrency')
+        if max_concurrency is None:
+            continue
+        if not isinstance(max_concurrency, int) or max_concurrency < 1:
+            logger.error(f"max_concurrency invalide pour la route {r.get('url')} (entier positif obligatoire) : {max_concurrency}")
+            sys.exit(1)
+        route_semaphores[r.get('url')] = multiprocessing.BoundedSemaphore(max_concurrency)
+    inflight = multiprocessing.BoundedSemaphore(args.max_inflight) if args.max_inflight > 0 else None
+    return {'inflight': inflight, 'route_semaphores': route_semaphores}
+
+
+def log_stats(stats, restarts=0):
+    """
+    Log the aggregated metrics of all workers
+    stats: a WorkerStats object
+    restarts: number of workers restarted by the supervisor
+    """
+    totals = stats.totals()
+    logger.info(f"Métriques ({stats.nb_slots} worker(s)) : {totals['requests']} requêtes, {totals['errors_4xx']} erreurs 4xx, {totals['errors_5xx']} erreurs 5xx, {restarts} redémarrage(s)")
+
+
+def serve_prefork(args, server_address, nb_workers, run_worker):
+    """
+    Supervisor of the pre-fork mode: bind the socket once, fork nb_workers workers sharing it, restart crashed workers and log their aggregated metrics
+    run_worker: body of a worker, run_worker(args, server_address, listen_socket, stats, slot, generations, limits, jobs_dir), which never returns
+    Returns only by raising KeyboardInterrupt (Ctrl-C), after having stopped all workers
+    """
+    listen_socket = socket.create_server(server_address, backlog=128)
+    listen_socket.set_inheritable(True)
+    stats = WorkerStats(nb_workers)
+    generations = TableGenerations()  # shared by the workers: a write in a worker invalidates the caches of all workers
+    limits = create_limits(args)  # shared by the workers: limits apply to the whole server
+    jobs_dir = create_jobs_dir()  # shared by the workers: the status of a job can be polled on any worker
+    workers = dict()  # pid -> (slot, start time)
+    restarts = 0
+    fast_failures = 0
+
+    def spawn(slot):
+        pid = os.fork()
+        if pid == 0:  # child process
+            run_worker(args, server_address, listen_socket, stats, slot, generations, limits, jobs_dir)
+        workers[pid] = (slot, monotonic())
+
+    for slot in range(nb_workers):
+        spawn(slot)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))  # stop workers (finally block) when the supervisor is terminated
+    logger.info(f"Superviseur {os.getpid()} : {nb_workers} workers démarrés sur {server_address[0]}:{server_address[1]}")
+    last_log = monotonic()
+    last_totals = None
+    try:
+        while True:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:  # no worker has stopped
+                if monotonic() - last_log >= STATS_LOG_INTERVAL:
+                    if stats.totals() != last_totals:
+                        log_stats(stats, restarts)
+                        last_totals = stats.totals()
+                    last_log = monotonic()
+                sleep(0.5)
+                continue
+            slot, started = workers.pop(pid)
+            exit_code = os.waitstatus_to_exitcode(status)
+            if exit_code != 0 and monotonic() - started < WORKER_RESTART_DELAY:
+                fast_failures += 1
+                if fast_failures >= WORKER_MAX_FAST_FAILURES:
+                    logger.error(f"Les workers s'arrêtent dès leur démarrage (code {exit_code}) : arrêt du superviseur.")
+                    raise SystemExit(exit_code)
+                sleep(WORKER_RESTART_DELAY)
+            else:
+                fast_failures = 0
+            logger.warning(f"Worker {pid} (slot {slot}) arrêté avec le code {exit_code} : redémarrage.")
+            restarts += 1
+            spawn(slot)
+    finally:
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in workers:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        listen_socket.close()
+        log_stats(stats, restarts)
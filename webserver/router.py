@@ -0,0 +1,97 @@
+#########################################
+#  Etudiants : ne pas modifier ce fichier
+#########################################
+
+"""
+Compiled route table of the routes file
+"""
+
+import re
+from urllib.parse import unquote
+from logzero import logger
+
+
+class Router:
+    """
+    Compiled route table: the routes of routes.toml are stored in a trie of URL segments, so that a request is matched by a single walk of the trie.
+    A segment is either static (e.g. "equipe") or a typed parameter (e.g. "<schema>", "<str:schema>" or "<int:id>"),
+    whose value is given to the controller in REQUEST_VARS['route_params']. Static segments are tried before parameters.
+    As before, a path whose first component is a route without parameters is matched by this route (e.g. /equipe/xyz).
+    """
+
+    PARAMETER = re.compile(r"^<(?:(\w+):)?(\w+)>$")
+    CONVERTERS = {'str': str, 'int': int}
+
+    def __init__(self):
+        self.root = self._new_node()
+        self.routes = []
+
+    @staticmethod
+    def _new_node():
+        return {'static': dict(), 'params': [], 'route': None}  # params: list of (name, converter, node)
+
+    def add(self, url, route):
+        """
+        Add a route to the trie
+        url: URL pattern of the route (without leading slash)
+        route: dict describing the route (controleur, template, methods...)
+        """
+        node = self.root
+        for segment in (url.split('/') if url else []):
+            match = self.PARAMETER.match(segment)
+            if match is None:
+                node = node['static'].setdefault(segment, self._new_node())
+                continue
+            converter, name = match.group(1) or 'str', match.group(2)
+            if converter not in self.CONVERTERS:
+                raise ValueError(f"type de paramètre {converter} inconnu dans la route {url} (types possibles : {', '.join(self.CONVERTERS)})")
+            for param_name, param_converter, child in node['params']:
+                if (param_name, param_converter) == (name, converter):
+                    node = child
+                    break
+            else:
+                child = self._new_node()
+                node['params'].append((name, converter, child))
+                node = child
+        if node['route'] is not None:
+            logger.warning(f"La route {url} est définie plusieurs fois, seule la dernière définition est utilisée")
+        else:
+            self.routes.append(route)
+        node['route'] = route
+
+    def match(self, url_path):
+        """
+        Find the route matching a URL path
+        url_path: path of the URL (without leading slash and query string)
+        Returns: a tuple (route dict, dict of parameters), or (None, None) if no route matches
+        """
+        segments = url_path.split('/') if url_path else []
+        found = self._match(self.root, segments, 0, dict())
+        if found is None and segments:  # first component matching a route without parameters
+            node = self.root['static'].get(segments[0])
+            if node is not None and node['route'] is not None:
+                found = (node['route'], dict())
+        return found or (None, None)
+
+    def _match(self, node, segments, index, params):
+        if index == len(segments):
+            return (node['route'], params) if node['route'] is not None else None
+        segment = segments[index]
+        child = node['static'].get(segment)
+        if child is not None:
+            found = self._match(child, segments, index + 1, params)
+            if found is not None:
+                return found
+        if segment:  # parameters cannot be empty
+            for name, converter, child in node['params']:
+                try:
+                    value = self.CONVERTERS[converter](unquote(segment))
+                except ValueError:
+                    continue
+                found = self._match(child, segments, index + 1, {**params, name: value})
+                if found is not None:
+                    return found
+        return None
+
+    def __len__(self):
+        return len(self.routes)
@@ -0,0 +1,94 @@
+from jinja2 import Environment, DictLoader
+
+from webserver.cache import TableGenerations, ResponseCache, ReadMemo, FragmentCacheExtension
+from webserver.db import DB_STATS, WebConnection
+
+
+def web_connection(generations, referencing=None):
+    """
+    WebConnection without database: the writes are detected from the statements, the foreign keys are given
+    """
+    connexion = WebConnection.__new__(WebConnection)
+    connexion.write_listeners = [generations.bump]
+    connexion._referencing = referencing or dict()
+    connexion._pipelined = []
+    connexion._pipeline = None
+    return connexion
+
+
+def test_page_is_invalidated_by_a_write_on_its_tables_only():
+    generations = TableGenerations()
+    cache = ResponseCache(generations)
+    cache.put('series', 'page series', 60, ['series'])
+    cache.put('actrices', 'page actrices', 60, ['actrices'])
+    connexion = web_connection(generations)
+    connexion.statement_executed("UPDATE series SET nom = 'x'", "UPDATE 1", 1)
+    assert cache.get('series') is None
+    assert cache.get('actrices') == 'page actrices'
+
+
+def test_write_on_a_referenced_table_invalidates_the_referencing_tables():
+    generations = TableGenerations()
+    cache = ResponseCache(generations)
+    cache.put('critiques', 'page critiques', 60, ['critiques'])
+    connexion = web_connection(generations, {'series': {'critiques'}})  # ON DELETE CASCADE
+    connexion.statement_executed('DELETE FROM public."series" WHERE nom = %s', "DELETE 1", 1)
+    assert cache.get('critiques') is None
+
+
+def test_statements_without_effect_keep_the_cache():
+    generations = TableGenerations()
+    cache = ResponseCache(generations)
+    cache.put('page', 'page', 60, ['series'])
+    connexion = web_connection(generations)
+    connexion.statement_executed("SELECT * FROM series", "SELECT 3", 3)
+    connexion.statement_executed("UPDATE series SET nom = 'x' WHERE false", "UPDATE 0", 0)
+    connexion.statement_executed("COPY series TO STDOUT", "COPY 3", 3)
+    assert cache.get('page') == 'page'
+    connexion.statement_executed("WITH d AS (DELETE FROM episodes RETURNING *) SELECT count(*) FROM d", "SELECT 1", 1)
+    assert cache.get('page') is None  # data-modifying CTE: any table
+
+
+def test_write_during_rendering_invalidates_the_page():
+    generations = TableGenerations()
+    cache = ResponseCache(generations)
+    snapshot = cache.snapshot(['series'])  # before running the controller
+    generations.bump({'series'})  # e.g., written meanwhile by another worker
+    cache.put('page', 'page', 60, ['series'], snapshot)
+    assert cache.get('page') is None
+
+
+def test_memoized_read_is_queried_again_after_a_write():
+    generations = TableGenerations()
+    memo = ReadMemo(generations)
+    calls = []
+
+    def get_series(connexion, limit):
+        calls.append(limit)
+        return [['Dark'], ['Fleabag']][:limit]
+
+    DB_STATS['memo_hits'] = 0
+    first = memo.call(get_series, ['series'], None, (2,), {})
+    first.append(['modifié par le contrôleur'])  # the memoized result is a copy
+    assert memo.call(get_series, ['series'], None, (2,), {}) == [['Dark'], ['Fleabag']]
+    assert calls == [2] and DB_STATS['memo_hits'] == 1
+    web_connection(generations).statement_executed("INSERT INTO series VALUES ('Lupin')", "INSERT 0 1", 1)
+    memo.call(get_series, ['series'], None, (2,), {})
+    assert calls == [2, 2]
+
+
+def test_fragment_is_rendered_again_after_a_write():
+    generations = TableGenerations()
+    env = Environment(loader=DictLoader({'page': '{% cache "liste", 60, "series" %}{{ render() }}{% endcache %}'}),
+                      extensions=[FragmentCacheExtension])
+    env.fragment_cache = ResponseCache(generations)
+    renders = []
+
+    def render():
+        renders.append(1)
+        return len(renders)
+
+    template = env.get_template('page')
+    assert [template.render(render=render) for _ in range(2)] == ['1', '1']
+    generations.bump({'series'})
+    assert template.render(render=render) == '2'
@@ -0,0 +1,92 @@
+import json
+import queue
+import socket
+from time import monotonic, sleep
+from types import SimpleNamespace
+
+from webserver.events import EventHub
+
+
+class FakeListenerConnection:
+    """
+    Listener connection of the hub: LISTEN is recorded, notifications are taken from a queue filled by the test
+    """
+
+    def __init__(self):
+        self.closed = False
+        self.listens = []
+        self.queue = queue.Queue()
+
+    def execute(self, query):
+        self.listens.append(query)
+
+    def notifies(self, timeout=None):
+        try:
+            yield self.queue.get(timeout=0.05)
+        except queue.Empty:
+            return
+
+    def close(self):
+        self.closed = True
+
+
+def notify(connexion, topic, event, event_id, data):
+    payload = {'topic': topic, 'event': event, 'data': data}
+    if event_id is not None:
+        payload['id'] = event_id
+    connexion.queue.put(SimpleNamespace(channel='live', payload=json.dumps(payload)))
+
+
+def wait_recorded(backlog, count):
+    deadline = monotonic() + 2
+    while len(backlog['messages']) < count and monotonic() < deadline:
+        sleep(0.01)
+
+
+def read_events(client):
+    client.settimeout(1)
+    data = b''
+    try:
+        while True:
+            chunk = client.recv(4096)
+            if not chunk:
+                break
+            data += chunk
+    except socket.timeout:
+        pass
+    return data.decode('utf-8')
+
+
+def test_notifications_between_catch_up_and_subscribe_are_not_lost():
+    connexion = FakeListenerConnection()
+    hub = EventHub(lambda: connexion)
+    try:
+        backlog = hub.open_backlog('live')
+        assert backlog is not None and connexion.listens  # LISTEN done before the controller reads the past events
+        notify(connexion, '7', 'log', 1, 'already read')  # committed before the read: also in the initial events
+        notify(connexion, '7', 'log', 2, 'missed')  # committed after the read, before subscribe
+        notify(connexion, '8', 'log', 3, 'other game')
+        notify(connexion, '7', 'state', None, 'ended')
+        wait_recorded(backlog, 4)
+        server_side, client = socket.socketpair()
+        assert hub.subscribe('live', '7', server_side, backlog, {'1'})
+        notify(connexion, '7', 'log', 4, 'live')
+        events = read_events(client)
+        assert 'already read' not in events and 'other game' not in events
+        assert events.index('missed') < events.index('ended') < events.index('live')
+        assert hub.backlogs == []
+    finally:
+        hub.stop()
+
+
+def test_backlog_lost_with_the_listener_connection():
+    hub = EventHub(lambda: None)
+    backlog = {'channel': 'live', 'messages': [], 'lost': True}
+    server_side, client = socket.socketpair()
+    assert not hub.subscribe('live', '7', server_side, backlog)
+    assert not hub.owns(server_side)
+    hub.stop()
+
+
+def test_no_backlog_without_database():
+    assert EventHub(None).open_backlog('live') is None
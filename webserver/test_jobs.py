@@ -0,0 +1,31 @@
+from webserver.jobs import JobQueue
+
+
+def add(job, a, b):
+    job.progress(1, 1, "addition")
+    return a + b
+
+
+def fail(job):
+    raise ValueError("échec volontaire")
+
+
+def test_status_is_read_from_the_shared_status_file(tmp_path):
+    submitter = JobQueue(str(tmp_path), nb_threads=0)  # synchronous jobs
+    other_worker = JobQueue(str(tmp_path), nb_threads=0)  # same jobs directory, nothing submitted
+    job = submitter.submit("Addition", add, 2, 3)
+    status = other_worker.status(job.id)
+    assert status['id'] == job.id and status['finished'] and status['state'] == job.DONE
+    assert status['result'] == 5 and status['error'] is None and (status['done'], status['total']) == (1, 1)
+
+
+def test_failed_job_reports_its_error(tmp_path):
+    jobs = JobQueue(str(tmp_path), nb_threads=0)
+    status = jobs.status(jobs.submit("Échec", fail).id)
+    assert status['finished'] and status['error'] == "échec volontaire" and status['result'] is None
+
+
+def test_unknown_or_invalid_job_has_no_status(tmp_path):
+    jobs = JobQueue(str(tmp_path), nb_threads=0)
+    assert jobs.status('0123456789abcdef') is None
+    assert jobs.status('../../etc/passwd') is None and jobs.status_file('../x') is None
@@ -1,11 +1,25 @@
-from controleurs.includes import get_schema_list, get_tables_per_schema
+from controleurs.includes import refresh_schemas, load_schemas, apply_schemas
 
-# checking if a refresh (of schemas list) is needed
-if 'bouton-refresh' in POST:
-    SESSION['schemas'] = get_schema_list(SESSION['CONNEXION']) # list of schemas
-    SESSION['schema_to_tables'] = get_tables_per_schema(SESSION['CONNEXION'], SESSION['schemas'])
-    SESSION['nb_tables_user'] = sum([len(_) for _ in SESSION['schema_to_tables'].values()])
-    SESSION['schemas_to_tables_to_atts'] = dict() # reinitalize list of attributes in each schema
-    REQUEST_VARS['message'] = "La liste des schémas a bien été mise à jour."
-    REQUEST_VARS['message_class'] = "success"
 
+def schemas_loaded(job):
+    """
+    Store the schemas listed by the background job (called in the main thread, before the next request)
+    """
+    apply_schemas(SESSION, job.result['schemas'], job.result['schema_to_tables'])
+    if SESSION.get('query_cache') is not None:  # the database may have been modified outside of BIPS
+        SESSION['query_cache'].clear()
+
+
+# checking if a refresh (of schemas list) is needed: the schemas and tables are listed in background
+if 'bouton-refresh' in POST:
+    job = SESSION['JOBS'].submit("Mise à jour de la liste des schémas", load_schemas, on_done=schemas_loaded)
+    if job is not None:
+        REQUEST_VARS['job'] = job.id
+        REQUEST_VARS['message'] = "La liste des schémas est en cours de mise à jour."
+        REQUEST_VARS['message_class'] = "info"
+    else:  # too many jobs: refresh during the request
+        refresh_schemas(SESSION)
+        if SESSION.get('query_cache') is not None:
+            SESSION['query_cache'].clear()
+        REQUEST_VARS['message'] = "La liste des schémas a bien été mise à jour."
+        REQUEST_VARS['message_class'] = "success"
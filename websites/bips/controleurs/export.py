@@ -0,0 +1,43 @@
+"""
+Export des instances d'une table (GET /export/<schema>/<table>?format=...) ou du résultat d'une requête soumise (POST /export avec requete_sql),
+au format CSV, TSV ou NDJSON. Les données sont envoyées par blocs depuis PostgreSQL (COPY ... TO STDOUT), sans être chargées en mémoire.
+"""
+
+from model.model_pg import export, table_query, EXPORT_FORMATS
+from controleurs.includes import add_query_to_session, is_read_query
+
+route_params = REQUEST_VARS['route_params']  # {'schema': ..., 'table': ...} for a table, empty for a query
+export_format = (POST.get('format') or GET.get('format') or ['csv'])[0]
+result = None
+
+if export_format not in EXPORT_FORMATS:
+    REQUEST_VARS['message'] = f"Erreur : format d'export {export_format} inconnu (formats possibles : {', '.join(EXPORT_FORMATS)})."
+    REQUEST_VARS['message_class'] = "error"
+elif 'requete_sql' in POST:  # export du résultat d'une requête
+    sql_query = POST['requete_sql'][0].strip().rstrip(';')  # first element because HTML names are not unique
+    SESSION['old_queries'] = add_query_to_session(SESSION['old_queries'], POST['requete_sql'][0])
+    if not is_read_query(sql_query):
+        REQUEST_VARS['message'] = "Erreur : seules les requêtes de lecture (SELECT) peuvent être exportées."
+        REQUEST_VARS['message_class'] = "error"
+    else:
+        result = export(SESSION['CONNEXION'], sql_query, export_format)
+        filename = f"requete.{export_format}"
+elif not route_params:  # neither a query nor a table
+    REQUEST_VARS['message'] = "Erreur : aucune requête soumise (l'export d'une table se fait par l'URL /export/<schema>/<table>)."
+    REQUEST_VARS['message_class'] = "error"
+elif route_params['schema'] not in SESSION['schemas']:  # schema does not exist
+    REQUEST_VARS['message'] = f"Erreur : le schéma {route_params['schema']} n'existe pas !"
+    REQUEST_VARS['message_class'] = "error"
+elif route_params['table'] not in SESSION['schema_to_tables'][route_params['schema']]:  # table does not exist
+    REQUEST_VARS['message'] = f"Erreur : la table {route_params['table']} n'existe pas dans le schéma {route_params['schema']} !"
+    REQUEST_VARS['message_class'] = "error"
+else:  # export d'une table
+    result = export(SESSION['CONNEXION'], table_query(route_params['schema'], route_params['table']), export_format)
+    filename = f"{route_params['schema']}.{route_params['table']}.{export_format}"
+
+if result is not None:
+    if result.error_code:
+        REQUEST_VARS['message'] = f"Erreur {result.error_code} : {result.error_message}"
+        REQUEST_VARS['message_class'] = "error"
+    else:  # la réponse est le flux de données (pas de template)
+        REQUEST_VARS['stream'] = {'chunks': result.result_stream, 'mime_type': EXPORT_FORMATS[export_format][1], 'filename': filename}
@@ -2,21 +2,32 @@
 Ficher includes contenant des fonctions utilisées par plusieurs controleurs
 """
 
-from model.model_pg import get_schemas, get_tables, update_search_path, query
+import re
+from copy import copy
+from model.model_pg import get_schemas, get_tables, get_referencing_tables, get_qualified_tables, get_non_table_names, update_search_path, query
+from model.query_cache import is_cacheable, referenced_tables, referenced_relations, referenced_functions
 from logzero import logger
 
+LEADING_COMMENTS = re.compile(r"^(\s+|--[^\n]*(\n|$)|/\*.*?\*/)+", re.DOTALL)  # whitespaces and comments before the first keyword of a query
+READ_KEYWORDS = ('select', 'with', 'values', 'table')  # first keyword of queries returning instances without modifying data
+WRITE_KEYWORDS = re.compile(r"\b(insert|update|delete|merge|truncate|into)\b", re.IGNORECASE)  # data-modifying CTE or SELECT INTO
 
-def process_query(connexion, sql_query):
+
+def process_query(connexion, sql_query, cache=None, search_path=None):
     """
     Execute a query directly and checks its output for setting relevant message in REQUEST_VARS
     sql_query: string representing the SQL query to be executed
+    cache: optional query_cache object (SESSION['query_cache']) used for read-only queries
+    search_path: current search_path (list of schemas), part of the cache key
     """
-    result = query(connexion, sql_query)
+    result, from_cache = cached_query(connexion, sql_query, cache, search_path)
     if result.error_code:
         message = f"Erreur {result.error_code} : {result.error_message}"  # {result.error_detail}
         message_class = "error"
-    elif result.is_select_query:  # requete SELECT ou SET avec des instances en résultat
+    elif result.is_select_query:  # requete SELECT, SHOW, ... RETURNING avec des instances en résultat
         message = f"Requête exécutée avec succès : { len(result.result_instances) } instance(s) résultat."
+        if from_cache:
+            message += " (résultat en cache)"
         message_class = "success"
     else:  # requete DELETE/UPDATE/INSERT/... avec un nombre de tuples affectés
         message = f"Requête exécutée avec succès : { result.result_affected_rows } instance(s) affectée(s)."
@@ -24,6 +35,82 @@ def process_query(connexion, sql_query):
     return result, message, message_class
 
 
+def cached_query(connexion, sql_query, cache=None, search_path=None):
+    """
+    Execute a query, or get its result from the cache for read-only queries already executed (with the same search_path).
+    Only the results of queries reading base tables only are cached (see read_base_tables), keyed by schema-qualified table names.
+    A successful query which modifies data invalidates the cached results of the tables it modifies
+    (and of the tables referencing them), or the whole cache when these tables are unknown (DDL, SET, ...) or have triggers or rules.
+    connexion: database connection link
+    sql_query: string representing the SQL query to be executed
+    cache: optional query_cache object (no cache if None)
+    search_path: current search_path (list of schemas)
+    Returns: a tuple (query_result object, boolean True if the result comes from the cache)
+    """
+    cacheable = cache is not None and is_read_query(sql_query) and is_cacheable(sql_query)
+    if cacheable:
+        result = cache.get(sql_query, search_path)
+        if result is not None:
+            result = copy(result)  # the displayed query is the submitted one
+            result.query = sql_query
+            return result, True
+    result = query(connexion, sql_query)
+    if cache is not None and not result.error_code:
+        tables = read_base_tables(connexion, sql_query) if cacheable and result.is_select_query else None
+        if tables is not None:
+            cache.put(sql_query, search_path, result, tables=tables)
+        elif not is_read_query(sql_query):  # query modifying data or schema (possibly returning instances)
+            invalidate_cache(connexion, cache, sql_query)
+    return result, False
+
+
+def invalidate_cache(connexion, cache, sql_query):
+    """
+    Remove from the cache the results which may be changed by a query modifying data
+    connexion: database connection link
+    cache: query_cache object
+    sql_query: string representing the executed SQL query
+    """
+    relations = referenced_relations(sql_query)
+    dependent_tables = get_referencing_tables(connexion, relations) if relations else None
+    if (not relations or dependent_tables.error_code or not dependent_tables.result_instances  # DDL, SET, unknown tables...
+            or any(has_triggers for _, _, has_triggers in dependent_tables.result_instances)):  # triggers or rules may write other tables
+        cache.clear()
+        logger.info("Cache des requêtes vidé")
+    else:
+        tables = {f"{schema}.{table}" for schema, table, _ in dependent_tables.result_instances}
+        cache.invalidate_tables(tables)
+        logger.info(f"Cache des requêtes invalidé pour les tables {sorted(tables)}")
+
+
+def read_base_tables(connexion, sql_query):
+    """
+    Find the tables read by a read-only query, if it only reads base tables, i.e. if its cached result is invalidated by the writes on these tables:
+    no view, materialized view, foreign table or sequence, and no user-defined function (which may read any table)
+    connexion: database connection link (tables are resolved with its search_path)
+    sql_query: string representing the SQL query
+    Returns: a set of schema-qualified table names ("schema.table"), or None if the query reads something else than base tables (or if the check fails)
+    """
+    others = get_non_table_names(connexion, referenced_tables(sql_query), referenced_functions(sql_query))
+    if others.error_code or others.result_instances:
+        return None
+    tables = get_qualified_tables(connexion, referenced_relations(sql_query))
+    if tables.error_code:
+        return None
+    return {f"{schema}.{table}" for schema, table in tables.result_instances}
+
+
+def is_read_query(sql_query):
+    """
+    Check that a query only reads data (SELECT, WITH, VALUES or TABLE query, without data-modifying keyword)
+    sql_query: string representing the SQL query
+    Returns: a boolean
+    """
+    text = LEADING_COMMENTS.sub('', sql_query)
+    first_word = text.split(None, 1)[0].lower() if text.strip() else ''
+    return first_word in READ_KEYWORDS and not WRITE_KEYWORDS.search(text)
+
+
 def add_query_to_session(old_queries, sql_query):
     """
     Add a submitted query directly into session (SESSION['old_queries'])
@@ -61,6 +148,42 @@ def get_tables_per_schema(connexion, schemas):
     return tables_per_schema
 
 
+def refresh_schemas(session):
+    """
+    Reload the lists of schemas and tables in session (e.g., after a modification of the database schema)
+    session: SESSION dict, containing the database connection
+    """
+    schemas = get_schema_list(session['CONNEXION'])
+    apply_schemas(session, schemas, get_tables_per_schema(session['CONNEXION'], schemas))
+
+
+def load_schemas(job):
+    """
+    Background job (SESSION['JOBS']) listing the schemas and their tables, with the database connection of the job thread
+    job: the running Job (see server.py)
+    Returns: a dict {'schemas': list of schemas, 'schema_to_tables': dict of lists of tables}
+    """
+    schemas = get_schema_list(job.connexion)
+    schema_to_tables = dict()
+    for i, sch in enumerate(schemas):
+        job.progress(i, len(schemas), f"schéma {sch}")
+        schema_to_tables.update(get_tables_per_schema(job.connexion, [sch]))
+    return {'schemas': schemas, 'schema_to_tables': schema_to_tables}
+
+
+def apply_schemas(session, schemas, schema_to_tables):
+    """
+    Store the lists of schemas and tables in session
+    session: SESSION dict
+    schemas: list of schemas
+    schema_to_tables: dict of lists of tables per schema
+    """
+    session['schemas'] = schemas # list of schemas
+    session['schema_to_tables'] = schema_to_tables
+    session['nb_tables_user'] = sum([len(_) for _ in session['schema_to_tables'].values()])
+    session['schemas_to_tables_to_atts'] = dict() # reinitalize list of attributes in each schema
+
+
 def reorder_search_path(schemas, current_schema):
     """
     Re-order the list of schemas so that the first one is the current schema.
@@ -1,9 +1,18 @@
-from model.model_pg import query
+from model.model_pg import explain
 from controleurs.includes import add_query_to_session, process_query
 
 
 if 'requete_sql' in POST:  # formulaire soumis
     sql_query = POST['requete_sql'][0]  # first element because HTML names are not unique
     SESSION['old_queries'] = add_query_to_session(SESSION['old_queries'], sql_query)
-    REQUEST_VARS['query_result'], REQUEST_VARS['message'], REQUEST_VARS['message_class'] = process_query(SESSION['CONNEXION'], sql_query)
+    if 'bouton-analyze' in POST:  # analyse du plan d'exécution (EXPLAIN ANALYZE), les modifications éventuelles sont annulées
+        REQUEST_VARS['query_result'] = explain(SESSION['CONNEXION'], sql_query)
+        if REQUEST_VARS['query_result'].error_code:
+            REQUEST_VARS['message'] = f"Erreur {REQUEST_VARS['query_result'].error_code} : {REQUEST_VARS['query_result'].error_message}"
+            REQUEST_VARS['message_class'] = "error"
+        else:
+            REQUEST_VARS['message'] = f"Requête analysée : exécutée en {REQUEST_VARS['query_result'].result_plan[2]:.3f} ms (planification : {REQUEST_VARS['query_result'].result_plan[1]:.3f} ms), modifications annulées."
+            REQUEST_VARS['message_class'] = "success"
+    else:
+        REQUEST_VARS['query_result'], REQUEST_VARS['message'], REQUEST_VARS['message_class'] = process_query(SESSION['CONNEXION'], sql_query, SESSION.get('query_cache'), SESSION['search_path'])
 
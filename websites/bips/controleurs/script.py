@@ -0,0 +1,46 @@
+"""
+Exécution d'un script SQL (plusieurs requêtes séparées par des points-virgules), saisi ou téléversé (fichier .sql).
+Les requêtes sont exécutées dans une seule transaction : soit toutes sont validées, soit aucune.
+"""
+
+from model.model_pg import execute_script
+from model.sql_script import split_statements
+from controleurs.includes import refresh_schemas
+
+script = None
+if FILES.get('fichier_sql'):  # fichier téléversé (prioritaire sur la zone de saisie)
+    fichier = FILES['fichier_sql'][0]
+    try:
+        script = fichier['content'].decode('utf-8-sig')
+    except UnicodeDecodeError:
+        REQUEST_VARS['message'] = f"Erreur : le fichier {fichier['filename']} n'est pas encodé en UTF-8."
+        REQUEST_VARS['message_class'] = "error"
+elif 'script_sql' in POST:  # script saisi
+    script = POST['script_sql'][0]
+
+if script is not None:
+    REQUEST_VARS['script'] = script
+    statements = split_statements(script)
+    if not statements:
+        REQUEST_VARS['message'] = "Erreur : le script ne contient aucune requête."
+        REQUEST_VARS['message_class'] = "error"
+    else:
+        pipeline = 'detail' not in POST  # le mode détaillé chronomètre chaque requête (un aller-retour par requête)
+        results, duration, committed = execute_script(SESSION['CONNEXION'], statements, pipeline)
+        REQUEST_VARS['script_results'] = results
+        REQUEST_VARS['script_pipeline'] = pipeline and committed
+        errors = [(num, qr) for num, qr in enumerate(results, 1) if qr.error_code]
+        if committed:
+            REQUEST_VARS['message'] = f"Script exécuté avec succès en {duration * 1000:.1f} ms : {len(results)} requête(s) validée(s)."
+            REQUEST_VARS['message_class'] = "success"
+            if any(not qr.is_select_query for qr in results):  # le script a pu modifier les données ou le schéma
+                if SESSION.get('query_cache') is not None:
+                    SESSION['query_cache'].clear()
+                refresh_schemas(SESSION)
+        elif errors:
+            num, qr = errors[0]
+            REQUEST_VARS['message'] = f"Erreur à la requête n°{num} ({qr.error_code} : {qr.error_message}) : la transaction a été annulée, aucune modification n'a été enregistrée."
+            REQUEST_VARS['message_class'] = "error"
+        else:  # erreur en mode pipeline non reproduite lors de la réexécution
+            REQUEST_VARS['message'] = "Erreur lors de l'exécution du script : la transaction a été annulée, aucune modification n'a été enregistrée."
+            REQUEST_VARS['message_class'] = "error"
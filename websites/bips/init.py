@@ -4,12 +4,18 @@ Ficher initialisation (eg, constantes chargées au démarrage dans la session)
 
 from datetime import datetime
 from controleurs.includes import get_schema_list, get_tables_per_schema, set_search_path
+from model.query_cache import query_cache
 
 SESSION['APP'] = "BIPS"
 SESSION['BASELINE'] = "Basic Interface for PostgreSQL"
 SESSION['CURRENT_YEAR'] = datetime.now().year
 SESSION['old_queries'] = list()
 
+# cache (optionnel) des résultats des requêtes de lecture, invalidé par les requêtes d'écriture faites depuis BIPS
+# (les modifications faites hors de BIPS ne sont visibles qu'après expiration (ttl, en secondes) ou rafraichissement)
+QUERY_CACHE_ENABLED = False
+SESSION['query_cache'] = query_cache(max_entries=100, ttl=300, max_rows=10000) if QUERY_CACHE_ENABLED else None
+
 SESSION['schemas'] = get_schema_list(SESSION['CONNEXION']) # list of schemas
 SESSION['search_path'] = set_search_path(SESSION['CONNEXION'], SESSION['schemas'])
 # SESSION['schema_to_tables'] = list of tables per schema {'schema1': [table1, table2, ...], 'schema2': [...], ...}
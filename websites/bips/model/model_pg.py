@@ -1,7 +1,17 @@
 import psycopg
+from psycopg import sql
+from time import perf_counter
 from model.query_result import query_result
+from model.query_plan import parse_plan
 from logzero import logger
 
+# COPY options for each export format (ndjson: one JSON object per line, with quote/delimiter characters that never appear in JSON so that nothing is escaped)
+EXPORT_FORMATS = {
+    'csv': ("FORMAT csv, HEADER true", 'text/csv; charset=utf-8'),
+    'tsv': ("FORMAT csv, DELIMITER E'\\t', HEADER true", 'text/tab-separated-values; charset=utf-8'),
+    'ndjson': ("FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02'", 'application/x-ndjson'),
+}
+
 def get_schemas(connection):
     """
     Get the list of schemas in current database.
@@ -54,6 +64,54 @@ def get_attributes(connection, schema, table_name):
     """
     return query(connection, sql_query)
 
+def get_referencing_tables(connection, relation_names):
+    """
+    Get the given tables and all the tables which reference them (directly or transitively) with a foreign key,
+    i.e. the tables whose content may change when the given tables are modified (ON DELETE/UPDATE CASCADE, SET NULL, ...).
+    Tables with user triggers or rules are flagged: a write on them may modify any other table.
+    relation_names: names as written in a query, possibly schema-qualified (see query_cache.referenced_relations),
+    resolved with the search_path of the connection
+
+    Returns: a query_result object containing a list of (schema name, table name, True if the table has user triggers or rules)
+    """
+    sql_query = """WITH RECURSIVE dep(relid) AS (
+        SELECT c.oid FROM unnest(%s::text[]) AS r(name) JOIN pg_catalog.pg_class c ON c.oid = pg_catalog.to_regclass(r.name)
+        WHERE c.relkind IN ('r', 'p')
+        UNION
+        SELECT con.conrelid FROM pg_catalog.pg_constraint con JOIN dep ON con.confrelid = dep.relid WHERE con.contype = 'f'
+    )
+    SELECT n.nspname, c.relname, bool_or(c.relhasrules OR EXISTS (SELECT 1 FROM pg_catalog.pg_trigger t WHERE t.tgrelid = c.oid AND NOT t.tgisinternal))
+    FROM pg_catalog.pg_class c JOIN dep ON c.oid = dep.relid JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    GROUP BY n.nspname, c.relname"""
+    return query(connection, sql_query, (list(relation_names),))
+
+def get_qualified_tables(connection, relation_names):
+    """
+    Resolve relation names as written in a query, possibly schema-qualified (see query_cache.referenced_relations),
+    with the search_path of the connection (names which are not base tables are left out).
+
+    Returns: a query_result object containing a list of (schema name, table name)
+    """
+    sql_query = """SELECT DISTINCT n.nspname, c.relname
+    FROM unnest(%s::text[]) AS r(name) JOIN pg_catalog.pg_class c ON c.oid = pg_catalog.to_regclass(r.name)
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    WHERE c.relkind IN ('r', 'p')"""
+    return query(connection, sql_query, (list(relation_names),))
+
+def get_non_table_names(connection, relation_names, function_names):
+    """
+    Get the given relation names which are not base tables (views, materialized views, foreign tables, sequences),
+    and the given function names which are user-defined functions (outside pg_catalog and information_schema):
+    their results may change without any write on the tables named in a query.
+
+    Returns: a query_result object containing a list of names
+    """
+    sql_query = """SELECT relname FROM pg_catalog.pg_class WHERE relname = ANY(%s) AND relkind IN ('v', 'm', 'f', 'S')
+    UNION
+    SELECT proname FROM pg_catalog.pg_proc p JOIN pg_catalog.pg_namespace n ON n.oid = p.pronamespace
+    WHERE proname = ANY(%s) AND n.nspname NOT IN ('pg_catalog', 'information_schema')"""
+    return query(connection, sql_query, (list(relation_names), list(function_names)))
+
 def query(connection, sql_query, params=()):
     """
     Execute a SQL query sql on the given connection using optional params.
@@ -66,22 +124,167 @@ def query(connection, sql_query, params=()):
     with connection.cursor() as cursor:
         try:
             cursor.execute(sql_query, params)
-            qr.statusmessage = cursor.statusmessage
+            _fill_result(qr, cursor)
             qr.full_query = cursor._query
-            if sql_query.lower().startswith("select") or sql_query.lower().startswith("show"):  # SELECT or SHOW query
-                qr.result_instances = cursor.fetchall()
-                qr.result_attributes = tuple([_[0]  for _ in cursor.description])
-            else:  # INSERT / DELETE / UPDATE query, returns the number of affected rows
-                qr.is_select_query = False
-                qr.result_affected_rows = cursor.rowcount
         except psycopg.Error as e:
-            qr.error_code = e.diag.sqlstate
-            qr.error_message = e.diag.message_primary
-            qr.error_type = e.diag.severity
-            qr.error_detail = e.diag.message_detail
-            logger.exception(e)
+            _set_error(qr, e)
     return qr
 
+def execute_script(connection, statements, pipeline=True):
+    """
+    Execute the statements of a SQL script in a single transaction (all statements are committed, or none if one fails).
+    With pipeline=True, statements are sent in pipeline mode (no round-trip between statements, only the total time is known);
+    if a statement fails, the statements are replayed one by one in a transaction which is rolled back, to locate the error.
+    With pipeline=False, statements are sent one by one and timed individually.
+    statements: list of SQL statements (see sql_script.split_statements)
+
+    Returns: a tuple (list of query_result objects, one per statement, with duration in seconds; total duration in seconds; True if the transaction was committed)
+    """
+    results = [query_result(statement, None) for statement in statements]
+    start = perf_counter()
+    if pipeline and psycopg.Pipeline.is_supported():
+        cursors = []
+        try:
+            with connection.transaction():
+                with connection.pipeline():
+                    for qr in results:
+                        cursor = connection.cursor()
+                        cursor.execute(qr.query)  # no params: % is not a special character
+                        cursors.append(cursor)
+                for qr, cursor in zip(results, cursors):
+                    _fill_result(qr, cursor)
+                    qr.full_query = qr.query
+            return results, perf_counter() - start, True
+        except psycopg.Error as e:  # the transaction is rolled back
+            logger.warning(f"Erreur dans le script en mode pipeline ({e.diag.message_primary}), réexécution requête par requête pour la localiser")
+        finally:
+            for cursor in cursors:
+                cursor.close()
+        results = [query_result(statement, None) for statement in statements]
+        _execute_sequentially(connection, results, force_rollback=True)
+        return results, perf_counter() - start, False
+    committed = _execute_sequentially(connection, results)
+    return results, perf_counter() - start, committed
+
+def _execute_sequentially(connection, results, force_rollback=False):
+    """
+    Execute the queries of the given query_result objects one by one in a single transaction, stopping at the first error
+
+    Returns: True if the transaction was committed
+    """
+    try:
+        with connection.transaction(force_rollback=force_rollback):
+            with connection.cursor() as cursor:
+                for qr in results:
+                    start = perf_counter()
+                    try:
+                        cursor.execute(qr.query)
+                        _fill_result(qr, cursor)
+                        qr.full_query = qr.query
+                    except psycopg.Error as e:
+                        _set_error(qr, e)
+                        raise
+                    finally:
+                        qr.duration = perf_counter() - start
+    except psycopg.Error:  # the transaction is rolled back
+        return False
+    return not force_rollback
+
+def _fill_result(qr, cursor):
+    """
+    Store the result of the last query executed by cursor: instances if the query returns rows (SELECT, SHOW, ... RETURNING), number of affected rows otherwise
+    """
+    qr.statusmessage = cursor.statusmessage
+    if cursor.description is not None:  # query returning instances
+        qr.result_instances = cursor.fetchall()
+        qr.result_attributes = tuple([_[0]  for _ in cursor.description])
+    else:  # INSERT / DELETE / UPDATE query, returns the number of affected rows
+        qr.is_select_query = False
+        qr.result_affected_rows = cursor.rowcount
+
+def _set_error(qr, e):
+    """
+    Store the error raised by a query (psycopg.Error e) in the query_result object qr
+    """
+    qr.error_code = e.diag.sqlstate
+    qr.error_message = e.diag.message_primary
+    qr.error_type = e.diag.severity
+    qr.error_detail = e.diag.message_detail
+    logger.exception(e)
+
+def explain(connection, sql_query):
+    """
+    Execute a SQL query with EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) inside a transaction which is always rolled back
+    (the query is really executed, but its modifications are cancelled).
+
+    Returns: a query_result object containing the parsed plan (result_plan) or an error
+    """
+    qr = query_result(sql_query, None)
+    explain_query = f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql_query.strip().rstrip(';')}"
+    try:
+        with connection.transaction(force_rollback=True):
+            with connection.cursor() as cursor:
+                cursor.execute(explain_query)
+                qr.statusmessage = cursor.statusmessage
+                qr.full_query = explain_query
+                qr.result_plan = parse_plan(cursor.fetchone()[0])
+    except psycopg.Error as e:
+        _set_error(qr, e)
+    return qr
+
+def table_query(schema, table_name):
+    """
+    Build the query selecting all instances of a table (schema and table names are quoted as identifiers).
+
+    Returns: a psycopg sql.Composed object
+    """
+    return sql.SQL("SELECT * FROM {}.{}").format(sql.Identifier(schema), sql.Identifier(table_name))
+
+def export(connection, select_query, export_format='csv'):
+    """
+    Export the result of a SELECT query with COPY ... TO STDOUT: data is streamed from PostgreSQL by blocks, never fully loaded in memory.
+    select_query: SELECT query (string or psycopg sql object), without final semicolon
+    export_format: csv, tsv or ndjson (see EXPORT_FORMATS)
+
+    Returns: a query_result object, whose result_stream is an iterator of bytes blocks (or with error fields set if the COPY cannot start)
+    """
+    qr = query_result(select_query if isinstance(select_query, str) else select_query.as_string(connection), ())
+    options = EXPORT_FORMATS[export_format][0]
+    if isinstance(select_query, str):
+        select_query = sql.SQL(select_query)
+    if export_format == 'ndjson':
+        select_query = sql.SQL("SELECT row_to_json(q) FROM ({}) AS q").format(select_query)
+    copy_query = sql.SQL("COPY ({}) TO STDOUT WITH (" + options + ")").format(select_query)
+    stream = _copy_out(connection, copy_query)
+    try:  # start the COPY now, so that errors (e.g., syntax) are reported before the response is sent
+        first_block = next(stream)
+    except StopIteration:
+        first_block = b''
+    except psycopg.Error as e:
+        _set_error(qr, e)
+        return qr
+    qr.result_stream = _prepend(first_block, stream)
+    return qr
+
+def _copy_out(connection, copy_query):
+    """
+    Generator of the data blocks sent by PostgreSQL for a COPY ... TO STDOUT query
+    """
+    with connection.cursor() as cursor:
+        with cursor.copy(copy_query) as copy:
+            for data in copy:
+                yield bytes(data)
+
+def _prepend(first_block, stream):
+    """
+    Generator yielding first_block then the blocks of stream (closing stream if the generator is closed before the end)
+    """
+    try:
+        yield first_block
+        yield from stream
+    finally:
+        stream.close()
+
 def disconnect(connection):
     """
     Close the database connection
@@ -0,0 +1,186 @@
+import re
+from collections import OrderedDict
+from time import monotonic
+
+# tokens of a query: string literals, comments, (possibly qualified and quoted) identifiers, or any other character
+TOKENS = re.compile(r"""'(?:[^']|'')*'|--[^\n]*|/\*.*?\*/|(?:"[^"]*"|\w+)(?:\s*\.\s*(?:"[^"]*"|\w+))*|\S""", re.DOTALL)
+# keywords followed by a table name
+TABLE_KEYWORDS = {'from', 'join', 'update', 'into', 'truncate', 'table'}
+# keywords which may be found between a table keyword and the table name
+SKIPPED_KEYWORDS = {'only', 'lateral', 'table', 'if', 'exists'}
+# keywords ending a list of tables
+LIST_END_KEYWORDS = {'where', 'group', 'order', 'limit', 'offset', 'having', 'window', 'union', 'intersect', 'except', 'returning', 'set', 'for', 'restart', 'continue', 'cascade', 'restrict'}
+# functions or catalog views whose result changes without any write on a table: such queries are never cached
+VOLATILE = re.compile(r"\b(now|random|nextval|currval|setval|lastval|clock_timestamp|statement_timestamp|timeofday|current_timestamp|current_time|current_date|localtime|localtimestamp|pg_sleep\w*|txid_current\w*|gen_random_uuid|pg_stat\w*|pg_locks)\b|\bfor\s+(update|share|no\s+key\s+update|key\s+share)\b", re.IGNORECASE)
+
+
+def tokenize(sql_query):
+    """
+    Split a query into tokens, without comments
+
+    Returns: a list of strings
+    """
+    return [t for t in TOKENS.findall(sql_query) if not t.startswith(('--', '/*'))]
+
+
+def normalize_query(sql_query):
+    """
+    Normalize a query for using it as a cache key: comments removed, whitespaces collapsed, unquoted words in lower case, final semicolon removed
+    (string literals and quoted identifiers are kept as is)
+
+    Returns: a string
+    """
+    tokens = [t if t[0] in "'\"" else t.lower() for t in tokenize(sql_query)]
+    while tokens and tokens[-1] == ';':
+        tokens.pop()
+    return ' '.join(tokens)
+
+
+def referenced_tables(sql_query):
+    """
+    Find the names of the tables used by a query (after FROM, JOIN, UPDATE, INTO, TRUNCATE, TABLE, including comma-separated lists after FROM and TRUNCATE).
+    The detection is syntactic and conservative: CTE names or columns may also be returned.
+
+    Returns: a set of table names (without schema, lower case unless quoted)
+    """
+    tables = set()
+    for name in referenced_relations(sql_query):
+        name = re.findall(r'"[^"]*"|\w+', name)[-1]  # without schema
+        tables.add(name[1:-1] if name.startswith('"') else name)
+    return tables
+
+
+def referenced_relations(sql_query):
+    """
+    Find the relations used by a query as written in the query, possibly schema-qualified (see referenced_tables),
+    e.g. to resolve them with the search_path of the connection (to_regclass).
+
+    Returns: a set of relation names (unquoted parts in lower case, quoted parts kept with their quotes, no whitespace around dots)
+    """
+    tokens = tokenize(sql_query)
+    relations = set()
+    expect_table = None  # keyword after which the next identifier is a table name (None if not expecting a table)
+    list_depths = []  # parenthesis depths of the lists of tables (FROM, TRUNCATE) being read, where a comma precedes a table name
+    depth = 0
+    for i, token in enumerate(tokens):
+        word = token.lower()
+        if expect_table:
+            if word in SKIPPED_KEYWORDS:
+                continue
+            is_function = expect_table in ('from', 'join', ',') and i + 1 < len(tokens) and tokens[i + 1] == '('
+            expect_table = None
+            if (token[0].isalpha() or token[0] in '_"') and not is_function:
+                parts = re.findall(r'"[^"]*"|\w+', token)
+                relations.add('.'.join(part if part.startswith('"') else part.lower() for part in parts))
+                continue
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+            while list_depths and list_depths[-1] > depth:
+                list_depths.pop()
+        elif word in TABLE_KEYWORDS:
+            expect_table = word
+            if word in ('from', 'truncate') and (not list_depths or list_depths[-1] < depth):
+                list_depths.append(depth)
+        elif token == ',' and list_depths and list_depths[-1] == depth:
+            expect_table = ','
+        elif list_depths and list_depths[-1] == depth and (token == ';' or word in LIST_END_KEYWORDS):
+            list_depths.pop()
+    return relations
+
+
+def referenced_functions(sql_query):
+    """
+    Find the names of the functions called by a query (identifiers followed by a parenthesis).
+    The detection is syntactic and conservative: some keywords (e.g., IN, EXISTS) are also returned.
+
+    Returns: a set of function names (without schema, lower case unless quoted)
+    """
+    tokens = tokenize(sql_query)
+    functions = set()
+    for token, next_token in zip(tokens, tokens[1:]):
+        if next_token == '(' and (token[0].isalpha() or token[0] in '_"'):
+            name = re.split(r"\s*\.\s*", token)[-1]
+            functions.add(name[1:-1] if name.startswith('"') else name.lower())
+    return functions
+
+
+def is_cacheable(sql_query):
+    """
+    Check that the result of a read-only query can be cached (no volatile function, no row locking)
+
+    Returns: a boolean
+    """
+    return not VOLATILE.search(sql_query)
+
+
+class query_cache():
+    """
+        Class query_cache: LRU cache of the results (query_result objects) of read-only queries,
+        keyed by normalized query and search_path, with a TTL per entry and invalidation by table.
+    """
+
+    def __init__(self, max_entries=100, ttl=300, max_rows=10000, max_total_rows=200000):
+        self.max_entries = max_entries  # maximum number of cached results
+        self.ttl = ttl  # default time to live of an entry (seconds)
+        self.max_rows = max_rows  # results with more instances are not cached
+        self.max_total_rows = max_total_rows  # maximum number of instances in the whole cache
+        self.entries = OrderedDict()  # key -> (expiration time, query_result, set of tables, nb of rows), from least to most recently used
+        self.total_rows = 0
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, sql_query, search_path):
+        return (normalize_query(sql_query), tuple(search_path or ()))
+
+    def get(self, sql_query, search_path):
+        """
+        Get the cached result of a query (None if absent or expired)
+        """
+        key = self.key(sql_query, search_path)
+        entry = self.entries.get(key)
+        if entry is None or entry[0] < monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)  # most recently used
+        self.hits += 1
+        return entry[1]
+
+    def put(self, sql_query, search_path, result, ttl=None, tables=None):
+        """
+        Store the result of a successful read-only query (too large results are ignored)
+        ttl: time to live of this entry (default: ttl of the cache)
+        tables: names of the tables read by the query, as given later to invalidate_tables (default: referenced_tables of the query)
+        """
+        nb_rows = len(result.result_instances or ())
+        if nb_rows > self.max_rows:
+            return
+        key = self.key(sql_query, search_path)
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = (monotonic() + (self.ttl if ttl is None else ttl), result, set(referenced_tables(sql_query) if tables is None else tables), nb_rows)
+        self.total_rows += nb_rows
+        while len(self.entries) > self.max_entries or self.total_rows > self.max_total_rows:  # evict least recently used entries
+            self._remove(next(iter(self.entries)))
+
+    def invalidate_tables(self, tables):
+        """
+        Remove the entries using at least one of the given tables
+        tables: iterable of table names, in the same form as those given to put (e.g. schema-qualified)
+        """
+        tables = set(tables)
+        for key in [k for k, entry in self.entries.items() if entry[2] & tables]:
+            self._remove(key)
+
+    def clear(self):
+        self.entries.clear()
+        self.total_rows = 0
+
+    def _remove(self, key):
+        self.total_rows -= self.entries.pop(key)[3]
+
+    def __len__(self):
+        return len(self.entries)
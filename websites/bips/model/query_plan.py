@@ -0,0 +1,79 @@
+HOTSPOT_RATIO = 0.2  # nodes whose own time is at least this fraction of the execution time are hotspots
+LARGE_TABLE_ROWS = 10000  # sequential scans reading at least this number of rows are highlighted
+ESTIMATE_ERROR_FACTOR = 10  # row estimates wrong by at least this factor are highlighted
+
+
+class plan_node():
+    """
+        Class plan_node for storing a node of an execution plan (EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)),
+        with its own time (total time minus the time of its children) and its children nodes.
+    """
+
+    def __init__(self, plan):
+        self.node_type = plan.get('Node Type')
+        self.relation = plan.get('Relation Name')  # scanned table (scan nodes only)
+        self.alias = plan.get('Alias')
+        self.index = plan.get('Index Name')
+        self.details = [f"{label} : {plan[key]}" for key, label in (('Join Type', 'Jointure'), ('Hash Cond', 'Condition'), ('Merge Cond', 'Condition'), ('Join Filter', 'Filtre de jointure'), ('Index Cond', "Condition d'index"), ('Filter', 'Filtre'), ('Sort Key', 'Tri'), ('Group Key', 'Groupement')) if key in plan]
+        self.loops = plan.get('Actual Loops', 0)
+        self.total_time = plan.get('Actual Total Time', 0) * self.loops  # time of the node and its children, over all loops (ms)
+        self.plan_rows = plan.get('Plan Rows', 0)  # estimated number of rows (per loop)
+        self.actual_rows = plan.get('Actual Rows', 0)  # actual number of rows (per loop)
+        self.rows_removed = plan.get('Rows Removed by Filter', 0) * self.loops
+        self.shared_hit = plan.get('Shared Hit Blocks', 0)  # blocks found in PostgreSQL cache
+        self.shared_read = plan.get('Shared Read Blocks', 0)  # blocks read from disk (or OS cache)
+        self.children = [plan_node(child) for child in plan.get('Plans', [])]
+        self.self_time = max(0.0, self.total_time - sum(child.total_time for child in self.children))
+        self.time_ratio = 0.0  # fraction of the execution time spent in this node (set by parse_plan)
+        self.is_hotspot = False
+        self.is_large_seq_scan = self.node_type == 'Seq Scan' and (self.actual_rows * self.loops + self.rows_removed) >= LARGE_TABLE_ROWS
+
+    @property
+    def estimate_factor(self):
+        """
+        Error factor between estimated and actual number of rows (1 = exact estimate)
+        """
+        return max(self.plan_rows, self.actual_rows, 1) / max(min(self.plan_rows, self.actual_rows), 1)
+
+    @property
+    def is_underestimated(self):
+        return self.actual_rows > self.plan_rows
+
+    @property
+    def is_bad_estimate(self):
+        return self.loops > 0 and self.estimate_factor >= ESTIMATE_ERROR_FACTOR
+
+    def nodes(self):
+        """
+        Iterate over this node and all its descendants (depth-first)
+        """
+        yield self
+        for child in self.children:
+            yield from child.nodes()
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return f"Plan node : {self.node_type} {self.relation or ''} ({self.self_time:.3f} ms, {len(self.children)} children)"
+
+
+def parse_plan(explain_output):
+    """
+    Build the tree of an execution plan from the output of EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON), and mark the hotspots
+    (nodes whose own time is at least HOTSPOT_RATIO of the execution time, and always the most expensive node)
+    explain_output: decoded JSON output of EXPLAIN, i.e. a list with one dict containing 'Plan', 'Planning Time' and 'Execution Time'
+
+    Returns: a tuple (root plan_node, planning time in ms, execution time in ms)
+    """
+    explain = explain_output[0]
+    root = plan_node(explain['Plan'])
+    execution_time = explain.get('Execution Time', root.total_time)
+    nodes = list(root.nodes())
+    for node in nodes:
+        node.time_ratio = node.self_time / execution_time if execution_time else 0.0
+        node.is_hotspot = node.time_ratio >= HOTSPOT_RATIO
+    most_expensive = max(nodes, key=lambda node: node.self_time)
+    if most_expensive.self_time > 0:
+        most_expensive.is_hotspot = True
+    return root, explain.get('Planning Time', 0.0), execution_time
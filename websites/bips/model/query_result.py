@@ -2,8 +2,12 @@
 class query_result():
     """
         Class query_result for storing the result of an SQL query.
+        Slotted (no per-instance __dict__): results are kept in the session and in the query cache.
     """
 
+    __slots__ = ('query', 'is_select_query', 'params', 'full_query', 'statusmessage', 'error_code', 'error_type', 'error_message', 'error_detail',
+                 'result_instances', 'result_attributes', 'result_affected_rows', 'result_stream', 'duration', 'result_plan')
+
     def __init__(self, query, params):
         self.query = query  # initial query (possibbly with placeholders)
         self.is_select_query = True  # select/set query or insert/update/delete query
@@ -17,6 +21,9 @@ class query_result():
         self.result_instances = None  # list of result instances for select/show queries
         self.result_attributes = None  # list of attributes names for select/show queries
         self.result_affected_rows = None  # number of affected rows (insert/delete/update/... queries)
+        self.result_stream = None  # iterator of data blocks for exported queries (COPY ... TO STDOUT)
+        self.duration = None  # execution time in seconds (statements of scripts)
+        self.result_plan = None  # (plan_node tree, planning time, execution time) for analyzed queries (EXPLAIN ANALYZE)
 
     def __repr__(self):
         return self.__str__
@@ -0,0 +1,96 @@
+import re
+
+# opening (and closing) tag of a dollar-quoted string: $$ or $tag$
+DOLLAR_TAG = re.compile(r"\$([A-Za-z_\x80-\uffff][\w\x80-\uffff]*)?\$")
+
+
+def split_statements(script):
+    """
+    Split a SQL script into statements, on the semicolons outside of string literals ('...', E'...'), quoted identifiers ("..."),
+    dollar-quoted strings ($$...$$, $tag$...$tag$) and comments (-- ..., nested /* ... */).
+    Statements containing only comments or whitespaces are ignored.
+
+    Returns: a list of statements (strings, without final semicolon)
+    """
+    statements = []
+    start = 0  # start of the current statement
+    has_code = False  # the current statement contains something else than comments and whitespaces
+    i, n = 0, len(script)
+    while i < n:
+        c = script[i]
+        if c == '-' and script.startswith('--', i):  # comment until end of line
+            end = script.find('\n', i)
+            i = n if end == -1 else end + 1
+            continue
+        if c == '/' and script.startswith('/*', i):  # block comment (possibly nested)
+            i = _end_of_block_comment(script, i)
+            continue
+        if c == ';':
+            if has_code:
+                statements.append(script[start:i].strip())
+            start, has_code = i + 1, False
+            i += 1
+            continue
+        if not c.isspace() and not has_code:  # first character of the statement (leading comments are not kept)
+            start, has_code = i, True
+        if c == "'":
+            escapes = i > 0 and script[i - 1] in 'eE' and (i == 1 or not (script[i - 2].isalnum() or script[i - 2] == '_'))
+            i = _end_of_quoted(script, i, "'", escapes)
+        elif c == '"':
+            i = _end_of_quoted(script, i, '"', False)
+        elif c == '$' and (i == 0 or not (script[i - 1].isalnum() or script[i - 1] == '_')):  # not a parameter inside an identifier
+            match = DOLLAR_TAG.match(script, i)
+            if match:
+                end = script.find(match.group(0), match.end())
+                i = n if end == -1 else end + len(match.group(0))
+            else:
+                i += 1
+        else:
+            i += 1
+    if has_code:  # last statement without final semicolon
+        statements.append(script[start:].strip())
+    return statements
+
+
+def _end_of_quoted(script, i, quote, escapes):
+    """
+    Find the end of a quoted element starting at index i (a doubled quote is part of the element, as well as a quote escaped by a backslash in E'...' strings)
+
+    Returns: index after the closing quote (or end of the script)
+    """
+    i += 1
+    n = len(script)
+    while i < n:
+        c = script[i]
+        if escapes and c == '\\':
+            i += 2
+        elif c == quote:
+            if i + 1 < n and script[i + 1] == quote:
+                i += 2
+            else:
+                return i + 1
+        else:
+            i += 1
+    return n
+
+
+def _end_of_block_comment(script, i):
+    """
+    Find the end of a block comment starting at index i (PostgreSQL allows nested block comments)
+
+    Returns: index after the end of the comment (or end of the script)
+    """
+    depth = 0
+    n = len(script)
+    while i < n:
+        if script.startswith('/*', i):
+            depth += 1
+            i += 2
+        elif script.startswith('*/', i):
+            depth -= 1
+            i += 2
+            if depth == 0:
+                return i
+        else:
+            i += 1
+    return n
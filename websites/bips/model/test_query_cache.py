@@ -0,0 +1,37 @@
+from types import SimpleNamespace
+
+from query_cache import query_cache, normalize_query, referenced_tables, referenced_relations, referenced_functions, is_cacheable
+
+
+def test_normalize_query():
+    assert normalize_query("SELECT  *\n FROM Ecoles -- comment\n WHERE nom = 'Le Lycée';") == "select * from ecoles where nom = 'Le Lycée'"
+
+
+def test_referenced_tables_excludes_set_returning_functions():
+    query = "SELECT n, e.nom FROM generate_series(1, 3) AS n, public.Ecoles e JOIN \"Villes\" v ON v.id = e.ville"
+    assert referenced_tables(query) == {"ecoles", "Villes"}
+
+
+def test_referenced_functions():
+    assert referenced_functions("SELECT count(*) FROM generate_series(1, 3) AS n") == {"count", "generate_series"}
+
+
+def test_volatile_queries_are_not_cacheable():
+    assert is_cacheable("SELECT * FROM ecoles")
+    assert not is_cacheable("SELECT now()")
+    assert not is_cacheable("SELECT * FROM ecoles FOR UPDATE")
+
+
+def test_referenced_relations_keep_schema():
+    query = 'SELECT * FROM Public . Ecoles e JOIN "Autre"."Villes" v ON v.id = e.ville'
+    assert referenced_relations(query) == {"public.ecoles", '"Autre"."Villes"'}
+
+
+def test_invalidation_is_keyed_on_schema_qualified_tables():
+    cache = query_cache()
+    result = SimpleNamespace(result_instances=[(1,)])
+    cache.put("SELECT * FROM ecoles", ["public"], result, tables={"public.ecoles"})
+    cache.put("SELECT * FROM ecoles", ["autre"], result, tables={"autre.ecoles"})
+    cache.invalidate_tables({"autre.ecoles"})
+    assert cache.get("SELECT * FROM ecoles", ["public"]) is result
+    assert cache.get("SELECT * FROM ecoles", ["autre"]) is None
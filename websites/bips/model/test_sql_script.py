@@ -0,0 +1,19 @@
+from sql_script import split_statements
+
+
+def test_semicolons_in_dollar_quoted_body():
+    script = "CREATE FUNCTION f() RETURNS INT LANGUAGE sql AS $f$ SELECT 1; SELECT 2; $f$; SELECT f();"
+    assert split_statements(script) == ["CREATE FUNCTION f() RETURNS INT LANGUAGE sql AS $f$ SELECT 1; SELECT 2; $f$", "SELECT f()"]
+
+
+def test_semicolon_after_escaped_quote():
+    assert split_statements(r"SELECT E'it\'s; fine'; SELECT 'a'';b'") == [r"SELECT E'it\'s; fine'", "SELECT 'a'';b'"]
+
+
+def test_nested_block_comments():
+    script = "/* outer /* inner; */ still; a comment */ SELECT 1; /* only a comment; */"
+    assert split_statements(script) == ["SELECT 1"]
+
+
+def test_line_comments_and_last_statement_without_semicolon():
+    assert split_statements("-- drop; everything\nSELECT 1;\n\nSELECT 2 -- end;") == ["SELECT 1", "SELECT 2 -- end;"]
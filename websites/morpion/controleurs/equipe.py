@@ -4,11 +4,13 @@ Contrôleur pour créer une nouvelle équipe avec sélection de morpions.
 
 from model.model_pg import (
     get_all_morpions,
+    get_morpion_matchups,
     check_team_name_color_exists,
     check_team_color_exists,
     create_team,
     add_morpions_to_team
 )
+from model.matchups import refresh_matchups
 
 REQUEST_VARS.setdefault('message', None)
 REQUEST_VARS.setdefault('message_class', None)
@@ -20,6 +22,10 @@ REQUEST_VARS.setdefault('form_selected_morpions', [])
 morpions = get_all_morpions(SESSION["CONNEXION"])
 REQUEST_VARS["morpions"] = morpions
 
+# Probabilités de victoire en duel entre morpions (simulées en tâche de fond, voir model/matchups.py) :
+# force de chaque morpion et matrice des duels, pour guider la composition de l'équipe
+REQUEST_VARS["matchups"] = get_morpion_matchups(SESSION["CONNEXION"])
+
 # Traitement du formulaire POST
 # On se base sur la présence du champ team_name (toujours envoyé lors de la soumission)
 if 'team_name' in POST:
@@ -74,6 +80,8 @@ if 'team_name' in POST:
                 REQUEST_VARS['form_team_color'] = ''
                 REQUEST_VARS['form_selected_morpions'] = []
                 REQUEST_VARS["morpions"] = get_all_morpions(SESSION["CONNEXION"])
+                # Probabilités de victoire de la nouvelle équipe contre les autres (seules ses paires sont simulées)
+                SESSION['JOBS'].submit(f"Probabilités de victoire de l'équipe {team_name}", refresh_matchups, **SESSION['MATCHUPS'])
             else:
                 REQUEST_VARS['message'] = "Erreur : l'équipe a été créée mais les morpions n'ont pas pu être ajoutés."
                 REQUEST_VARS['message_class'] = "alert-error"
@@ -2,22 +2,89 @@
 Contrôleur pour lister les équipes et permettre leur suppression.
 """
 
-from model.model_pg import get_all_teams_with_morpions, delete_team, get_games_for_team
+from urllib.parse import urlencode
+from model.model_pg import get_teams_page, get_team, get_morpions_for_teams, get_team_strengths, delete_team, get_games_for_team, preview_team_deletion, delete_team_in_chunks, decode_team_cursor, TEAM_SORTS
 
 REQUEST_VARS.setdefault('message', None)
 REQUEST_VARS.setdefault('message_class', None)
 REQUEST_VARS.setdefault('team_to_delete', None)
 REQUEST_VARS.setdefault('games_to_delete', None)
+REQUEST_VARS.setdefault('job', None)
+REQUEST_VARS.setdefault('deletion_preview', None)
 
-# Récupérer toutes les équipes avec leurs morpions
-teams = get_all_teams_with_morpions(SESSION["CONNEXION"])
-REQUEST_VARS["teams"] = teams
 
-# Pour chaque équipe, récupérer les parties associées (pour affichage)
-for team in teams:
-    games = get_games_for_team(SESSION["CONNEXION"], team['id_team'])
-    team['games'] = games
-    team['games_count'] = len(games)
+def delete_team_and_games(job, team_id):
+    """
+    Tâche de fond : supprime les journaux, les parties puis l'équipe par lots
+    (voir delete_team_in_chunks) avec la connexion du thread de la tâche,
+    sans bloquer la réponse HTTP ni verrouiller longtemps les tables.
+    En cas d'échec, les lots déjà validés restent supprimés : relancer la
+    suppression de l'équipe reprend là où elle s'est arrêtée.
+    """
+    deleted = delete_team_in_chunks(job.connexion, team_id, progress=job.progress)
+    if deleted is None:
+        raise RuntimeError("suppression interrompue, relancez-la pour la reprendre")
+    return deleted
+
+
+# Nombre maximal de parties listées dans la confirmation de suppression
+GAMES_TO_DELETE_SHOWN = 20
+
+
+def load_teams_page():
+    """
+    Charge la page d'équipes demandée par les paramètres GET (tri, filtres, curseur de pagination)
+    avec les morpions et la force estimée des équipes affichées (une requête chacun pour toute la page)
+    et les parties de l'équipe dépliée (paramètre expand) seulement.
+    """
+    listing = REQUEST_VARS['listing']
+    after = decode_team_cursor(listing['after'], listing['sort']) if listing['after'] else None
+    teams, next_cursor = get_teams_page(SESSION["CONNEXION"], listing['sort'], listing['color'] or None, listing['has_played'], after)
+    if teams is None:
+        REQUEST_VARS['message'] = "Erreur : impossible de charger la liste des équipes (migration others/team_stats.sql appliquée ?)."
+        REQUEST_VARS['message_class'] = "alert-error"
+        REQUEST_VARS["teams"] = None
+        REQUEST_VARS["next_page"] = None
+        return
+    team_ids = tuple(team['id_team'] for team in teams)
+    morpions = get_morpions_for_teams(SESSION["CONNEXION"], team_ids)
+    strengths = get_team_strengths(SESSION["CONNEXION"], team_ids)
+    for team in teams:
+        team['morpions'] = morpions.get(team['id_team'], [])
+        team['strength'] = strengths.get(team['id_team'])  # None : équipe pas (encore) dans la matrice des probabilités
+        team['games'] = get_games_for_team(SESSION["CONNEXION"], team['id_team']) if team['id_team'] == listing['expand'] else None
+    REQUEST_VARS["teams"] = teams
+    REQUEST_VARS["next_page"] = page_url(after=next_cursor, expand=None) if next_cursor else None
+
+
+def page_url(**changes):
+    """
+    Retourne l'URL de la liste avec les paramètres courants (tri, filtres, page) modifiés par changes
+    (une valeur None retire le paramètre).
+    """
+    listing = REQUEST_VARS['listing']
+    params = {'sort': listing['sort'], 'color': listing['color'], 'played': listing['played'], 'after': listing['after'], 'expand': listing['expand']}
+    params.update(changes)
+    return 'liste-equipes?' + urlencode({name: value for name, value in params.items() if value not in (None, '')})
+
+
+# Paramètres de la liste : tri, filtres (couleur, a joué ou non), page (curseur after) et équipe dépliée
+sort = GET.get('sort', ['created'])[0]
+played = GET.get('played', [''])[0]
+try:
+    expand = int(GET.get('expand', [''])[0])
+except ValueError:
+    expand = None
+REQUEST_VARS['listing'] = {
+    'sort': sort if sort in TEAM_SORTS else 'created',
+    'color': GET.get('color', [''])[0].strip(),
+    'played': played if played in ('yes', 'no') else '',
+    'has_played': {'yes': True, 'no': False}.get(played),
+    'after': GET.get('after', [''])[0] or None,
+    'expand': expand,
+}
+REQUEST_VARS['page_url'] = page_url
+load_teams_page()
 
 # Traitement de la suppression
 # On déclenche la logique de suppression dès qu'un team_id est envoyé en POST
@@ -33,12 +100,8 @@ if 'team_id' in POST:
         try:
             team_id = int(team_id_str)
             
-            # Trouver l'équipe et ses parties
-            team_to_delete = None
-            for team in teams:
-                if team['id_team'] == team_id:
-                    team_to_delete = team
-                    break
+            # Trouver l'équipe (elle n'est pas forcément sur la page affichée)
+            team_to_delete = get_team(SESSION["CONNEXION"], team_id)
             
             if not team_to_delete:
                 REQUEST_VARS['message'] = "Erreur : équipe introuvable."
@@ -46,10 +109,10 @@ if 'team_id' in POST:
                 REQUEST_VARS['team_to_delete'] = None
                 REQUEST_VARS['games_to_delete'] = None
             else:
-                # Vérifier si l'équipe est utilisée dans des parties
-                games = get_games_for_team(SESSION["CONNEXION"], team_id)
+                # Vérifier si l'équipe est utilisée dans des parties (comptage seulement)
+                preview = preview_team_deletion(SESSION["CONNEXION"], team_id) or {'games': len(get_games_for_team(SESSION["CONNEXION"], team_id)), 'logs': 0}
                 
-                if len(games) > 0:
+                if preview['games'] > 0:
                     # L'équipe est utilisée dans des parties
                     # Vérifier si l'utilisateur a confirmé la suppression des parties
                     if 'confirm_delete_games' in POST:
@@ -57,22 +120,17 @@ if 'team_id' in POST:
                         delete_games = POST.get('confirm_delete_games', [''])[0].strip().lower() == 'yes'
                         
                         if delete_games:
-                            success = delete_team(SESSION["CONNEXION"], team_id, delete_games=True)
+                            # Suppression en cascade (parties, journaux) potentiellement longue : tâche de fond
+                            job = SESSION['JOBS'].submit(f"Suppression de l'équipe {team_to_delete['name']}", delete_team_and_games, team_id)
                             
-                            if success:
-                                REQUEST_VARS['message'] = f"L'équipe '{team_to_delete['name']}' et ses {len(games)} partie(s) associée(s) ont été supprimées avec succès !"
-                                REQUEST_VARS['message_class'] = "alert-success"
-                                # Recharger la liste des équipes
-                                teams = get_all_teams_with_morpions(SESSION["CONNEXION"])
-                                for team in teams:
-                                    games = get_games_for_team(SESSION["CONNEXION"], team['id_team'])
-                                    team['games'] = games
-                                    team['games_count'] = len(games)
-                                REQUEST_VARS["teams"] = teams
+                            if job is not None:
+                                REQUEST_VARS['message'] = f"Suppression de l'équipe '{team_to_delete['name']}' et de ses {preview['games']} partie(s) associée(s) ({preview['logs']} ligne(s) de journal) en cours..."
+                                REQUEST_VARS['message_class'] = "alert-info"
+                                REQUEST_VARS['job'] = job.id
                                 REQUEST_VARS['team_to_delete'] = None
                                 REQUEST_VARS['games_to_delete'] = None
                             else:
-                                REQUEST_VARS['message'] = "Erreur : impossible de supprimer l'équipe et ses parties."
+                                REQUEST_VARS['message'] = "Erreur : trop de tâches en cours, réessayez dans quelques instants."
                                 REQUEST_VARS['message_class'] = "alert-error"
                                 REQUEST_VARS['team_to_delete'] = None
                                 REQUEST_VARS['games_to_delete'] = None
@@ -85,8 +143,9 @@ if 'team_id' in POST:
                     else:
                         # Afficher les parties et demander confirmation
                         REQUEST_VARS['team_to_delete'] = team_to_delete
-                        REQUEST_VARS['games_to_delete'] = games
-                        REQUEST_VARS['message'] = f"L'équipe '{team_to_delete['name']}' est utilisée dans {len(games)} partie(s). Souhaitez-vous supprimer ces parties également ?"
+                        REQUEST_VARS['games_to_delete'] = get_games_for_team(SESSION["CONNEXION"], team_id, GAMES_TO_DELETE_SHOWN)
+                        REQUEST_VARS['deletion_preview'] = preview
+                        REQUEST_VARS['message'] = f"L'équipe '{team_to_delete['name']}' est utilisée dans {preview['games']} partie(s). Souhaitez-vous supprimer ces parties également ?"
                         REQUEST_VARS['message_class'] = "alert-warning"
                 else:
                     # L'équipe n'est pas utilisée dans des parties, suppression directe
@@ -95,13 +154,8 @@ if 'team_id' in POST:
                     if success:
                         REQUEST_VARS['message'] = f"L'équipe '{team_to_delete['name']}' a été supprimée avec succès !"
                         REQUEST_VARS['message_class'] = "alert-success"
-                        # Recharger la liste des équipes
-                        teams = get_all_teams_with_morpions(SESSION["CONNEXION"])
-                        for team in teams:
-                            games = get_games_for_team(SESSION["CONNEXION"], team['id_team'])
-                            team['games'] = games
-                            team['games_count'] = len(games)
-                        REQUEST_VARS["teams"] = teams
+                        # Recharger la page d'équipes
+                        load_teams_page()
                         REQUEST_VARS['team_to_delete'] = None
                         REQUEST_VARS['games_to_delete'] = None
                     else:
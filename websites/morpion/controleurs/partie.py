@@ -0,0 +1,62 @@
+"""
+Contrôleur de la page de relecture d'une partie (URL partie/<id>?coup=N).
+Rejoue l'enregistrement binaire de la partie jusqu'au coup demandé (voir model/game_record.py).
+"""
+
+from model.model_pg import get_game_replay
+from model.game_record import GameReplay, piece_number
+from model.game_engine import DESTROYED, IN_HAND
+
+REQUEST_VARS.setdefault('message', None)
+REQUEST_VARS.setdefault('message_class', None)
+REQUEST_VARS['replay'] = None
+
+game_id = REQUEST_VARS['route_params']['id']
+game = get_game_replay(SESSION["CONNEXION"], game_id)
+REQUEST_VARS['game'] = game
+
+if game is None:
+    REQUEST_VARS['message'] = f"Erreur : la partie {game_id} n'existe pas."
+    REQUEST_VARS['message_class'] = "alert-error"
+elif game['moves'] is None:
+    REQUEST_VARS['message'] = "Cette partie n'a pas d'enregistrement des coups : elle ne peut pas être rejouée."
+    REQUEST_VARS['message_class'] = "alert-error"
+else:
+    try:
+        replay = GameReplay(game['moves'])
+    except ValueError as e:
+        replay = None
+        REQUEST_VARS['message'] = f"Erreur : {e}"
+        REQUEST_VARS['message_class'] = "alert-error"
+    if replay is not None:
+        # Coup demandé (nombre de coups joués), ramené dans les limites de la partie
+        try:
+            played = int(GET.get('coup', [len(replay)])[0])
+        except ValueError:
+            played = len(replay)
+        played = max(0, min(len(replay), played))
+        state = replay.state_at(played)
+
+        colors = (game['team1_color'], game['team2_color'])
+        board = []
+        for row in range(state.grid_size):
+            cells = []
+            for cell in range(row * state.grid_size, (row + 1) * state.grid_size):
+                piece = state.cells[cell]
+                if piece >= 0:
+                    cells.append({'piece': piece_number(state, piece), 'color': colors[state.owner[piece]],
+                                  'hp': state.hp[piece], 'max_hp': state.max_hp[piece], 'mana': state.mana[piece]})
+                else:
+                    cells.append({'piece': None, 'destroyed': piece == DESTROYED})
+            board.append(cells)
+
+        REQUEST_VARS['replay'] = {
+            'played': played,
+            'nb_moves': len(replay),
+            'board': board,
+            'in_hand': [[piece_number(state, piece) for piece in state.pieces(team) if state.position[piece] == IN_HAND] for team in (0, 1)],
+            'alive': [state.alive(team) for team in (0, 1)],
+            'history': replay.history(),
+            'finished': state.finished,
+            'winner': state.winner,
+        }
@@ -0,0 +1,26 @@
+"""
+Contrôleur de la page de suivi en direct d'une partie (URL partie/<id>/direct).
+La page affiche les dernières lignes du journal, puis reçoit les suivantes par le flux
+d'événements partie/<id>/flux (voir partie_flux.py).
+"""
+
+from model.model_pg import get_game_state, get_game_logs
+
+REQUEST_VARS.setdefault('message', None)
+REQUEST_VARS.setdefault('message_class', None)
+
+game_id = REQUEST_VARS['route_params']['id']
+game = get_game_state(SESSION["CONNEXION"], game_id)
+REQUEST_VARS['game'] = game
+REQUEST_VARS['logs'] = []
+
+if game is None:
+    REQUEST_VARS['message'] = f"Erreur : la partie {game_id} n'existe pas."
+    REQUEST_VARS['message_class'] = "alert-error"
+else:
+    logs = get_game_logs(SESSION["CONNEXION"], game_id)
+    if logs is None:
+        REQUEST_VARS['message'] = "Erreur : lecture du journal de la partie impossible."
+        REQUEST_VARS['message_class'] = "alert-error"
+    else:
+        REQUEST_VARS['logs'] = logs
@@ -0,0 +1,31 @@
+"""
+Contrôleur du flux d'événements (Server-Sent Events) d'une partie (URL partie/<id>/flux?after=N).
+Envoie les lignes de journal de numéro supérieur à N (ou au dernier identifiant reçu, en-tête Last-Event-ID
+d'un navigateur qui se reconnecte) et l'état de la partie, puis confie la connexion au serveur, qui relaie
+les notifications du canal morpion_live de la partie (voir others/morpions.sql). Le serveur écoute le canal avant
+d'exécuter ce contrôleur : les notifications arrivées pendant la lecture du journal sont envoyées ensuite, sans doublon.
+"""
+
+from model.model_pg import get_game_state, get_game_logs
+
+REQUEST_VARS.setdefault('message', None)
+REQUEST_VARS.setdefault('message_class', None)
+
+game_id = REQUEST_VARS['route_params']['id']
+game = get_game_state(SESSION["CONNEXION"], game_id)
+
+# Dernière ligne de journal déjà reçue par le navigateur
+try:
+    after = int(REQUEST_VARS['last_event_id'] or GET.get('after', ['0'])[0])
+except ValueError:
+    after = 0
+logs = get_game_logs(SESSION["CONNEXION"], game_id, after) if game is not None else None
+
+if game is None or logs is None:  # réponse HTML : le navigateur ne se reconnecte pas
+    REQUEST_VARS['message'] = f"Erreur : la partie {game_id} n'existe pas." if game is None else "Erreur : lecture du journal de la partie impossible."
+    REQUEST_VARS['message_class'] = "alert-error"
+else:
+    initial = [{'event': 'log', 'id': log['num'], 'data': log} for log in logs]
+    initial.append({'event': 'state', 'data': {'ended_at': game['ended_at'], 'winner_team_id': game['winner_team_id'],
+                                               'winner_name': game['winner_name']}})
+    REQUEST_VARS['events'] = {'topic': str(game_id), 'initial': initial}
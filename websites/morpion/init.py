@@ -4,9 +4,25 @@ Ficher initialisation (eg, constantes chargées au démarrage dans la session)
 
 from datetime import datetime
 from os import path
+from model.model_pg import maintain_logs_partitions
+from model.matchups import refresh_matchups, MATCHUP_TRIALS, MATCHUP_MAX_TEAMS, MATCHUP_WORKERS
 
 SESSION['APP'] = "Morpion Masters"
 SESSION['BASELINE'] = "Composez, combattez, triomphez."
 SESSION['DIR_HISTORIQUE'] = path.join(SESSION['DIRECTORY'], "historiques")
 SESSION['HISTORIQUE'] = dict()
 SESSION['CURRENT_YEAR'] = datetime.now().year
+SESSION['LOGS_RETENTION_MONTHS'] = None  # durée de conservation (en mois) du journal des parties, None : illimitée (les partitions plus anciennes sont supprimées au démarrage)
+# Paramètres des probabilités de victoire simulées (voir model/matchups.py) ; les modifier recalcule toutes les paires
+SESSION['MATCHUPS'] = {'grid_size': 3, 'max_turns': 20, 'trials': MATCHUP_TRIALS, 'max_teams': MATCHUP_MAX_TEAMS, 'workers': MATCHUP_WORKERS}
+SESSION['MATCHUPS_AT_STARTUP'] = True  # calcul des paires nouvelles ou modifiées au démarrage (False : seulement après la création d'une équipe)
+
+# Entretien du journal partitionné (partitions à venir, rétention) en tâche de fond, avec la connexion de la tâche
+# (la fonction est passée en argument par défaut : ce fichier est exécuté par exec, ses imports ne sont pas globaux).
+# Tâches de démarrage lancées par un seul processus (le premier en mode pre-fork)
+if SESSION.get('CONNEXION') is not None and SESSION.get('WORKER_SLOT', 0) == 0:
+    SESSION['JOBS'].submit("Entretien des partitions du journal",
+                           lambda job, maintain=maintain_logs_partitions: maintain(job.connexion, SESSION['LOGS_RETENTION_MONTHS']))
+    # Probabilités de victoire des paires nouvelles ou modifiées depuis le dernier démarrage
+    if SESSION['MATCHUPS_AT_STARTUP']:
+        SESSION['JOBS'].submit("Calcul des probabilités de victoire", refresh_matchups, **SESSION['MATCHUPS'])
@@ -0,0 +1,325 @@
+"""
+Joueur artificiel pour le moteur de jeu (model/game_engine.py) : recherche alpha-bêta en approfondissement
+itératif avec table de transposition, pour jouer sur les grilles 3x3 et 4x4 avec un temps de réflexion borné.
+
+- Les attaques et les sorts réussissent avec une probabilité : la valeur d'un tel coup est l'espérance
+  p * valeur(réussite) + (1 - p) * valeur(échec) (nœud de hasard, « expectiminimax »). L'élagage alpha-bêta
+  s'applique aux nœuds de choix ; les deux issues d'un nœud de hasard sont évaluées avec une fenêtre complète.
+- Approfondissement itératif : profondeur 1, 2, 3... jusqu'à épuisement du temps alloué au coup (time_budget) ;
+  le coup retenu est celui de la dernière profondeur terminée. Sans limite de temps, la recherche s'arrête à max_depth
+  (résultat indépendant de la vitesse de la machine : à utiliser pour les tournois, qui doivent être reproductibles).
+- Table de transposition : une position est identifiée par un hachage de Zobrist (XOR de clés aléatoires
+  de 64 bits, une par (caractéristique, morpion, valeur)), mis à jour à chaque coup à partir des modifications
+  retournées par GameState.play. Une entrée garde la profondeur, la valeur (exacte ou borne) et le meilleur coup.
+- Ordre des coups : meilleur coup de la table de transposition, puis coups gagnants, blocages, éliminations,
+  attaques par dégâts espérés, poses au centre... pour que l'élagage coupe le plus tôt possible.
+  Les morpions identiques en main ne sont posés qu'une fois par case, et armageddon ne vise que des morpions adverses.
+"""
+
+import random
+from time import perf_counter
+
+from model import game_engine
+from model.game_engine import (PLACE, ATTACK, FIREBALL, HEAL, ARMAGEDDON, FIREBALL_DAMAGE, ELIMINATED, DESTROYED,
+                               success_probability)
+
+WIN_SCORE = 100000
+INFINITY = float("inf")
+EXACT, LOWER, UPPER = 0, 1, 2  # nature de la valeur d'une entrée de la table de transposition
+TT_MAX_ENTRIES = 500000  # au-delà, la table est vidée
+TIME_CHECK_NODES = 256  # le temps est vérifié tous les TIME_CHECK_NODES nœuds
+
+
+class SearchTimeout(Exception):
+    """
+    Temps de réflexion épuisé pendant une recherche.
+    """
+
+
+class ZobristKeys:
+    """
+    Clés de Zobrist (entiers aléatoires de 64 bits), créées à la demande et reproductibles (graine fixe).
+    """
+
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+        self.keys = {}
+
+    def __call__(self, kind, index, value):
+        key = self.keys.get((kind, index, value))
+        if key is None:
+            key = self.keys[(kind, index, value)] = self.rng.getrandbits(64)
+        return key
+
+
+class SearchPlayer:
+    """
+    Joueur alpha-bêta. S'utilise comme les joueurs de game_engine.PLAYERS : player(state, rng) retourne un coup.
+
+    time_budget : temps de réflexion maximal par coup en secondes (None : pas de limite, voir max_depth)
+    max_depth : profondeur maximale de la recherche, en coups (None : pas de limite, voir time_budget)
+    keep_table : garder la table de transposition d'un coup à l'autre (plus rapide, mais le coup choisi dépend
+                 alors des recherches précédentes : False pour des parties reproductibles)
+    """
+
+    def __init__(self, time_budget=0.5, max_depth=None, keep_table=True):
+        if time_budget is None and max_depth is None:
+            raise ValueError("time_budget ou max_depth est nécessaire pour borner la recherche")
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.keep_table = keep_table
+        self.keys = ZobristKeys()
+        self.table = {}
+        self.state = None
+        self.hash = 0
+        self.deadline = None
+        self.nodes = 0
+        self.hit = self.base_value = None
+        self.stats = {}  # statistiques de la dernière recherche (profondeur, nœuds, durée, ...)
+
+    def __call__(self, state, rng=None):
+        return self.choose(state)
+
+    # -----------------------------------------------------------------
+    # Recherche
+    # -----------------------------------------------------------------
+
+    def choose(self, state):
+        """
+        Retourne le meilleur coup trouvé pour l'équipe qui joue dans l'état state (qui n'est pas modifié).
+        """
+        moves = state.legal_moves()
+        if len(moves) == 1:
+            self.stats = {"depth": 0, "nodes": 0, "duration": 0.0, "value": None, "table": len(self.table)}
+            return moves[0]
+        self.state = state.copy()
+        self.hash = self.full_hash(self.state)
+        # valeurs fixes pendant la recherche, calculées une fois : probabilité de réussite et valeur de base de chaque morpion
+        self.hit = [success_probability(accuracy) for accuracy in state.accuracy]
+        self.base_value = [30 + 2 * attack * hit for attack, hit in zip(state.attack, self.hit)]
+        if not self.keep_table or len(self.table) > TT_MAX_ENTRIES:
+            self.table.clear()
+        started = perf_counter()
+        self.deadline = started + self.time_budget if self.time_budget is not None else None
+        self.nodes = 0
+        best_move, best_value, depth = self.ordered_moves(None)[0], None, 0
+        while self.max_depth is None or depth < self.max_depth:
+            try:
+                value, move = self.search_root(depth + 1, best_move)
+            except SearchTimeout:
+                break
+            depth += 1
+            best_move, best_value = move, value
+            if abs(value) >= WIN_SCORE - 1000:  # issue forcée trouvée : inutile de chercher plus loin
+                break
+        self.stats = {"depth": depth, "nodes": self.nodes, "duration": perf_counter() - started, "value": best_value, "table": len(self.table)}
+        self.state = None
+        return best_move
+
+    def search_root(self, depth, previous_best):
+        """
+        Recherche à la profondeur depth depuis la racine, en commençant par le meilleur coup de la profondeur précédente.
+        Retourne le couple (valeur, meilleur coup).
+        """
+        alpha, best_move = -INFINITY, None
+        for move in self.ordered_moves(previous_best):
+            value = self.move_value(move, depth, alpha, INFINITY)
+            if value > alpha:
+                alpha, best_move = value, move
+        self.table[self.hash] = (depth, alpha, EXACT, best_move)
+        return alpha, best_move
+
+    def move_value(self, move, depth, alpha, beta):
+        """
+        Valeur du coup move pour l'équipe qui joue (espérance sur la réussite du coup si elle est incertaine).
+        """
+        probability = self.state.move_probability(move)
+        if probability >= 1.0:
+            return -self.child(move, True, depth - 1, -beta, -alpha)
+        return (probability * -self.child(move, True, depth - 1, -INFINITY, INFINITY)
+                + (1.0 - probability) * -self.child(move, False, depth - 1, -INFINITY, INFINITY))
+
+    def child(self, move, success, depth, alpha, beta):
+        """
+        Joue le coup (avec l'issue success), évalue la position obtenue pour l'adversaire, puis annule le coup.
+        """
+        state = self.state
+        saved_hash = self.hash
+        undo = state.play(move, success)
+        self.update_hash(undo[0], state.actions)
+        try:
+            return self.negamax(depth, alpha, beta)
+        finally:
+            state.undo(undo)
+            self.hash = saved_hash
+
+    def negamax(self, depth, alpha, beta):
+        """
+        Valeur de la position courante pour l'équipe qui joue (alpha-bêta, forme negamax).
+        """
+        state = self.state
+        self.nodes += 1
+        if self.deadline is not None and self.nodes % TIME_CHECK_NODES == 0 and perf_counter() > self.deadline:
+            raise SearchTimeout()
+        if state.finished:
+            if state.winner is None:
+                return 0
+            # gagner tôt vaut mieux que gagner tard (et perdre tard mieux que perdre tôt)
+            return WIN_SCORE - state.actions if state.winner == state.to_move else state.actions - WIN_SCORE
+        if depth <= 0:
+            return self.evaluate()
+
+        entry = self.table.get(self.hash)
+        table_move = None
+        if entry is not None:
+            entry_depth, entry_value, flag, table_move = entry
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return entry_value
+                if flag == LOWER:
+                    alpha = max(alpha, entry_value)
+                else:
+                    beta = min(beta, entry_value)
+                if alpha >= beta:
+                    return entry_value
+
+        original_alpha = alpha
+        best_value, best_move = -INFINITY, None
+        for move in self.ordered_moves(table_move):
+            value = self.move_value(move, depth, alpha, beta)
+            if value > best_value:
+                best_value, best_move = value, move
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        break
+        flag = UPPER if best_value <= original_alpha else (LOWER if best_value >= beta else EXACT)
+        self.table[self.hash] = (depth, best_value, flag, best_move)
+        return best_value
+
+    # -----------------------------------------------------------------
+    # Hachage de Zobrist
+    # -----------------------------------------------------------------
+
+    def full_hash(self, state):
+        """
+        Calcule le hachage de l'état state (position, points de vie et mana des morpions, équipe qui joue, nombre d'actions).
+        """
+        keys = self.keys
+        value = keys("actions", 0, state.actions) ^ (keys("to_move", 0, 1) if state.to_move else 0)
+        for piece in range(len(state.owner)):
+            value ^= keys("hp", piece, state.hp[piece]) ^ keys("mana", piece, state.mana[piece]) ^ keys("position", piece, state.position[piece])
+        return value
+
+    def update_hash(self, changes, actions):
+        """
+        Met à jour le hachage après un coup, à partir des modifications (liste, indice, ancienne valeur) retournées
+        par GameState.play (chaque valeur n'est modifiée qu'une fois par coup ; cells est redondant avec position).
+        """
+        state, keys = self.state, self.keys
+        value = self.hash ^ keys("to_move", 0, 1) ^ keys("actions", 0, actions - 1) ^ keys("actions", 0, actions)
+        for values, index, old in changes:
+            if values is not state.cells:
+                kind = "hp" if values is state.hp else "mana" if values is state.mana else "position"
+                value ^= keys(kind, index, old) ^ keys(kind, index, values[index])
+        self.hash = value
+
+    # -----------------------------------------------------------------
+    # Ordre des coups et évaluation
+    # -----------------------------------------------------------------
+
+    def ordered_moves(self, first=None):
+        """
+        Retourne les coups à explorer, les plus prometteurs d'abord (first, s'il est fourni, en tête).
+        """
+        state = self.state
+        team = state.to_move
+        cells, owner, hp = state.cells, state.owner, state.hp
+        seen_in_hand = set()
+        place_scores = {}  # case -> intérêt d'une pose (le même pour tous les morpions posés sur la case)
+        scored = []
+        for move in state.legal_moves():
+            action, piece, cell = move
+            if action == PLACE:
+                stats = (state.max_hp[piece], state.attack[piece], state.mana[piece], state.accuracy[piece], cell)
+                if stats in seen_in_hand:  # morpion identique déjà posé sur cette case
+                    continue
+                seen_in_hand.add(stats)
+                score = place_scores.get(cell)
+                if score is None:
+                    score = place_scores[cell] = self.place_score(cell)
+            elif action in (ATTACK, FIREBALL):
+                damage = state.attack[piece] if action == ATTACK else FIREBALL_DAMAGE
+                target = cells[cell]
+                score = self.hit[piece] * (1000 * (damage >= hp[target]) + 50 * damage) - 10 * (action == FIREBALL)
+            elif action == ARMAGEDDON:
+                target = cells[cell]
+                if target < 0 or owner[target] == team:
+                    continue
+                score = self.hit[piece] * 1000 - 200
+            elif action == HEAL:
+                score = 20
+            else:  # PASS
+                score = -1
+            scored.append((score, move))
+        scored.sort(key=lambda item: -item[0])
+        moves = [move for _, move in scored] or state.legal_moves()
+        if first is not None and first in moves:
+            moves.remove(first)
+            moves.insert(0, first)
+        return moves
+
+    def place_score(self, cell):
+        """
+        Intérêt d'une pose sur la case cell pour l'équipe qui joue : compléter un alignement, en bloquer un,
+        ou participer à des lignes encore libres.
+        """
+        state = self.state
+        team, cells, owner = state.to_move, state.cells, state.owner
+        score = 0
+        for line in state.lines_by_cell[cell]:
+            contents = [cells[c] for c in line if c != cell]
+            if all(c >= 0 and owner[c] == team for c in contents):
+                return 10000  # alignement complété
+            if all(c >= 0 and owner[c] != team for c in contents):
+                score = max(score, 5000)  # alignement adverse bloqué
+            elif DESTROYED not in contents and not any(c >= 0 and owner[c] != team for c in contents):
+                score += 10 * (1 + sum(1 for c in contents if c >= 0))
+        return score
+
+    def evaluate(self):
+        """
+        Évaluation heuristique de la position pour l'équipe qui joue : valeur des morpions vivants
+        (points de vie, dégâts espérés, mana) et alignements encore possibles, de l'équipe moins ceux de l'adversaire.
+        """
+        state = self.state
+        team = state.to_move
+        cells, owner, hp, mana, base_value = state.cells, state.owner, state.hp, state.mana, self.base_value
+        score = 0.0
+        for piece, cell in enumerate(state.position):
+            if cell == ELIMINATED:
+                continue
+            value = base_value[piece] + 3 * hp[piece] + mana[piece] + (10 if cell >= 0 else 0)
+            score += value if owner[piece] == team else -value
+        for line in state.lines:
+            mine = theirs = 0
+            for c in line:
+                content = cells[c]
+                if content == DESTROYED:
+                    break
+                if content >= 0:
+                    if owner[content] == team:
+                        mine += 1
+                    else:
+                        theirs += 1
+            else:
+                if mine and not theirs:
+                    score += 4 ** mine
+                elif theirs and not mine:
+                    score -= 4 ** theirs
+        return score
+
+
+# Joueurs utilisables par nom (tournois, bancs d'essai) : ceux du moteur et le joueur alpha-bêta
+# à profondeur fixe (reproductible, quelle que soit la machine)
+PLAYERS = dict(game_engine.PLAYERS, alphabeta=SearchPlayer(time_budget=None, max_depth=2, keep_table=False))
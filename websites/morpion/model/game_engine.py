@@ -0,0 +1,297 @@
+"""
+Moteur de jeu des parties de morpion (sans base de données ni affichage).
+
+Règles appliquées (une partie oppose deux équipes, sur une configuration config) :
+  - la grille fait grid_size x grid_size cases (3 ou 4) ;
+  - au départ, les morpions de chaque équipe sont dans sa main ; chaque équipe joue une action
+    à son tour (l'équipe 1 commence), un tour de jeu est une action de chaque équipe ;
+  - actions possibles :
+      PLACE      : poser un morpion de sa main sur une case vide (non détruite) ;
+      ATTACK     : un morpion posé attaque un morpion adverse, qui perd attack points de vie ;
+      FIREBALL   : boule de feu (coût 2 mana) sur un morpion adverse, qui perd 3 points de vie ;
+      HEAL       : soin (coût 1 mana) d'un morpion allié, qui regagne 2 points de vie (sans dépasser ses hp de départ) ;
+      ARMAGEDDON : (coût 5 mana) détruit définitivement une case, et le morpion qui s'y trouve ;
+      PASS       : passer son tour, seulement si aucune autre action n'est possible ;
+    une attaque ou un sort réussit avec la probabilité accuracy / 10 (au plus 1) du morpion qui agit,
+    le mana est dépensé même en cas d'échec ; un morpion sans point de vie est éliminé (sa case est libérée) ;
+  - une équipe gagne dès qu'elle aligne grid_size morpions (ligne, colonne ou diagonale),
+    ou quand l'équipe adverse n'a plus aucun morpion (ni posé, ni en main) ;
+  - après config.max_turns tours, l'équipe ayant le plus de morpions vivants gagne
+    (puis le plus de points de vie au total), sinon la partie est nulle.
+
+Représentation : les morpions des deux équipes sont numérotés 0..n-1 (équipe 0 d'abord) et l'état
+est fait de listes d'entiers (rapides à copier, à comparer et à envoyer à un autre processus).
+Un coup est un tuple (action, morpion qui agit ou est posé, case visée) ; GameState.play applique un coup
+dont le résultat (réussite ou non) est connu et retourne de quoi l'annuler (GameState.undo), pour les
+recherches de l'IA ; step tire la réussite avec un générateur aléatoire, pour les simulations.
+"""
+
+PLACE, ATTACK, FIREBALL, HEAL, ARMAGEDDON, PASS = range(6)
+ACTION_NAMES = ("pose", "attaque", "boule de feu", "soin", "armageddon", "passe")
+PASS_MOVE = (PASS, 0, 0)
+
+FIREBALL_COST, FIREBALL_DAMAGE = 2, 3
+HEAL_COST, HEAL_POINTS = 1, 2
+ARMAGEDDON_COST = 5
+
+EMPTY, DESTROYED = -1, -2  # contenu d'une case : numéro du morpion posé, EMPTY ou DESTROYED
+IN_HAND, ELIMINATED = -1, -2  # position d'un morpion : numéro de case, IN_HAND ou ELIMINATED
+
+_LINES = {}  # grid_size -> (lignes gagnantes, lignes passant par chaque case)
+
+
+def winning_lines(grid_size):
+    """
+    Retourne les lignes gagnantes d'une grille (lignes, colonnes, 2 diagonales), calculées une seule fois par taille :
+    tuple (tuple des lignes, chaque ligne étant un tuple de cases ; tuple, pour chaque case, des lignes qui y passent).
+    """
+    if grid_size not in _LINES:
+        n = grid_size
+        lines = [tuple(r * n + c for c in range(n)) for r in range(n)]
+        lines += [tuple(r * n + c for r in range(n)) for c in range(n)]
+        lines += [tuple(i * n + i for i in range(n)), tuple(i * n + n - 1 - i for i in range(n))]
+        by_cell = tuple(tuple(line for line in lines if cell in line) for cell in range(n * n))
+        _LINES[grid_size] = (tuple(lines), by_cell)
+    return _LINES[grid_size]
+
+
+def success_probability(accuracy):
+    """
+    Probabilité de réussite d'une attaque ou d'un sort lancé par un morpion de précision accuracy.
+    """
+    return min(1.0, accuracy / 10)
+
+
+class GameState:
+    """
+    État d'une partie.
+
+    team1, team2 : tuples des morpions de chaque équipe, chacun étant un tuple (hp, attack, mana, accuracy)
+    grid_size : taille de la grille (3 ou 4)
+    max_turns : nombre maximal de tours (un tour = une action de chaque équipe)
+    """
+
+    __slots__ = ("grid_size", "max_turns", "owner", "attack", "accuracy", "max_hp", "hp", "mana", "position",
+                 "cells", "to_move", "actions", "winner", "finished", "lines", "lines_by_cell")
+
+    def __init__(self, team1, team2, grid_size=3, max_turns=20):
+        self.grid_size = grid_size
+        self.max_turns = max_turns
+        pieces = list(team1) + list(team2)
+        self.owner = [0] * len(team1) + [1] * len(team2)
+        self.max_hp = [p[0] for p in pieces]
+        self.attack = [p[1] for p in pieces]
+        self.accuracy = [p[3] for p in pieces]
+        self.hp = list(self.max_hp)
+        self.mana = [p[2] for p in pieces]
+        self.position = [IN_HAND] * len(pieces)
+        self.cells = [EMPTY] * (grid_size * grid_size)
+        self.to_move = 0  # équipe qui joue (0 : team1, 1 : team2)
+        self.actions = 0  # nombre d'actions jouées
+        self.winner = None  # 0, 1 ou None (partie nulle ou en cours)
+        self.finished = False
+        self.lines, self.lines_by_cell = winning_lines(grid_size)
+
+    def copy(self):
+        """
+        Retourne une copie indépendante de l'état (les caractéristiques fixes des morpions sont partagées).
+        """
+        state = GameState.__new__(GameState)
+        for name in ("grid_size", "max_turns", "owner", "attack", "accuracy", "max_hp", "to_move", "actions",
+                     "winner", "finished", "lines", "lines_by_cell"):
+            setattr(state, name, getattr(self, name))
+        state.hp, state.mana, state.position, state.cells = self.hp[:], self.mana[:], self.position[:], self.cells[:]
+        return state
+
+    @property
+    def turn(self):
+        """
+        Numéro du tour en cours (à partir de 1).
+        """
+        return self.actions // 2 + 1
+
+    def pieces(self, team):
+        """
+        Retourne les numéros des morpions de l'équipe team.
+        """
+        return [piece for piece, owner in enumerate(self.owner) if owner == team]
+
+    def legal_moves(self):
+        """
+        Retourne la liste des coups possibles pour l'équipe qui joue (vide si la partie est finie).
+        """
+        if self.finished:
+            return []
+        team = self.to_move
+        cells, position, owner, mana = self.cells, self.position, self.owner, self.mana
+        empty = [cell for cell, content in enumerate(cells) if content == EMPTY]
+        moves = []
+        mine, theirs = [], []
+        for piece, cell in enumerate(position):
+            if cell >= 0:
+                (mine if owner[piece] == team else theirs).append(piece)
+            elif cell == IN_HAND and owner[piece] == team:
+                moves.extend((PLACE, piece, target) for target in empty)
+        for piece in mine:
+            for enemy in theirs:
+                moves.append((ATTACK, piece, position[enemy]))
+                if mana[piece] >= FIREBALL_COST:
+                    moves.append((FIREBALL, piece, position[enemy]))
+            if mana[piece] >= HEAL_COST:
+                moves.extend((HEAL, piece, position[ally]) for ally in mine if self.hp[ally] < self.max_hp[ally])
+            if mana[piece] >= ARMAGEDDON_COST:
+                moves.extend((ARMAGEDDON, piece, cell) for cell, content in enumerate(cells) if content != DESTROYED)
+        return moves or [PASS_MOVE]
+
+    def move_probability(self, move):
+        """
+        Retourne la probabilité de réussite du coup move (1 pour une pose).
+        """
+        return 1.0 if move[0] in (PLACE, PASS) else success_probability(self.accuracy[move[1]])
+
+    def play(self, move, success=True):
+        """
+        Applique le coup move de l'équipe qui joue, avec le résultat success (ignoré pour une pose),
+        puis passe la main à l'autre équipe.
+        Retourne l'information nécessaire pour annuler le coup avec undo.
+        """
+        action, piece, cell = move
+        changes = []  # (liste, indice, ancienne valeur) dans l'ordre des modifications
+        hp, cells, position = self.hp, self.cells, self.position
+        if action == PLACE:
+            changes.append((cells, cell, cells[cell]))
+            changes.append((position, piece, position[piece]))
+            cells[cell], position[piece] = piece, cell
+        elif action != PASS:
+            cost = (0, 0, FIREBALL_COST, HEAL_COST, ARMAGEDDON_COST)[action]
+            if cost:
+                changes.append((self.mana, piece, self.mana[piece]))
+                self.mana[piece] -= cost
+            if success:
+                target = cells[cell]
+                if action == ARMAGEDDON:
+                    changes.append((cells, cell, target))
+                    cells[cell] = DESTROYED
+                    if target >= 0:
+                        changes.append((position, target, position[target]))
+                        position[target] = ELIMINATED
+                elif action == HEAL:
+                    changes.append((hp, target, hp[target]))
+                    hp[target] = min(self.max_hp[target], hp[target] + HEAL_POINTS)
+                else:
+                    changes.append((hp, target, hp[target]))
+                    hp[target] -= self.attack[piece] if action == ATTACK else FIREBALL_DAMAGE
+                    if hp[target] <= 0:
+                        changes.append((cells, cell, target))
+                        changes.append((position, target, position[target]))
+                        cells[cell], position[target] = EMPTY, ELIMINATED
+        undo = (changes, self.to_move, self.winner, self.finished)
+        self.actions += 1
+        self._update_result(action, cell)
+        self.to_move = 1 - self.to_move
+        return undo
+
+    def undo(self, undo):
+        """
+        Annule le dernier coup joué (undo : valeur retournée par play).
+        """
+        changes, self.to_move, self.winner, self.finished = undo
+        self.actions -= 1
+        for values, index, old in reversed(changes):
+            values[index] = old
+
+    def step(self, move, rng):
+        """
+        Joue le coup move en tirant sa réussite avec le générateur aléatoire rng (random.Random).
+        Retourne True si le coup a réussi.
+        """
+        success = move[0] in (PLACE, PASS) or rng.random() < success_probability(self.accuracy[move[1]])
+        self.play(move, success)
+        return success
+
+    def alive(self, team):
+        """
+        Retourne le nombre de morpions vivants (posés ou en main) de l'équipe team.
+        """
+        return sum(1 for piece, owner in enumerate(self.owner) if owner == team and self.position[piece] != ELIMINATED)
+
+    def _update_result(self, action, cell):
+        """
+        Détermine si la partie est finie après une action sur la case cell de l'équipe self.to_move.
+        """
+        team = self.to_move
+        if action == PLACE:  # seule une pose peut créer un alignement
+            cells, owner = self.cells, self.owner
+            for line in self.lines_by_cell[cell]:
+                if all(cells[c] >= 0 and owner[cells[c]] == team for c in line):
+                    self.winner, self.finished = team, True
+                    return
+        elif action != PASS:
+            alive = self.alive(team), self.alive(1 - team)
+            if not alive[1] or not alive[0]:  # armageddon sur son propre dernier morpion : l'adversaire gagne
+                self.winner, self.finished = (team if alive[0] else 1 - team), True
+                return
+        if self.actions >= 2 * self.max_turns:
+            self.finished = True
+            score = [(self.alive(t), sum(h for p, h in enumerate(self.hp) if self.owner[p] == t and self.position[p] != ELIMINATED)) for t in (0, 1)]
+            self.winner = None if score[0] == score[1] else (0 if score[0] > score[1] else 1)
+
+
+# ---------------------------------------------------------------------
+# Joueurs (stratégies) : fonction (état, générateur aléatoire) -> coup
+# ---------------------------------------------------------------------
+
+def random_player(state, rng):
+    """
+    Joue un coup possible au hasard.
+    """
+    return rng.choice(state.legal_moves())
+
+
+def greedy_player(state, rng):
+    """
+    Stratégie simple et rapide : gagner par alignement si possible, sinon bloquer un alignement adverse,
+    sinon l'action qui enlève le plus de points de vie en moyenne, sinon une pose au hasard.
+    """
+    moves = state.legal_moves()
+    team = state.to_move
+    cells, owner = state.cells, state.owner
+    places = [move for move in moves if move[0] == PLACE]
+    for wanted in (team, 1 - team):  # alignement à compléter (gagner), puis à bloquer
+        for move in places:
+            for line in state.lines_by_cell[move[2]]:
+                if all(c == move[2] or (cells[c] >= 0 and owner[cells[c]] == wanted) for c in line):
+                    return move
+    best, best_value = None, 0.0
+    for move in moves:
+        if move[0] in (ATTACK, FIREBALL):
+            damage = state.attack[move[1]] if move[0] == ATTACK else FIREBALL_DAMAGE
+            value = success_probability(state.accuracy[move[1]]) * (damage + 10 * (damage >= state.hp[cells[move[2]]]))
+            if value > best_value:
+                best, best_value = move, value
+    if best is not None and (not places or best_value >= 10 * 0.5):
+        return best
+    return rng.choice(places or moves)
+
+
+PLAYERS = {"random": random_player, "greedy": greedy_player}
+
+
+def play_game(team1, team2, grid_size, max_turns, rng, players=(greedy_player, greedy_player), record=None):
+    """
+    Joue une partie complète.
+
+    team1, team2 : tuples de morpions (hp, attack, mana, accuracy)
+    rng : générateur aléatoire (random.Random) : la partie est déterministe pour une graine donnée
+    players : stratégies des deux équipes (voir PLAYERS)
+    record : liste optionnelle où ajouter chaque coup joué, sous la forme (coup, réussite)
+
+    Résultat : l'état final (state.winner : 0, 1 ou None si partie nulle ; state.actions : nombre d'actions)
+    """
+    state = GameState(team1, team2, grid_size, max_turns)
+    while not state.finished:
+        move = players[state.to_move](state, rng)
+        success = state.step(move, rng)
+        if record is not None:
+            record.append((move, success))
+    return state
@@ -0,0 +1,202 @@
+"""
+Enregistrement binaire compact des parties (coups joués) et relecture rapide.
+
+Format (version 1), tous les entiers en gros-boutiste :
+  - en-tête HEADER : signature b"MR", version, taille de grille, nombre maximal de tours (2 octets),
+    nombre de morpions de chaque équipe, nombre de coups (2 octets) ;
+  - les morpions des deux équipes (équipe 1 d'abord), 4 octets chacun : hp, attack, mana, accuracy
+    (la partie est ainsi rejouable même si les morpions sont modifiés ensuite) ;
+  - les coups, 3 octets chacun (MOVE) : action (7 bits) et réussite (bit de poids fort), morpion, case ;
+    de taille fixe, le coup numéro i se lit directement à l'offset moves_offset + 3 * i ;
+  - les instants des coups : écart en millisecondes avec le coup précédent (ou le début de la partie),
+    entier variable (varint : 7 bits par octet, bit de poids fort à 1 s'il reste des octets).
+
+Une partie de 40 actions avec 2 x 7 morpions tient ainsi en moins de 300 octets.
+
+Relecture : GameReplay garde une copie de l'état tous les SNAPSHOT_INTERVAL coups (construites à la demande),
+l'état après n'importe quel coup s'obtient en rejouant au plus SNAPSHOT_INTERVAL - 1 coups depuis la copie précédente.
+"""
+
+import struct
+
+from model.game_engine import GameState, ACTION_NAMES, PLACE, ATTACK, FIREBALL, HEAL, ARMAGEDDON, PASS
+
+MAGIC = b"MR"
+VERSION = 1
+HEADER = struct.Struct(">2sBBHBBH")  # signature, version, grid_size, max_turns, taille équipe 1, taille équipe 2, nombre de coups
+PIECE = struct.Struct(">4B")  # hp, attack, mana, accuracy
+MOVE = struct.Struct(">3B")  # action | réussite << 7, morpion, case
+SUCCESS_BIT = 0x80
+SNAPSHOT_INTERVAL = 8  # nombre de coups entre deux copies de l'état pendant une relecture
+
+
+def encode_varint(value, out):
+    """
+    Ajoute l'entier positif value à out (bytearray), en varint.
+    """
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(data, offset):
+    """
+    Lit un varint de data à partir de offset.
+    Résultat : tuple (valeur, offset de la suite)
+    """
+    value = shift = 0
+    while True:
+        if offset >= len(data):
+            raise ValueError("Enregistrement de partie tronqué (instants des coups)")
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def encode_game(team1, team2, grid_size, max_turns, record, times=None):
+    """
+    Encode une partie.
+
+    team1, team2 : tuples de morpions (hp, attack, mana, accuracy) des deux équipes
+    record : liste des coups joués, sous la forme (coup, réussite) (voir game_engine.play_game)
+    times : instants des coups en millisecondes depuis le début de la partie (croissants), 0 pour tous si None
+
+    Résultat : l'enregistrement (bytes)
+    """
+    if len(record) > 0xFFFF or len(team1) > 0xFF or len(team2) > 0xFF:
+        raise ValueError("Partie trop longue ou équipes trop grandes pour le format d'enregistrement")
+    out = bytearray(HEADER.pack(MAGIC, VERSION, grid_size, max_turns, len(team1), len(team2), len(record)))
+    for piece in list(team1) + list(team2):
+        out += PIECE.pack(*piece)
+    for (action, piece, cell), success in record:
+        out += MOVE.pack(action | (SUCCESS_BIT if success else 0), piece, cell)
+    previous = 0
+    for time in times if times is not None else [0] * len(record):
+        if time < previous:
+            raise ValueError("Les instants des coups doivent être croissants")
+        encode_varint(time - previous, out)
+        previous = time
+    return bytes(out)
+
+
+def piece_number(state, piece):
+    """
+    Numéro (à partir de 1) du morpion piece dans son équipe.
+    """
+    return piece - state.owner.index(state.owner[piece]) + 1
+
+
+def describe_move(state, move, success):
+    """
+    Décrit en français le coup move joué dans l'état state (avant le coup), avec son résultat.
+    """
+    action, piece, cell = move
+    team = f"Équipe {state.owner[piece] + 1}" if action != PASS else f"Équipe {state.to_move + 1}"
+    where = f"case ({cell // state.grid_size + 1}, {cell % state.grid_size + 1})"
+    if action == PLACE:
+        return f"{team} : pose du morpion {piece_number(state, piece)} en {where}"
+    if action == PASS:
+        return f"{team} : passe son tour"
+    outcome = "réussite" if success else "échec"
+    if action in (ATTACK, FIREBALL, HEAL):
+        target = state.cells[cell]
+        return f"{team} : {ACTION_NAMES[action]} du morpion {piece_number(state, piece)} sur le morpion {piece_number(state, target)} en {where} ({outcome})"
+    if action == ARMAGEDDON:
+        return f"{team} : {ACTION_NAMES[action]} du morpion {piece_number(state, piece)} sur la {where} ({outcome})"
+    return f"{team} : action inconnue"
+
+
+class GameReplay:
+    """
+    Relecture d'une partie enregistrée par encode_game.
+
+    data : l'enregistrement (bytes, ou memoryview retournée par psycopg pour une colonne bytea)
+    Lève ValueError si l'enregistrement est invalide.
+    """
+
+    def __init__(self, data):
+        data = bytes(data)
+        if len(data) < HEADER.size:
+            raise ValueError("Enregistrement de partie tronqué (en-tête)")
+        magic, version, self.grid_size, self.max_turns, size1, size2, self.nb_moves = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Enregistrement de partie invalide (signature {magic!r}, version {version})")
+        offset = HEADER.size
+        if len(data) < offset + (size1 + size2) * PIECE.size:
+            raise ValueError("Enregistrement de partie tronqué (morpions)")
+        pieces = [PIECE.unpack_from(data, offset + i * PIECE.size) for i in range(size1 + size2)]
+        self.team1, self.team2 = tuple(pieces[:size1]), tuple(pieces[size1:])
+        self.moves_offset = offset + (size1 + size2) * PIECE.size
+        offset = self.moves_offset + self.nb_moves * MOVE.size
+        if len(data) < offset:
+            raise ValueError("Enregistrement de partie tronqué (coups)")
+        self.data = data
+        self.times = []  # instant de chaque coup en millisecondes depuis le début de la partie
+        time = 0
+        for _ in range(self.nb_moves):
+            delta, offset = decode_varint(data, offset)
+            time += delta
+            self.times.append(time)
+        for i in range(self.nb_moves):
+            (action, piece, cell), _ = self.move(i)
+            if action > PASS or piece >= size1 + size2 or cell >= self.grid_size * self.grid_size:
+                raise ValueError(f"Enregistrement de partie invalide (coup {i + 1})")
+        self.snapshots = [GameState(self.team1, self.team2, self.grid_size, self.max_turns)]
+
+    def __len__(self):
+        return self.nb_moves
+
+    def move(self, index):
+        """
+        Retourne le coup numéro index (à partir de 0), sous la forme (coup, réussite).
+        """
+        if not 0 <= index < self.nb_moves:
+            raise IndexError(f"Coup {index} hors de la partie ({self.nb_moves} coups)")
+        action, piece, cell = MOVE.unpack_from(self.data, self.moves_offset + index * MOVE.size)
+        return (action & ~SUCCESS_BIT, piece, cell), bool(action & SUCCESS_BIT)
+
+    def state_at(self, played):
+        """
+        Retourne l'état de la partie après les played premiers coups (0 : état de départ),
+        à partir de la copie d'état la plus proche (une copie indépendante, modifiable).
+        """
+        if not 0 <= played <= self.nb_moves:
+            raise IndexError(f"Coup {played} hors de la partie ({self.nb_moves} coups)")
+        while len(self.snapshots) <= played // SNAPSHOT_INTERVAL:  # copies manquantes jusqu'au coup demandé
+            start = (len(self.snapshots) - 1) * SNAPSHOT_INTERVAL
+            self.snapshots.append(self._replay(self.snapshots[-1].copy(), start, start + SNAPSHOT_INTERVAL))
+        start = played // SNAPSHOT_INTERVAL * SNAPSHOT_INTERVAL
+        return self._replay(self.snapshots[played // SNAPSHOT_INTERVAL].copy(), start, played)
+
+    def describe(self, index):
+        """
+        Décrit en français le coup numéro index (voir describe_move).
+        """
+        move, success = self.move(index)
+        return describe_move(self.state_at(index), move, success)
+
+    def history(self):
+        """
+        Décrit tous les coups de la partie en la rejouant une seule fois.
+        Résultat : liste de tuples (numéro du coup à partir de 1, description, instant en millisecondes)
+        """
+        state = self.snapshots[0].copy()
+        history = []
+        for index in range(self.nb_moves):
+            move, success = self.move(index)
+            history.append((index + 1, describe_move(state, move, success), self.times[index]))
+            state.play(move, success)
+        return history
+
+    def _replay(self, state, start, end):
+        """
+        Rejoue sur state les coups start à end - 1, et retourne state.
+        """
+        for index in range(start, end):
+            move, success = self.move(index)
+            state.play(move, success)
+        return state
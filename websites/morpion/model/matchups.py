@@ -0,0 +1,211 @@
+"""
+Probabilités de victoire entre morpions (duels) et entre équipes, estimées par simulation (Monte-Carlo)
+avec le moteur de jeu (model/game_engine.py) et conservées en base (tables matchup_morpion et matchup_team).
+
+- Duel de deux morpions : partie entre deux équipes d'un seul morpion (aucun alignement possible :
+  la partie se joue aux points de vie), chaque morpion commençant la moitié des parties.
+- Équipes : parties entre les deux compositions, chaque équipe commençant la moitié des parties.
+- Une paire n'est simulée qu'une fois par lot de MATCHUP_TRIALS parties (par défaut) ; son résultat est gardé
+  avec une empreinte des caractéristiques des deux adversaires et des paramètres de simulation (grille,
+  nombre de tours, nombre de parties). refresh_matchups ne simule que les paires absentes ou dont l'empreinte
+  a changé : après la création d'une équipe, seules ses paires sont calculées.
+- Chaque paire a sa propre graine (tirée de son empreinte) : les résultats sont reproductibles.
+- Les duels sont simulés par simulate_duels, sans le moteur de jeu : avec un seul morpion par équipe, la partie se
+  réduit à deux poses puis à une course aux points de vie (mêmes règles et même stratégie que greedy_player).
+- Un seul calcul à la fois, tous processus du serveur confondus (verrou consultatif, voir model_pg.lock_matchups) :
+  un calcul lancé pendant un autre attend sa fin, puis ne simule que les paires restantes.
+- Les simulations sont faites dans un groupe de processus séparés du serveur web (la tâche de fond ne fait
+  qu'enregistrer les résultats) ; les processus sont démarrés par spawn, le processus du serveur ayant des threads.
+
+Une partie nulle compte pour une demi-victoire dans les probabilités.
+"""
+
+import hashlib
+import random
+from multiprocessing import get_context
+
+from model.game_engine import play_game, success_probability, FIREBALL_COST, FIREBALL_DAMAGE
+from model.model_pg import get_all_morpions, get_team_compositions, get_matchup_fingerprints, save_matchups, lock_matchups, unlock_matchups
+
+MATCHUP_TRIALS = 64  # nombre de parties simulées par paire
+MATCHUP_SAVE_BATCH = 50  # nombre de paires enregistrées par transaction
+MATCHUP_MAX_TEAMS = 50  # nombre d'équipes (les plus récentes) de la matrice entre équipes : le calcul est quadratique
+MATCHUP_WORKERS = 2  # nombre de processus de simulation (1 : simulations dans le processus de la tâche)
+
+
+def fingerprint(*parts):
+    """
+    Empreinte (16 caractères hexadécimaux) d'une suite de valeurs (caractéristiques, paramètres de simulation...).
+    """
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:16]
+
+
+def simulate_matchup(team_a, team_b, grid_size, max_turns, trials, seed):
+    """
+    Simule trials parties entre deux équipes, chacune commençant une partie sur deux.
+
+    team_a, team_b : tuples de morpions (hp, attack, mana, accuracy)
+    seed : graine des parties
+
+    Résultat : tuple (victoires de team_a, victoires de team_b) ; les autres parties sont nulles
+    """
+    rng = random.Random(seed)
+    wins = [0, 0]
+    for trial in range(trials):
+        first = trial % 2  # 0 : team_a commence
+        teams = (team_a, team_b) if first == 0 else (team_b, team_a)
+        winner = play_game(teams[0], teams[1], grid_size, max_turns, rng).winner
+        if winner is not None:
+            wins[winner ^ first] += 1
+    return wins[0], wins[1]
+
+
+def simulate_duels(morpion_a, morpion_b, max_turns, trials, seed):
+    """
+    Simule trials duels entre deux morpions, chacun commençant un duel sur deux, sans le moteur de jeu.
+
+    Avec un morpion par équipe (attack et accuracy >= 1, grille d'au moins 2 x 2), greedy_player pose son morpion,
+    puis attaque à chaque action (boule de feu si elle enlève plus, bonus d'élimination compris, et que le mana suffit) :
+    la partie est une suite de tirages de réussite, jusqu'à l'élimination d'un morpion ou au dernier tour
+    (victoire aux points de vie restants, sinon partie nulle).
+
+    morpion_a, morpion_b : tuples (hp, attack, mana, accuracy)
+    seed : graine des duels
+
+    Résultat : tuple (victoires de morpion_a, victoires de morpion_b) ; les autres duels sont nuls
+    """
+    draw = random.Random(seed).random
+    last_action = 2 * max_turns
+    wins = [0, 0]
+    for trial in range(trials):
+        first = trial % 2  # 0 : morpion_a commence
+        pieces = (morpion_a, morpion_b) if first == 0 else (morpion_b, morpion_a)
+        hp = [pieces[0][0], pieces[1][0]]
+        mana = [pieces[0][2], pieces[1][2]]
+        attack = (pieces[0][1], pieces[1][1])
+        chance = (success_probability(pieces[0][3]), success_probability(pieces[1][3]))
+        winner = None
+        team, actions = 0, 2  # les deux poses sont jouées
+        while actions < last_action:
+            enemy = 1 - team
+            damage = attack[team]
+            if mana[team] >= FIREBALL_COST and FIREBALL_DAMAGE + 10 * (FIREBALL_DAMAGE >= hp[enemy]) > damage + 10 * (damage >= hp[enemy]):
+                mana[team] -= FIREBALL_COST
+                damage = FIREBALL_DAMAGE
+            actions += 1
+            if draw() < chance[team]:
+                hp[enemy] -= damage
+                if hp[enemy] <= 0:
+                    winner = team
+                    break
+            team = enemy
+        else:
+            winner = None if hp[0] == hp[1] else (0 if hp[0] > hp[1] else 1)
+        if winner is not None:
+            wins[winner ^ first] += 1
+    return wins[0], wins[1]
+
+
+def is_plain_duel(team_a, team_b, grid_size):
+    """
+    Retourne True si la partie entre team_a et team_b peut être simulée par simulate_duels.
+    """
+    return len(team_a) == len(team_b) == 1 and grid_size >= 2 and all(m[1] >= 1 and m[3] >= 1 for m in team_a + team_b)
+
+
+def simulate_pair(task):
+    """
+    Simule une paire (fonction exécutée par le groupe de processus de refresh_matchups).
+
+    task : tuple (id_a, id_b, empreinte, team_a, team_b, grid_size, max_turns, trials), l'empreinte servant de graine
+
+    Résultat : ligne à enregistrer (id_a, id_b, empreinte, trials, victoires de team_a, victoires de team_b)
+    """
+    id_a, id_b, pair_fingerprint, team_a, team_b, grid_size, max_turns, trials = task
+    if is_plain_duel(team_a, team_b, grid_size):
+        wins_a, wins_b = simulate_duels(team_a[0], team_b[0], max_turns, trials, pair_fingerprint)
+    else:
+        wins_a, wins_b = simulate_matchup(team_a, team_b, grid_size, max_turns, trials, pair_fingerprint)
+    return id_a, id_b, pair_fingerprint, trials, wins_a, wins_b
+
+
+def win_probability(wins, losses, trials):
+    """
+    Probabilité de victoire estimée (une partie nulle compte pour une demi-victoire).
+    """
+    return (wins + (trials - wins - losses) / 2) / trials if trials else 0.5
+
+
+def stale_pairs(kind, opponents, params, stored):
+    """
+    Retourne les paires à simuler : toutes les paires d'adversaires absentes de stored ou dont l'empreinte a changé.
+
+    kind : "morpion" ou "team"
+    opponents : dictionnaire {id: tuple de morpions} (un seul morpion pour un duel)
+    params : paramètres de simulation (grid_size, max_turns, trials)
+    stored : empreintes des paires déjà calculées, {(id_a, id_b): empreinte} (voir model_pg.get_matchup_fingerprints)
+
+    Résultat : liste de tuples (id_a, id_b, empreinte), avec id_a < id_b
+    """
+    keys = {key: fingerprint(kind, sorted(team)) for key, team in opponents.items()}
+    ids = sorted(opponents)
+    pairs = []
+    for i, id_a in enumerate(ids):
+        for id_b in ids[i + 1:]:
+            pair_fingerprint = fingerprint(keys[id_a], keys[id_b], *params)
+            if stored.get((id_a, id_b)) != pair_fingerprint:
+                pairs.append((id_a, id_b, pair_fingerprint))
+    return pairs
+
+
+def refresh_matchups(job, grid_size=3, max_turns=20, trials=MATCHUP_TRIALS, max_teams=MATCHUP_MAX_TEAMS, workers=MATCHUP_WORKERS):
+    """
+    Tâche de fond (SESSION['JOBS']) : met à jour les probabilités de victoire des duels de morpions
+    et des paires d'équipes (les max_teams plus récentes), en ne simulant que les paires nouvelles ou modifiées.
+    Les simulations sont faites par un groupe de workers processus, démarré seulement s'il y a des paires à simuler.
+    Le calcul attend la fin d'un éventuel autre calcul (verrou consultatif), puis lit les paires à simuler.
+
+    Résultat : dictionnaire {"morpion": nombre de paires simulées, "team": nombre de paires simulées}
+    """
+    connexion = job.connexion
+    job.progress(0, None, "Attente de la fin d'un autre calcul des probabilités de victoire")
+    if not lock_matchups(connexion):
+        raise RuntimeError("Verrou des calculs de probabilités de victoire impossible à prendre")
+    try:
+        return _refresh_matchups(job, grid_size, max_turns, trials, max_teams, workers)
+    finally:
+        unlock_matchups(connexion)
+
+
+def _refresh_matchups(job, grid_size, max_turns, trials, max_teams, workers):
+    """
+    Corps de refresh_matchups, verrou pris.
+    """
+    connexion = job.connexion
+    params = (grid_size, max_turns, trials)
+    opponents = {
+        "morpion": {m["id_morpion"]: ((m["hp"], m["attack"], m["mana"], m["accuracy"]),) for m in get_all_morpions(connexion)},
+        "team": get_team_compositions(connexion, latest=max_teams),
+    }
+    todo = {kind: stale_pairs(kind, teams, params, get_matchup_fingerprints(connexion, kind)) for kind, teams in opponents.items()}
+    total = sum(len(pairs) for pairs in todo.values())
+    if total == 0:
+        return {kind: 0 for kind in todo}
+    done = 0
+    pool = get_context("spawn").Pool(workers) if workers != 1 else None
+    try:
+        for kind, pairs in todo.items():
+            teams = opponents[kind]
+            for start in range(0, len(pairs), MATCHUP_SAVE_BATCH):
+                tasks = [(id_a, id_b, pair_fingerprint, teams[id_a], teams[id_b], grid_size, max_turns, trials)
+                         for id_a, id_b, pair_fingerprint in pairs[start:start + MATCHUP_SAVE_BATCH]]
+                rows = pool.map(simulate_pair, tasks) if pool is not None else [simulate_pair(task) for task in tasks]
+                if save_matchups(connexion, kind, rows) is None:
+                    raise RuntimeError(f"Échec de l'enregistrement des probabilités de victoire ({kind})")
+                done += len(rows)
+                job.progress(done, total, f"{done}/{total} paires simulées ({kind})")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return {kind: len(pairs) for kind, pairs in todo.items()}
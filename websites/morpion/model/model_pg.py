@@ -1,12 +1,37 @@
+import functools
 import psycopg
+from datetime import date
 from psycopg.rows import dict_row
 from psycopg import sql
 from logzero import logger
+from model.rows import compact_row_factory
+from model.game_record import GameReplay
 
 # ---------------------------------------------------------------------
 # Fonctions génériques
 # ---------------------------------------------------------------------
 
+def memoize_read(*tables):
+    """
+    Décorateur des fonctions de lecture : un appel répété avec les mêmes arguments
+    pendant la même requête HTTP renvoie le résultat déjà calculé, sans interroger la BD.
+    Le résultat est oublié dès qu'une écriture (create_team, delete_team, ...) modifie
+    une des tables lues (toutes les tables si aucune n'est indiquée).
+
+    tables : noms des tables lues par la fonction.
+    Sans effet si la connexion ne gère pas la mémoïsation (connexion.memo absent ou None).
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(connexion, *args, **kwargs):
+            memo = getattr(connexion, 'memo', None)
+            if memo is None:
+                return function(connexion, *args, **kwargs)
+            return memo.call(function, tables or None, connexion, args, kwargs)
+        return wrapper
+    return decorator
+
+
 def execute_select_query(connexion, query, params=[]):
     """
     Méthode générique pour exécuter une requête SELECT (qui peut retourner
@@ -50,16 +75,24 @@ def get_instances(connexion, nom_table):
     return execute_select_query(connexion, query)
 
 
+def count_query(nom_table):
+    """
+    Construit la requête comptant les instances de la table nom_table.
+    Résultat : objet sql.Composed (une ligne, colonne nb).
+    """
+    return sql.SQL("SELECT COUNT(*) AS nb FROM {table}").format(
+        table=sql.Identifier(nom_table),
+    )
+
+
+@memoize_read()
 def count_instances(connexion, nom_table):
     """
     Retourne le nombre d'instances de la table nom_table.
     String nom_table : nom de la table.
     Résultat : entier (0 si problème).
     """
-    query = sql.SQL("SELECT COUNT(*) AS nb FROM {table}").format(
-        table=sql.Identifier(nom_table),
-    )
-    rows = execute_select_query(connexion, query)
+    rows = execute_select_query(connexion, count_query(nom_table))
     if rows is None or len(rows) == 0:
         return 0
     # rows[0] est un tuple (nb,)
@@ -86,10 +119,154 @@ def execute_select_query_dict(connexion, query, params=None):
         logger.error(e)
     return None
 
+
+def execute_select_query_rows(connexion, query, params=None):
+    """
+    Comme execute_select_query_dict, mais avec des lignes compactes (model.rows) :
+    lisibles par nom de colonne (ligne["name"] ou ligne.name) mais non modifiables,
+    et beaucoup moins coûteuses en mémoire que des dictionnaires sur les grandes listes.
+    """
+    if params is None:
+        params = []
+    try:
+        with connexion.cursor(row_factory=compact_row_factory) as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+    except psycopg.Error as e:
+        logger.error(e)
+    return None
+
+
+def execute_select_queries_dict(connexion, queries):
+    """
+    Exécute plusieurs requêtes SELECT indépendantes et retourne tous leurs
+    résultats d'un coup (listes de dictionnaires, comme execute_select_query_dict).
+
+    queries : liste de couples (requête, paramètres).
+    Les requêtes sont envoyées ensemble en mode pipeline : un seul aller-retour
+    avec le serveur PostgreSQL au lieu d'un par requête. Si le pipeline n'est pas
+    disponible ou si une requête échoue, elles sont réexécutées une par une
+    (la requête en erreur donne None, les autres leur résultat).
+
+    Résultat : liste de résultats, dans l'ordre des requêtes.
+    """
+    if not psycopg.Pipeline.is_supported():
+        return [execute_select_query_dict(connexion, query, params) for query, params in queries]
+    cursors = []
+    try:
+        with connexion.pipeline():
+            for query, params in queries:
+                cursor = connexion.cursor(row_factory=dict_row)
+                cursor.execute(query, params)
+                cursors.append(cursor)
+        return [cursor.fetchall() for cursor in cursors]
+    except psycopg.Error as e:
+        logger.warning(f"Erreur en mode pipeline ({e}), exécution requête par requête")
+    finally:
+        for cursor in cursors:
+            cursor.close()
+    return [execute_select_query_dict(connexion, query, params) for query, params in queries]
+
 # ---------------------------------------------------------------------
 # Fonctions spécifiques au projet Morpion – Fonctionnalité 1
 # ---------------------------------------------------------------------
 
+# Requêtes de la page d'accueil, partagées entre les fonctions unitaires
+# et l'exécution groupée de get_functionality_one_stats.
+
+TOP_TEAMS_QUERY = """
+    SELECT
+        t.id_team,
+        t.name,
+        COUNT(*) AS wins
+    FROM team t
+    JOIN game g
+      ON g.winner_team_id = t.id_team
+    GROUP BY t.id_team, t.name
+    ORDER BY wins DESC, t.name ASC
+    LIMIT %s
+"""
+
+GAME_BY_DURATION_QUERY = """
+    SELECT
+        g.id_game,
+        g.started_at,
+        g.ended_at,
+        g.ended_at - g.started_at AS duration,
+        t1.id_team AS team1_id,
+        t1.name    AS team1_name,
+        t1.color   AS team1_color,
+        t2.id_team AS team2_id,
+        t2.name    AS team2_name,
+        t2.color   AS team2_color,
+        tw.id_team AS winner_id,
+        tw.name    AS winner_name,
+        tw.color   AS winner_color
+    FROM game AS g
+    JOIN team AS t1 ON t1.id_team = g.team1_id
+    JOIN team AS t2 ON t2.id_team = g.team2_id
+    LEFT JOIN team AS tw ON tw.id_team = g.winner_team_id
+    WHERE g.ended_at IS NOT NULL
+    ORDER BY duration {direction}
+    LIMIT 1
+"""
+
+AVG_LOGS_QUERY = """
+    WITH per_game_month AS (
+        SELECT
+            game_id,
+            DATE_TRUNC('month', created_at) AS month_start,
+            COUNT(*) AS nb_logs
+        FROM logs_entry
+        GROUP BY game_id, DATE_TRUNC('month', created_at)
+    )
+    SELECT
+        EXTRACT(YEAR FROM month_start)::int   AS year,
+        EXTRACT(MONTH FROM month_start)::int  AS month,
+        AVG(nb_logs)::float                   AS avg_logs
+    FROM per_game_month
+    GROUP BY year, month
+    ORDER BY year, month
+"""
+
+# Variante de AVG_LOGS_QUERY lisant le cumul par (mois, partie) tenu à jour par des triggers
+# (table logs_entry_monthly, créée par others/logs_partitions.sql) : parcours de la clé primaire
+# (month_start, game_id) au lieu du regroupement de tout le journal.
+AVG_LOGS_ROLLUP_QUERY = """
+    SELECT
+        EXTRACT(YEAR FROM month_start)::int   AS year,
+        EXTRACT(MONTH FROM month_start)::int  AS month,
+        AVG(nb_logs)::float                   AS avg_logs
+    FROM logs_entry_monthly
+    GROUP BY month_start
+    ORDER BY month_start
+"""
+
+
+def has_logs_rollup(connexion):
+    """
+    Indique si la migration others/logs_partitions.sql a été appliquée (table logs_entry_monthly présente).
+    Le résultat est mémorisé sur la connexion : la migration se fait serveur arrêté.
+    """
+    rollup = getattr(connexion, 'logs_rollup', None)
+    if rollup is None:
+        rows = execute_select_query(connexion, "SELECT to_regclass('logs_entry_monthly') IS NOT NULL")
+        rollup = bool(rows and rows[0][0])
+        try:
+            connexion.logs_rollup = rollup
+        except AttributeError:  # connexion sans attributs supplémentaires (__slots__) : pas de mémorisation
+            pass
+    return rollup
+
+
+def avg_logs_query(connexion):
+    """
+    Retourne la requête des statistiques mensuelles du journal : AVG_LOGS_ROLLUP_QUERY si le cumul
+    mensuel existe, AVG_LOGS_QUERY (regroupement de tout logs_entry) sinon.
+    """
+    return AVG_LOGS_ROLLUP_QUERY if has_logs_rollup(connexion) else AVG_LOGS_QUERY
+
+
 def get_counts_for_tables(connexion, table_names):
     """
     Retourne une liste de dictionnaires contenant le nombre de lignes
@@ -109,6 +286,7 @@ def get_counts_for_tables(connexion, table_names):
     return results
 
 
+@memoize_read("team", "game")
 def get_top_teams_by_wins(connexion, limit=3):
     """
     Top des équipes avec le plus de victoires.
@@ -123,20 +301,9 @@ def get_top_teams_by_wins(connexion, limit=3):
         ...
       ]
     """
-    query = """
-        SELECT
-            t.id_team,
-            t.name,
-            COUNT(*) AS wins
-        FROM team t
-        JOIN game g
-          ON g.winner_team_id = t.id_team
-        GROUP BY t.id_team, t.name
-        ORDER BY wins DESC, t.name ASC
-        LIMIT %s
-    """
-    return execute_select_query_dict(connexion, query, [limit]) or []
+    return execute_select_query_dict(connexion, TOP_TEAMS_QUERY, [limit]) or []
 
+@memoize_read("team", "game")
 def get_fastest_and_longest_games(connexion):
     """
     Retourne la partie la plus rapide et la plus longue avec les noms et couleurs
@@ -161,47 +328,24 @@ def get_fastest_and_longest_games(connexion):
         "winner_color": "green"
       }
     """
-    base_query = """
-        SELECT
-            g.id_game,
-            g.started_at,
-            g.ended_at,
-            g.ended_at - g.started_at AS duration,
-            t1.id_team AS team1_id,
-            t1.name    AS team1_name,
-            t1.color   AS team1_color,
-            t2.id_team AS team2_id,
-            t2.name    AS team2_name,
-            t2.color   AS team2_color,
-            tw.id_team AS winner_id,
-            tw.name    AS winner_name,
-            tw.color   AS winner_color
-        FROM game AS g
-        JOIN team AS t1 ON t1.id_team = g.team1_id
-        JOIN team AS t2 ON t2.id_team = g.team2_id
-        LEFT JOIN team AS tw ON tw.id_team = g.winner_team_id
-        WHERE g.ended_at IS NOT NULL
-        ORDER BY duration {direction}
-        LIMIT 1
-    """
-
     # Partie la plus rapide
     fastest_rows = execute_select_query_dict(
         connexion,
-        base_query.format(direction="ASC"),
+        GAME_BY_DURATION_QUERY.format(direction="ASC"),
     ) or []
     fastest = fastest_rows[0] if fastest_rows else None
 
     # Partie la plus longue
     longest_rows = execute_select_query_dict(
         connexion,
-        base_query.format(direction="DESC"),
+        GAME_BY_DURATION_QUERY.format(direction="DESC"),
     ) or []
     longest = longest_rows[0] if longest_rows else None
 
     return fastest, longest
 
 
+@memoize_read("logs_entry", "logs_entry_monthly")
 def get_avg_logs_per_month_year(connexion):
     """
     Nombre moyen de lignes de journalisation par couple (année, mois).
@@ -213,31 +357,16 @@ def get_avg_logs_per_month_year(connexion):
     Idée :
       1) Pour chaque (game_id, mois), compter nb de lignes.
       2) Moyenne de nb par (année, mois).
+    L'étape 1 est déjà faite par la table de cumul logs_entry_monthly si elle existe
+    (voir avg_logs_query).
 
-    Résultat : liste de dictionnaires
+    Résultat : liste de lignes compactes (model.rows, lisibles comme des dictionnaires)
       [
         {"year": 2025, "month": 1, "avg_logs": 3.5},
         ...
       ]
     """
-    query = """
-        WITH per_game_month AS (
-            SELECT
-                game_id,
-                DATE_TRUNC('month', created_at) AS month_start,
-                COUNT(*) AS nb_logs
-            FROM logs_entry
-            GROUP BY game_id, DATE_TRUNC('month', created_at)
-        )
-        SELECT
-            EXTRACT(YEAR FROM month_start)::int   AS year,
-            EXTRACT(MONTH FROM month_start)::int  AS month,
-            AVG(nb_logs)::float                   AS avg_logs
-        FROM per_game_month
-        GROUP BY year, month
-        ORDER BY year, month
-    """
-    return execute_select_query_dict(connexion, query) or []
+    return execute_select_query_rows(connexion, avg_logs_query(connexion)) or []
 
 
 def get_functionality_one_stats(connexion, table_names=None, top_limit=3):
@@ -252,14 +381,28 @@ def get_functionality_one_stats(connexion, table_names=None, top_limit=3):
       - top_teams : classement des équipes
       - fastest_game / longest_game : dict ou None
       - avg_logs : statistiques mensuelles de journaux
+
+    Les requêtes étant indépendantes, elles sont envoyées ensemble
+    (execute_select_queries_dict) : un seul aller-retour avec la BD.
     """
     if table_names is None:
         table_names = ["team", "morpion", "game"]
 
-    counts = get_counts_for_tables(connexion, table_names)
-    top_teams = get_top_teams_by_wins(connexion, limit=top_limit)
-    fastest, longest = get_fastest_and_longest_games(connexion)
-    avg_logs = get_avg_logs_per_month_year(connexion)
+    queries = [(count_query(name), []) for name in table_names]
+    queries += [
+        (TOP_TEAMS_QUERY, [top_limit]),
+        (GAME_BY_DURATION_QUERY.format(direction="ASC"), []),
+        (GAME_BY_DURATION_QUERY.format(direction="DESC"), []),
+        (avg_logs_query(connexion), []),
+    ]
+    results = execute_select_queries_dict(connexion, queries)
+    count_rows, (top_teams, fastest_rows, longest_rows, avg_logs) = results[:len(table_names)], results[len(table_names):]
+
+    counts = [{"table": name, "count": rows[0]["nb"] if rows else 0} for name, rows in zip(table_names, count_rows)]
+    top_teams = top_teams or []
+    fastest = fastest_rows[0] if fastest_rows else None
+    longest = longest_rows[0] if longest_rows else None
+    avg_logs = avg_logs or []
 
     return {
         "counts": counts,
@@ -273,11 +416,12 @@ def get_functionality_one_stats(connexion, table_names=None, top_limit=3):
 # Fonctions spécifiques au projet Morpion – Fonctionnalité 2
 # ---------------------------------------------------------------------
 
+@memoize_read("morpion")
 def get_all_morpions(connexion):
     """
     Retourne tous les morpions disponibles dans la base de données.
     
-    Résultat : liste de dictionnaires
+    Résultat : liste de lignes compactes (model.rows, lisibles comme des dictionnaires)
       [
         {
           "id_morpion": 1,
@@ -303,9 +447,10 @@ def get_all_morpions(connexion):
         FROM morpion
         ORDER BY name ASC
     """
-    return execute_select_query_dict(connexion, query) or []
+    return execute_select_query_rows(connexion, query) or []
 
 
+@memoize_read("team")
 def check_team_name_color_exists(connexion, name, color):
     """
     Vérifie si une équipe avec ce nom et cette couleur existe déjà.
@@ -323,6 +468,7 @@ def check_team_name_color_exists(connexion, name, color):
     return False
 
 
+@memoize_read("team")
 def check_team_color_exists(connexion, color):
     """
     Vérifie si une équipe avec cette couleur existe déjà.
@@ -397,11 +543,60 @@ def add_morpions_to_team(connexion, team_id, morpion_ids):
         return None
 
 
-def get_all_teams_with_morpions(connexion):
+# Liste des équipes : tris possibles -> (expression SQL de la colonne triée, ordre, conversion du curseur de pagination, identifiant de l'équipe)
+# Chaque tri est complété par l'identifiant de l'équipe (dans le même ordre) pour que l'ordre soit total :
+# chaque tri correspond à un index (team ou team_stats, voir morpions.sql) lu à partir du curseur.
+TEAM_SORTS = {
+    "name": ("t.name", "ASC", str, "t.id_team"),
+    "created": ("t.created_at", "DESC", date.fromisoformat, "t.id_team"),
+    "games": ("s.games_count", "DESC", int, "s.team_id"),
+    "wins": ("s.wins", "DESC", int, "s.team_id"),
+}
+
+# Nombre d'équipes par page de la liste des équipes
+TEAMS_PAGE_SIZE = 12
+
+
+def encode_team_cursor(team, sort):
     """
-    Retourne toutes les équipes avec leurs morpions.
-    
-    Résultat : liste de dictionnaires
+    Construit le curseur de pagination (paramètre GET after) désignant l'équipe team
+    pour le tri sort : "valeur triée|id_team".
+    """
+    column = TEAM_SORTS[sort][0].split('.')[-1]
+    value = team[column]
+    return f"{value.isoformat() if isinstance(value, date) else value}|{team['id_team']}"
+
+
+def decode_team_cursor(cursor, sort):
+    """
+    Décode un curseur de pagination construit par encode_team_cursor.
+    Résultat : tuple (valeur triée, id_team), ou None si le curseur est invalide.
+    """
+    value, _, id_team = (cursor or '').rpartition('|')
+    try:
+        return TEAM_SORTS[sort][2](value), int(id_team)
+    except (ValueError, KeyError):
+        return None
+
+
+@memoize_read("team", "team_morpion", "game", "team_stats")
+def get_teams_page(connexion, sort="created", color=None, has_played=None, after=None, limit=TEAMS_PAGE_SIZE):
+    """
+    Retourne une page de la liste des équipes (pagination par curseur, ou « keyset » :
+    la page suivante commence après la dernière équipe affichée, sans OFFSET, donc le
+    coût d'une page ne dépend pas de sa position dans la liste). Les nombres de parties
+    et de victoires sont lus dans team_stats (tenue à jour par triggers, créée sur une base
+    existante par la migration others/team_stats.sql) : chaque tri lit son index à partir
+    du curseur, sans compter les parties des autres équipes.
+
+    sort : clé de TEAM_SORTS (nom, date de création, nombre de parties jouées ou gagnées)
+    color : début de la couleur des équipes recherchées (optionnel, insensible à la casse)
+    has_played : True (équipes ayant joué), False (n'ayant jamais joué) ou None (toutes)
+    after : curseur de la dernière équipe de la page précédente (voir encode_team_cursor), None pour la première page
+    limit : nombre d'équipes par page
+
+    Résultat : tuple (liste de dictionnaires, curseur de la page suivante ou None s'il n'y en a pas),
+    ou (None, None) en cas d'erreur (par exemple table team_stats absente)
       [
         {
           "id_team": 1,
@@ -409,56 +604,105 @@ def get_all_teams_with_morpions(connexion):
           "color": "green",
           "created_at": date,
           "morpion_count": 4,
-          "morpions": [
-            {"id_morpion": 1, "name": "Tanky", ...},
-            ...
-          ]
+          "games_count": 12,
+          "wins": 5
         },
         ...
       ]
     """
-    query = """
+    expression, direction, _, id_column = TEAM_SORTS[sort]
+    conditions = []
+    params = {"limit": limit + 1}  # une équipe de plus pour savoir s'il y a une page suivante
+    if color:
+        conditions.append("t.color ILIKE %(color)s")
+        params["color"] = color.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    if has_played is not None:
+        conditions.append("s.games_count " + (">" if has_played else "=") + " 0")
+    if after is not None:
+        conditions.append(f"({expression}, {id_column}) {'>' if direction == 'ASC' else '<'} (%(after_value)s, %(after_id)s)")
+        params["after_value"], params["after_id"] = after
+
+    # seul le nombre de morpions est compté, pour les équipes de la page (index de team_morpion)
+    query = f"""
         SELECT
             t.id_team,
             t.name,
             t.color,
             t.created_at,
-            COUNT(tm.morpion_id) AS morpion_count
+            (SELECT COUNT(*) FROM team_morpion tm WHERE tm.team_id = t.id_team) AS morpion_count,
+            s.games_count,
+            s.wins
         FROM team t
-        LEFT JOIN team_morpion tm ON t.id_team = tm.team_id
-        GROUP BY t.id_team, t.name, t.color, t.created_at
-        ORDER BY t.created_at DESC, t.name ASC
+        JOIN team_stats s ON s.team_id = t.id_team
+        {"WHERE " + " AND ".join(conditions) if conditions else ""}
+        ORDER BY {expression} {direction}, {id_column} {direction}
+        LIMIT %(limit)s
     """
-    teams = execute_select_query_dict(connexion, query) or []
-    
-    # Pour chaque équipe, récupérer ses morpions
-    for team in teams:
-        morpions_query = """
-            SELECT
-                m.id_morpion,
-                m.name,
-                m.image_url,
-                m.hp,
-                m.attack,
-                m.mana,
-                m.accuracy
-            FROM morpion m
-            INNER JOIN team_morpion tm ON m.id_morpion = tm.morpion_id
-            WHERE tm.team_id = %s
-            ORDER BY m.name ASC
-        """
-        team['morpions'] = execute_select_query_dict(connexion, morpions_query, [team['id_team']]) or []
-    
-    return teams
+    teams = execute_select_query_dict(connexion, query, params)
+    if teams is None:
+        return None, None
+    if len(teams) > limit:
+        teams = teams[:limit]
+        return teams, encode_team_cursor(teams[-1], sort)
+    return teams, None
+
+
+@memoize_read("team")
+def get_team(connexion, team_id):
+    """
+    Retourne l'équipe team_id (dictionnaire id_team, name, color, created_at), ou None si elle n'existe pas.
+    """
+    query = "SELECT id_team, name, color, created_at FROM team WHERE id_team = %s"
+    result = execute_select_query_dict(connexion, query, [team_id])
+    return result[0] if result else None
+
+
+@memoize_read("team_morpion", "morpion")
+def get_morpions_for_teams(connexion, team_ids):
+    """
+    Retourne les morpions de plusieurs équipes en une seule requête.
+
+    team_ids : tuple des ids des équipes (par exemple celles d'une page de get_teams_page)
+
+    Résultat : dictionnaire {id_team: liste de lignes compactes (model.rows)}
+      {
+        1: [{"id_morpion": 1, "name": "Tanky", "image_url": "t1.png", "hp": 8, ...}, ...],
+        ...
+      }
+    (les équipes sans morpion sont absentes du dictionnaire)
+    """
+    if not team_ids:
+        return {}
+    query = """
+        SELECT
+            tm.team_id,
+            m.id_morpion,
+            m.name,
+            m.image_url,
+            m.hp,
+            m.attack,
+            m.mana,
+            m.accuracy
+        FROM morpion m
+        INNER JOIN team_morpion tm ON m.id_morpion = tm.morpion_id
+        WHERE tm.team_id = ANY(%s)
+        ORDER BY tm.team_id, m.name ASC
+    """
+    morpions = {}
+    for row in execute_select_query_rows(connexion, query, [list(team_ids)]) or []:
+        morpions.setdefault(row.team_id, []).append(row)
+    return morpions
 
 
-def get_games_for_team(connexion, team_id):
+@memoize_read("game", "team", "config", "game_record")
+def get_games_for_team(connexion, team_id, limit=None):
     """
     Récupère toutes les parties associées à une équipe (en tant que team1, team2 ou winner).
     
     team_id : id de l'équipe
+    limit : nombre maximal de parties retournées (les plus récentes), toutes si None
     
-    Résultat : liste de dictionnaires
+    Résultat : liste de lignes compactes (model.rows, lisibles comme des dictionnaires)
       [
         {
           "id_game": 1,
@@ -474,7 +718,8 @@ def get_games_for_team(connexion, team_id):
           "ended_at": ...,
           "config_id": 1,
           "grid_size": 3,
-          "max_turns": 20
+          "max_turns": 20,
+          "has_record": True    # partie rejouable (voir get_game_replay)
         },
         ...
       ]
@@ -494,7 +739,8 @@ def get_games_for_team(connexion, team_id):
             g.ended_at,
             g.config_id,
             c.grid_size,
-            c.max_turns
+            c.max_turns,
+            EXISTS (SELECT 1 FROM game_record r WHERE r.game_id = g.id_game) AS has_record
         FROM game g
         JOIN team t1 ON t1.id_team = g.team1_id
         JOIN team t2 ON t2.id_team = g.team2_id
@@ -502,8 +748,9 @@ def get_games_for_team(connexion, team_id):
         JOIN config c ON c.id_config = g.config_id
         WHERE g.team1_id = %s OR g.team2_id = %s
         ORDER BY g.started_at DESC
+        LIMIT %s
     """
-    return execute_select_query_dict(connexion, query, [team_id, team_id]) or []
+    return execute_select_query_rows(connexion, query, [team_id, team_id, limit]) or []
 
 
 def delete_team(connexion, team_id, delete_games=False):
@@ -517,6 +764,9 @@ def delete_team(connexion, team_id, delete_games=False):
     Retourne True si succès, False sinon.
     Note: Si delete_games=False et que l'équipe est référencée dans une partie (game),
     la suppression échouera à cause de la contrainte ON DELETE RESTRICT.
+    Pour une équipe ayant beaucoup de parties, préférer delete_team_in_chunks :
+    ici tout est supprimé (journaux compris) par une seule requête, donc une seule
+    longue transaction qui verrouille les lignes jusqu'à la fin.
     """
     try:
         cursor = connexion.cursor()
@@ -544,3 +794,441 @@ def delete_team(connexion, team_id, delete_games=False):
         logger.error(f"Erreur lors de la suppression de l'équipe: {e}")
         connexion.rollback()
         return False
+
+
+# ---------------------------------------------------------------------
+# Suppression par lots (équipes ayant beaucoup de parties et de journaux)
+# ---------------------------------------------------------------------
+
+# Nombre de lignes supprimées par transaction (journaux, puis parties)
+DELETE_CHUNK_SIZE = 5000
+
+
+def preview_team_deletion(connexion, team_id):
+    """
+    Compte ce que supprimerait delete_team(..., delete_games=True), sans rien supprimer :
+    une seule requête, qui ne parcourt que les index (game(team1_id), game(team2_id)
+    et la clé primaire de logs_entry).
+
+    team_id : id de l'équipe
+    Résultat : dictionnaire {"games": nb de parties, "logs": nb de lignes de journal,
+    "morpions": nb de morpions de l'équipe}, ou None en cas d'erreur.
+    """
+    query = """
+        WITH team_games AS (
+            SELECT id_game FROM game WHERE team1_id = %(team_id)s
+            UNION
+            SELECT id_game FROM game WHERE team2_id = %(team_id)s
+        )
+        SELECT
+            (SELECT COUNT(*) FROM team_games) AS games,
+            (SELECT COUNT(*) FROM logs_entry l JOIN team_games tg ON tg.id_game = l.game_id) AS logs,
+            (SELECT COUNT(*) FROM team_morpion WHERE team_id = %(team_id)s) AS morpions
+    """
+    result = execute_select_query_dict(connexion, query, {"team_id": team_id})
+    return result[0] if result else None
+
+
+def delete_team_in_chunks(connexion, team_id, chunk_size=DELETE_CHUNK_SIZE, progress=None):
+    """
+    Supprime une équipe, ses parties et leurs journaux par lots de chunk_size lignes,
+    chaque lot dans sa propre transaction : les verrous sont tenus le temps d'un lot
+    seulement, et les autres requêtes de l'application s'intercalent entre les lots.
+    Les journaux sont supprimés d'abord (par clé primaire (game_id, num)), puis les
+    parties (qui n'ont alors plus rien à supprimer en cascade), puis l'équipe.
+
+    Reprise après erreur : chaque lot validé est définitif et les lots suivants
+    sélectionnent ce qui reste, il suffit donc de relancer la fonction avec le même team_id.
+
+    team_id : id de l'équipe
+    chunk_size : nombre maximal de lignes supprimées par transaction
+    progress : fonction optionnelle progress(fait, total, message) appelée après chaque lot
+               (total : lignes de journal + parties comptées au départ, voir preview_team_deletion)
+
+    Résultat : dictionnaire {"games": parties supprimées, "logs": lignes de journal supprimées,
+    "team": True si l'équipe a été supprimée}, ou None en cas d'erreur.
+    """
+    preview = preview_team_deletion(connexion, team_id)
+    if preview is None:
+        return None
+    total = preview['games'] + preview['logs']
+    deleted = {"games": 0, "logs": 0, "team": False}
+
+    delete_logs_query = """
+        DELETE FROM logs_entry
+        WHERE (game_id, num) IN (
+            SELECT l.game_id, l.num
+            FROM logs_entry l
+            JOIN game g ON g.id_game = l.game_id
+            WHERE g.team1_id = %(team_id)s OR g.team2_id = %(team_id)s
+            LIMIT %(chunk_size)s
+        )
+    """
+    delete_games_query = """
+        DELETE FROM game
+        WHERE id_game IN (
+            SELECT id_game FROM game
+            WHERE team1_id = %(team_id)s OR team2_id = %(team_id)s
+            LIMIT %(chunk_size)s
+        )
+    """
+    params = {"team_id": team_id, "chunk_size": chunk_size}
+    try:
+        with connexion.cursor() as cursor:
+            for key, query, message in (("logs", delete_logs_query, "suppression des journaux"),
+                                        ("games", delete_games_query, "suppression des parties")):
+                while True:
+                    cursor.execute(query, params)
+                    connexion.commit()  # fin du lot : les verrous sont relâchés
+                    deleted[key] += cursor.rowcount
+                    if progress is not None:
+                        progress(deleted["games"] + deleted["logs"], total, message)
+                    if cursor.rowcount < chunk_size:
+                        break
+            cursor.execute("DELETE FROM team WHERE id_team = %s", [team_id])
+            connexion.commit()
+            deleted["team"] = cursor.rowcount > 0
+    except psycopg.Error as e:
+        logger.error(f"Erreur lors de la suppression par lots de l'équipe {team_id} "
+                     f"({deleted['logs']} journaux et {deleted['games']} parties déjà supprimés) : {e}")
+        connexion.rollback()
+        return None
+    logger.info(f"Équipe {team_id} supprimée par lots : {deleted['games']} parties, {deleted['logs']} lignes de journal")
+    return deleted
+
+
+# ---------------------------------------------------------------------
+# Entretien du journal partitionné (voir others/logs_partitions.sql)
+# ---------------------------------------------------------------------
+
+# Nombre de mois à venir dont la partition est créée à l'avance
+LOGS_PARTITIONS_AHEAD = 3
+
+
+def maintain_logs_partitions(connexion, retention_months=None, months_ahead=LOGS_PARTITIONS_AHEAD):
+    """
+    Entretien du journal partitionné par mois : crée les partitions du mois courant et des
+    months_ahead mois suivants (sinon les nouvelles lignes vont dans la partition par défaut),
+    puis supprime les partitions de plus de retention_months mois (aucune si None).
+    Le cumul logs_entry_monthly n'est pas modifié : les statistiques des mois supprimés restent.
+
+    Sans effet si la migration others/logs_partitions.sql n'a pas été appliquée.
+    Résultat : dictionnaire {"created": noms des partitions existantes ou créées, "dropped": nb de partitions supprimées},
+    ou None (migration absente ou erreur).
+    """
+    if not has_logs_rollup(connexion):
+        return None
+    try:
+        with connexion.cursor() as cursor:
+            cursor.execute("""
+                SELECT logs_entry_create_partition((date_trunc('month', CURRENT_DATE) + make_interval(months => n))::date)
+                FROM generate_series(0, %s) AS n
+            """, [months_ahead])
+            created = [row[0] for row in cursor.fetchall()]
+            dropped = 0
+            if retention_months:
+                cursor.execute("SELECT logs_entry_drop_partitions(%s)", [retention_months])
+                dropped = cursor.fetchone()[0]
+        connexion.commit()
+    except psycopg.Error as e:
+        logger.error(f"Erreur lors de l'entretien des partitions du journal : {e}")
+        connexion.rollback()
+        return None
+    if dropped:
+        logger.info(f"Journal : {dropped} partition(s) de plus de {retention_months} mois supprimée(s)")
+    return {"created": created, "dropped": dropped}
+
+
+# ---------------------------------------------------------------------
+# Tournois (voir model/tournament.py)
+# ---------------------------------------------------------------------
+
+def get_config(connexion, config_id):
+    """
+    Retourne la configuration config_id (dictionnaire id_config, grid_size, max_turns), ou None si elle n'existe pas.
+    """
+    result = execute_select_query_dict(connexion, "SELECT id_config, grid_size, max_turns FROM config WHERE id_config = %s", [config_id])
+    return result[0] if result else None
+
+
+def get_team_compositions(connexion, team_ids=None, latest=None):
+    """
+    Retourne la composition des équipes team_ids (toutes les équipes ayant au moins un morpion si None),
+    sous la forme utilisée par le moteur de jeu (model/game_engine.py).
+
+    latest : si indiqué, seulement les latest équipes les plus récentes (parmi team_ids)
+
+    Résultat : dictionnaire {id_team: tuple de morpions (hp, attack, mana, accuracy), triés par id_morpion}
+    """
+    conditions, params = [], []
+    if team_ids is not None:
+        conditions.append("tm.team_id = ANY(%s)")
+        params.append(list(team_ids))
+    if latest is not None:
+        conditions.append("""tm.team_id IN (SELECT id_team FROM team t
+                                            WHERE EXISTS (SELECT 1 FROM team_morpion x WHERE x.team_id = t.id_team)
+                                            ORDER BY created_at DESC, id_team DESC LIMIT %s)""")
+        params.append(latest)
+    query = """
+        SELECT tm.team_id, m.hp, m.attack, m.mana, m.accuracy
+        FROM team_morpion tm
+        JOIN morpion m ON m.id_morpion = tm.morpion_id
+        {condition}
+        ORDER BY tm.team_id, m.id_morpion
+    """.format(condition="WHERE " + " AND ".join(conditions) if conditions else "")
+    teams = {}
+    for team_id, *stats in execute_select_query(connexion, query, params) or []:
+        teams.setdefault(team_id, []).append(tuple(stats))
+    return {team_id: tuple(morpions) for team_id, morpions in teams.items()}
+
+
+def insert_games(connexion, games, records=None):
+    """
+    Enregistre des parties terminées en une seule transaction (requêtes envoyées en pipeline par executemany).
+
+    games : liste de tuples (team1_id, team2_id, config_id, started_at, ended_at, winner_team_id ou None)
+    records : liste optionnelle des enregistrements binaires des parties (voir model/game_record.py),
+              dans l'ordre de games (None pour une partie sans enregistrement)
+    Retourne la liste des id_game créés (dans l'ordre de games), ou None en cas d'erreur.
+    """
+    query = """
+        INSERT INTO game (team1_id, team2_id, config_id, started_at, ended_at, winner_team_id)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        RETURNING id_game
+    """
+    record_query = "INSERT INTO game_record (game_id, nb_moves, moves) VALUES (%s, %s, %s)"
+    if not games:
+        return []
+    try:
+        with connexion.transaction():
+            with connexion.cursor() as cursor:
+                cursor.executemany(query, games, returning=True)
+                ids = []
+                while True:
+                    ids.append(cursor.fetchone()[0])
+                    if not cursor.nextset():
+                        break
+                if records:  # enregistrements vérifiés (GameReplay lève ValueError s'ils sont invalides)
+                    cursor.executemany(record_query, [(game_id, GameReplay(record).nb_moves, record)
+                                                      for game_id, record in zip(ids, records) if record is not None])
+        return ids
+    except (psycopg.Error, ValueError) as e:
+        logger.error(f"Erreur lors de l'enregistrement de {len(games)} parties : {e}")
+        return None
+
+
+@memoize_read("game", "team", "config", "game_record")
+def get_game_replay(connexion, game_id):
+    """
+    Retourne une partie et son enregistrement binaire, pour la rejouer (voir model/game_record.py).
+
+    Résultat : dictionnaire (None si la partie n'existe pas)
+      {
+        "id_game": 1, "team1_id": 1, "team1_name": "Rouges furieux", "team1_color": "red",
+        "team2_id": 2, "team2_name": "Bleus calmes", "team2_color": "blue",
+        "winner_team_id": 1, "started_at": ..., "ended_at": ..., "grid_size": 3, "max_turns": 20,
+        "moves": b"MR..."    # None si la partie n'a pas d'enregistrement
+      }
+    """
+    query = """
+        SELECT
+            g.id_game,
+            g.team1_id,
+            t1.name AS team1_name,
+            t1.color AS team1_color,
+            g.team2_id,
+            t2.name AS team2_name,
+            t2.color AS team2_color,
+            g.winner_team_id,
+            g.started_at,
+            g.ended_at,
+            c.grid_size,
+            c.max_turns,
+            r.moves
+        FROM game g
+        JOIN team t1 ON t1.id_team = g.team1_id
+        JOIN team t2 ON t2.id_team = g.team2_id
+        JOIN config c ON c.id_config = g.config_id
+        LEFT JOIN game_record r ON r.game_id = g.id_game
+        WHERE g.id_game = %s
+    """
+    result = execute_select_query_dict(connexion, query, [game_id])
+    return result[0] if result else None
+
+
+# ---------------------------------------------------------------------
+# Suivi en direct d'une partie (notifications du canal morpion_live, voir others/morpions.sql)
+# ---------------------------------------------------------------------
+
+LIVE_LOGS_LIMIT = 200  # nombre maximal de lignes de journal envoyées à l'ouverture du suivi
+
+
+def get_game_state(connexion, game_id):
+    """
+    Retourne une partie, ses équipes et son état (non mémoïsé : l'état d'une partie en cours change).
+
+    Résultat : dictionnaire (None si la partie n'existe pas)
+      {
+        "id_game": 5, "team1_name": "Cyan stratèges", "team1_color": "cyan",
+        "team2_name": "Roses ludiques", "team2_color": "pink", "started_at": ...,
+        "ended_at": None, "winner_team_id": None, "winner_name": None
+      }
+    """
+    query = """
+        SELECT
+            g.id_game,
+            t1.name AS team1_name,
+            t1.color AS team1_color,
+            t2.name AS team2_name,
+            t2.color AS team2_color,
+            g.started_at,
+            g.ended_at,
+            g.winner_team_id,
+            w.name AS winner_name
+        FROM game g
+        JOIN team t1 ON t1.id_team = g.team1_id
+        JOIN team t2 ON t2.id_team = g.team2_id
+        LEFT JOIN team w ON w.id_team = g.winner_team_id
+        WHERE g.id_game = %s
+    """
+    result = execute_select_query_dict(connexion, query, [game_id])
+    return result[0] if result else None
+
+
+def get_game_logs(connexion, game_id, after=0, limit=LIVE_LOGS_LIMIT):
+    """
+    Retourne les dernières lignes de journal d'une partie de numéro supérieur à after
+    (les limit plus récentes), dans l'ordre des numéros (non mémoïsé).
+
+    Résultat : liste de dictionnaires {"num": 3, "created_at": ..., "message": "..."}, None en cas d'erreur
+    """
+    query = """
+        SELECT num, created_at, message
+        FROM (
+            SELECT num, created_at, message
+            FROM logs_entry
+            WHERE game_id = %s AND num > %s
+            ORDER BY num DESC
+            LIMIT %s
+        ) last_logs
+        ORDER BY num
+    """
+    return execute_select_query_dict(connexion, query, [game_id, after, limit])
+
+
+# ---------------------------------------------------------------------
+# Probabilités de victoire (voir model/matchups.py)
+# ---------------------------------------------------------------------
+
+MATCHUP_TABLES = {"morpion": ("matchup_morpion", "morpion_a", "morpion_b"), "team": ("matchup_team", "team_a", "team_b")}
+MATCHUP_LOCK = "matchups"  # nom du verrou consultatif (advisory lock) des calculs de probabilités de victoire
+
+
+def lock_matchups(connexion):
+    """
+    Attend puis prend le verrou consultatif (de session) des calculs de probabilités de victoire :
+    un seul calcul à la fois, tous processus du serveur confondus.
+
+    Retourne True si le verrou est pris, False en cas d'erreur.
+    """
+    return execute_select_query(connexion, "SELECT pg_advisory_lock(hashtext(%s))", [MATCHUP_LOCK]) is not None
+
+
+def unlock_matchups(connexion):
+    """
+    Libère le verrou pris par lock_matchups.
+    """
+    execute_select_query(connexion, "SELECT pg_advisory_unlock(hashtext(%s))", [MATCHUP_LOCK])
+
+
+def get_matchup_fingerprints(connexion, kind):
+    """
+    Retourne les empreintes des paires déjà simulées.
+
+    kind : "morpion" (duels) ou "team" (équipes)
+
+    Résultat : dictionnaire {(id_a, id_b): empreinte}, avec id_a < id_b
+    """
+    table, col_a, col_b = MATCHUP_TABLES[kind]
+    query = sql.SQL("SELECT {}, {}, fingerprint FROM {}").format(sql.Identifier(col_a), sql.Identifier(col_b), sql.Identifier(table))
+    return {(id_a, id_b): value for id_a, id_b, value in execute_select_query(connexion, query) or []}
+
+
+def save_matchups(connexion, kind, rows):
+    """
+    Enregistre (ou remplace) les résultats de paires simulées, en une transaction.
+
+    kind : "morpion" ou "team"
+    rows : liste de tuples (id_a, id_b, empreinte, parties simulées, victoires de a, victoires de b), avec id_a < id_b
+
+    Retourne le nombre de paires enregistrées, ou None en cas d'erreur.
+    """
+    table, col_a, col_b = MATCHUP_TABLES[kind]
+    query = sql.SQL("""
+        INSERT INTO {table} ({col_a}, {col_b}, fingerprint, trials, wins_a, wins_b)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON CONFLICT ({col_a}, {col_b}) DO UPDATE
+        SET fingerprint = EXCLUDED.fingerprint, trials = EXCLUDED.trials, wins_a = EXCLUDED.wins_a,
+            wins_b = EXCLUDED.wins_b, computed_at = CURRENT_TIMESTAMP
+    """).format(table=sql.Identifier(table), col_a=sql.Identifier(col_a), col_b=sql.Identifier(col_b))
+    try:
+        with connexion.transaction():
+            with connexion.cursor() as cursor:
+                cursor.executemany(query, rows)
+        return len(rows)
+    except psycopg.Error as e:
+        logger.error(f"Erreur lors de l'enregistrement de {len(rows)} probabilités de victoire ({kind}) : {e}")
+        return None
+
+
+@memoize_read("matchup_morpion")
+def get_morpion_matchups(connexion):
+    """
+    Retourne les probabilités de victoire en duel entre morpions (une partie nulle compte pour une demi-victoire).
+
+    Résultat : dictionnaire
+      {
+        "matrix": {id_a: {id_b: probabilité que id_a batte id_b, ...}, ...},
+        "strength": {id_morpion: probabilité moyenne de victoire contre les autres morpions, ...}
+      }
+    """
+    query = """
+        SELECT morpion_a, morpion_b, (wins_a + (trials - wins_a - wins_b) / 2.0) / trials
+        FROM matchup_morpion
+    """
+    matrix = {}
+    for id_a, id_b, probability in execute_select_query(connexion, query) or []:
+        matrix.setdefault(id_a, {})[id_b] = float(probability)
+        matrix.setdefault(id_b, {})[id_a] = 1.0 - float(probability)
+    strength = {morpion: sum(row.values()) / len(row) for morpion, row in matrix.items()}
+    return {"matrix": matrix, "strength": strength}
+
+
+@memoize_read("matchup_team")
+def get_team_strengths(connexion, team_ids):
+    """
+    Retourne la force estimée des équipes team_ids : probabilité moyenne de victoire contre les autres équipes
+    de la matrice (voir model/matchups.py), en une seule requête.
+
+    team_ids : tuple des ids des équipes (par exemple celles d'une page de get_teams_page)
+
+    Résultat : dictionnaire {id_team: {"strength": 0.57, "opponents": 49}}
+    (les équipes absentes de la matrice sont absentes du dictionnaire)
+    """
+    if not team_ids:
+        return {}
+    query = """
+        WITH results AS (
+            SELECT team_a AS team_id, (wins_a + (trials - wins_a - wins_b) / 2.0) / trials AS probability
+            FROM matchup_team WHERE team_a = ANY(%s)
+            UNION ALL
+            SELECT team_b, (wins_b + (trials - wins_a - wins_b) / 2.0) / trials
+            FROM matchup_team WHERE team_b = ANY(%s)
+        )
+        SELECT team_id, AVG(probability), COUNT(*)
+        FROM results
+        GROUP BY team_id
+    """
+    ids = list(team_ids)
+    return {team_id: {"strength": float(strength), "opponents": count}
+            for team_id, strength, count in execute_select_query(connexion, query, [ids, ids]) or []}
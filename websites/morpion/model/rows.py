@@ -0,0 +1,81 @@
+"""
+Représentation compacte des lignes de résultat (alternative à dict_row).
+
+Avec dict_row, chaque ligne est un dictionnaire qui contient ses propres clés :
+sur une grande liste, la mémoire est surtout occupée par ces dictionnaires.
+Ici, une ligne est un tuple (sans __dict__, grâce à __slots__ vide) et toutes les
+lignes d'un même résultat partagent une seule classe qui porte les noms de colonnes.
+
+Les lignes restent lisibles comme des dictionnaires (ligne["name"], ligne.get("name"),
+ligne.keys(), ligne.items()) et par attribut (ligne.name, utilisé dans les templates),
+mais elles ne sont pas modifiables : pour ajouter une clé, convertir avec dict(ligne.items()).
+Attention : une colonne nommée comme une méthode de tuple (count, index) n'est
+accessible que par ligne["count"].
+"""
+
+from functools import lru_cache
+from psycopg.rows import no_result
+
+
+class compact_row(tuple):
+    """
+    Ligne de résultat : tuple des valeurs, lisible par nom de colonne.
+    Les sous-classes (une par en-tête de colonnes, voir row_class) définissent _fields et _index.
+    """
+
+    __slots__ = ()
+    _fields = ()  # noms des colonnes
+    _index = {}  # nom de colonne -> position
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self._index[key])
+        return tuple.__getitem__(self, key)
+
+    def __getattr__(self, name):
+        try:
+            return tuple.__getitem__(self, self._index[name])
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __contains__(self, key):  # comme un dictionnaire : test sur les noms de colonnes
+        return key in self._index
+
+    def get(self, key, default=None):
+        index = self._index.get(key)
+        return default if index is None else tuple.__getitem__(self, index)
+
+    def keys(self):
+        return self._fields
+
+    def values(self):
+        return tuple(self)
+
+    def items(self):
+        return zip(self._fields, self)
+
+    def __repr__(self):
+        return "{" + ", ".join(f"{name!r}: {value!r}" for name, value in zip(self._fields, self)) + "}"
+
+
+@lru_cache(maxsize=128)
+def row_class(fields):
+    """
+    Retourne la classe de ligne pour un en-tête de colonnes (créée une seule fois par en-tête).
+    fields : tuple des noms de colonnes.
+    """
+    return type("compact_row", (compact_row,), {
+        "__slots__": (),
+        "_fields": fields,
+        "_index": {name: i for i, name in enumerate(fields)},
+    })
+
+
+def compact_row_factory(cursor):
+    """
+    Fabrique de lignes psycopg (à utiliser comme row_factory d'un curseur) :
+    les lignes sont des compact_row partageant la classe de leur en-tête.
+    """
+    if cursor.description is None:
+        return no_result
+    return row_class(tuple(column.name for column in cursor.description))
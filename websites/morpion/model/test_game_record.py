@@ -0,0 +1,31 @@
+import random
+import sys
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))  # site directory (package model)
+
+from model.game_engine import GameState, play_game  # noqa: E402
+from model.game_record import encode_game, GameReplay  # noqa: E402
+
+TEAM1 = ((10, 3, 4, 80), (8, 4, 2, 60), (12, 2, 6, 90))
+TEAM2 = ((9, 3, 5, 70), (11, 2, 3, 85), (7, 5, 1, 65))
+
+
+def snapshot(state):
+    return (state.hp, state.mana, state.position, state.cells, state.to_move, state.actions, state.winner, state.finished)
+
+
+def test_record_round_trip():
+    record = []
+    final = play_game(TEAM1, TEAM2, 3, 20, random.Random(7), record=record)
+    times = [100 * i for i in range(len(record))]
+    replay = GameReplay(encode_game(TEAM1, TEAM2, 3, 20, record, times))
+    assert (replay.team1, replay.team2, replay.grid_size, replay.max_turns) == (TEAM1, TEAM2, 3, 20)
+    assert [replay.move(i) for i in range(len(replay))] == record
+    assert replay.times == times
+    state = GameState(TEAM1, TEAM2, 3, 20)
+    for k in range(len(record) + 1):
+        assert snapshot(replay.state_at(k)) == snapshot(state)
+        if k < len(record):
+            state.play(*record[k])
+    assert snapshot(replay.state_at(len(record))) == snapshot(final)
@@ -0,0 +1,32 @@
+import itertools
+import sys
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))  # site directory (package model)
+
+from model.matchups import simulate_duels, simulate_matchup, simulate_pair, is_plain_duel, win_probability  # noqa: E402
+
+MORPIONS = ((5, 3, 2, 5), (8, 2, 1, 4), (3, 4, 4, 4), (4, 1, 6, 4), (6, 5, 1, 3), (2, 2, 1, 10))
+
+
+def test_sure_hits_give_the_same_results_as_the_engine():
+    sure = [(hp, attack, mana, 10) for hp, attack, mana, _ in MORPIONS]  # accuracy 10 : aucune part de hasard
+    for a, b in itertools.combinations(sure, 2):
+        for max_turns in (1, 2, 20):
+            assert simulate_duels(a, b, max_turns, 4, "seed") == simulate_matchup((a,), (b,), 3, max_turns, 4, "seed")
+
+
+def test_duel_probabilities_match_the_engine():
+    trials = 1500
+    for a, b in itertools.combinations(MORPIONS, 2):
+        fast = win_probability(*simulate_duels(a, b, 20, trials, "seed"), trials)
+        engine = win_probability(*simulate_matchup((a,), (b,), 3, 20, trials, "seed"), trials)
+        assert abs(fast - engine) < 0.06, (a, b, fast, engine)
+
+
+def test_teams_are_simulated_with_the_engine():
+    team = ((5, 3, 2, 5), (8, 2, 1, 4))
+    assert not is_plain_duel(team, ((3, 4, 4, 4),), 3)
+    assert is_plain_duel(((3, 4, 4, 4),), ((5, 3, 2, 5),), 3)
+    row = simulate_pair((1, 2, "abc", team, ((3, 4, 4, 4),), 3, 20, 8))
+    assert row[:4] == (1, 2, "abc", 8) and row[4] + row[5] <= 8
@@ -0,0 +1,192 @@
+import copy
+import re
+import sys
+from datetime import date
+from os import path
+
+import psycopg
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))  # site directory (package model)
+
+from model.model_pg import delete_team_in_chunks, get_teams_page, encode_team_cursor, decode_team_cursor, TEAM_SORTS  # noqa: E402
+
+
+class FakeDeletionDatabase:
+    """
+    Connexion simulée pour delete_team_in_chunks : parties, journaux et équipes en mémoire,
+    transactions (commit / rollback) et panne optionnelle lors de la n-ième suppression.
+    """
+
+    def __init__(self, games, logs_per_game, fail_on_delete=None):
+        self.data = {"team": {1, 2}, "game": games, "logs_entry": [(g["id_game"], num) for g in games for num in range(logs_per_game)]}
+        self.committed = copy.deepcopy(self.data)
+        self.fail_on_delete = fail_on_delete
+        self.deletes = 0
+        self.commits = 0
+
+    def cursor(self):
+        return FakeDeletionCursor(self)
+
+    def commit(self):
+        self.committed = copy.deepcopy(self.data)
+        self.commits += 1
+
+    def rollback(self):
+        self.data = copy.deepcopy(self.committed)
+
+    def team_games(self, team_id):
+        return {g["id_game"] for g in self.data["game"] if team_id in (g["team1_id"], g["team2_id"])}
+
+
+class FakeDeletionCursor:
+
+    def __init__(self, database):
+        self.database = database
+        self.rowcount = -1
+        self.row_factory = None
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params):
+        db, data = self.database, self.database.data
+        if "WITH team_games" in query:  # preview_team_deletion
+            games = db.team_games(params["team_id"])
+            self.rows = [{"games": len(games), "logs": sum(1 for game_id, _ in data["logs_entry"] if game_id in games), "morpions": 0}]
+            return
+        db.deletes += 1
+        if db.deletes == db.fail_on_delete:
+            raise psycopg.OperationalError("connexion perdue")
+        if "DELETE FROM logs_entry" in query:
+            games = db.team_games(params["team_id"])
+            chunk = [log for log in data["logs_entry"] if log[0] in games][:params["chunk_size"]]
+            data["logs_entry"] = [log for log in data["logs_entry"] if log not in chunk]
+        elif "DELETE FROM game" in query:
+            games = db.team_games(params["team_id"])
+            chunk = [g for g in data["game"] if g["id_game"] in games][:params["chunk_size"]]
+            data["game"] = [g for g in data["game"] if g not in chunk]
+        else:  # DELETE FROM team
+            chunk = [params[0]] if params[0] in data["team"] else []
+            data["team"].discard(params[0])
+        self.rowcount = len(chunk)
+
+    def fetchall(self):
+        return self.rows
+
+
+GAMES = [{"id_game": 10, "team1_id": 1, "team2_id": 2}, {"id_game": 11, "team1_id": 2, "team2_id": 1},
+         {"id_game": 12, "team1_id": 1, "team2_id": 2}, {"id_game": 13, "team1_id": 2, "team2_id": 3}]
+
+
+def test_deletion_commits_each_chunk():
+    db = FakeDeletionDatabase(GAMES, logs_per_game=5)
+    calls = []
+    deleted = delete_team_in_chunks(db, 1, chunk_size=4, progress=lambda done, total, message: calls.append((done, total)))
+    assert deleted == {"games": 3, "logs": 15, "team": True}
+    assert [g["id_game"] for g in db.committed["game"]] == [13]  # the games of the other teams are kept
+    assert all(game_id == 13 for game_id, _ in db.committed["logs_entry"])
+    assert db.commits == 4 + 1 + 1  # 4 chunks of logs (4, 4, 4, 3), 1 of games, the team
+    assert calls[-1] == (18, 18) and [done for done, _ in calls] == sorted(done for done, _ in calls)
+
+
+def test_deletion_resumes_after_a_failure():
+    db = FakeDeletionDatabase(GAMES, logs_per_game=5, fail_on_delete=3)  # the third chunk fails
+    assert delete_team_in_chunks(db, 1, chunk_size=4) is None
+    assert len(db.data["logs_entry"]) == 20 - 8  # the two chunks committed before the failure stay deleted
+    assert 1 in db.data["team"]
+    deleted = delete_team_in_chunks(db, 1, chunk_size=4)  # run again with the same team
+    assert deleted == {"games": 3, "logs": 7, "team": True}
+    assert db.committed["team"] == {2} and [g["id_game"] for g in db.committed["game"]] == [13]
+
+
+# ---------------------------------------------------------------------
+# Pagination par curseur de la liste des équipes
+# ---------------------------------------------------------------------
+
+TEAMS = [
+    {"id_team": i, "name": name, "color": color, "created_at": date(2026, 1, 1 + i // 2), "morpion_count": 6,
+     "games_count": games, "wins": games // 2}
+    for i, (name, color, games) in enumerate([("Alpha", "red", 3), ("Bravo|x", "green", 0), ("Charlie", "red", 3),
+                                              ("Delta", "blue", 5), ("Echo", "green", 3), ("Foxtrot", "red", 0),
+                                              ("Golf", "green", 5)], start=1)
+]
+
+
+class FakeTeamsDatabase:
+    """
+    Connexion simulée pour get_teams_page : évalue en mémoire le filtre, le curseur, le tri et la limite de la requête.
+    """
+
+    def __init__(self, teams):
+        self.teams = teams
+        self.queries = []
+
+    def cursor(self):
+        return FakeTeamsCursor(self)
+
+
+class FakeTeamsCursor(FakeDeletionCursor):
+
+    def execute(self, query, params):
+        self.database.queries.append((query, params))
+        expression, direction = re.search(r"ORDER BY (\S+) (ASC|DESC)", query).groups()
+        column = expression.split('.')[-1]
+        descending = direction == "DESC"
+        rows = [t for t in self.database.teams if not params.get("color") or t["color"].startswith(params["color"][:-1])]
+        if "s.games_count > 0" in query:
+            rows = [t for t in rows if t["games_count"] > 0]
+        elif "s.games_count = 0" in query:
+            rows = [t for t in rows if t["games_count"] == 0]
+        if "after_value" in params:
+            after = (params["after_value"], params["after_id"])
+            rows = [t for t in rows if ((t[column], t["id_team"]) < after if descending else (t[column], t["id_team"]) > after)]
+        rows.sort(key=lambda t: (t[column], t["id_team"]), reverse=descending)
+        self.rows = [dict(t) for t in rows[:params["limit"]]]
+
+
+def all_pages(db, sort, limit, **filters):
+    pages, after = [], None
+    while True:
+        teams, cursor = get_teams_page(db, sort, after=decode_team_cursor(after, sort) if after else None, limit=limit, **filters)
+        pages.append([t["id_team"] for t in teams])
+        if cursor is None:
+            return pages
+        after = cursor
+
+
+def test_cursor_round_trip_for_every_sort():
+    for sort in TEAM_SORTS:
+        for team in TEAMS:
+            column = TEAM_SORTS[sort][0].split('.')[-1]
+            assert decode_team_cursor(encode_team_cursor(team, sort), sort) == (team[column], team["id_team"])
+    assert decode_team_cursor("pas un curseur", "games") is None
+    assert decode_team_cursor("2026-13-01|4", "created") is None
+
+
+def test_pages_visit_every_team_once_with_ties():
+    db = FakeTeamsDatabase(TEAMS)
+    for sort in TEAM_SORTS:
+        column = TEAM_SORTS[sort][0].split('.')[-1]
+        expected = sorted(TEAMS, key=lambda t: (t[column], t["id_team"]), reverse=TEAM_SORTS[sort][1] == "DESC")
+        for limit in (1, 2, 3, 7, 10):
+            pages = all_pages(db, sort, limit)
+            assert sum(pages, []) == [t["id_team"] for t in expected], (sort, limit)
+            assert all(len(page) == limit for page in pages[:-1])
+
+
+def test_last_full_page_has_no_next_cursor():
+    db = FakeTeamsDatabase(TEAMS)
+    teams, cursor = get_teams_page(db, "name", limit=len(TEAMS))
+    assert len(teams) == len(TEAMS) and cursor is None
+    assert db.queries[-1][1]["limit"] == len(TEAMS) + 1  # one more team to know whether there is a next page
+    assert get_teams_page(FakeTeamsDatabase([]), "name") == ([], None)
+
+
+def test_filters_are_kept_across_pages():
+    db = FakeTeamsDatabase(TEAMS)
+    assert sum(all_pages(db, "wins", 1, color="gre", has_played=True), []) == [7, 5]
+    assert sum(all_pages(db, "created", 1, has_played=False), []) == [6, 2]
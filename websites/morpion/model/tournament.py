@@ -0,0 +1,231 @@
+"""
+Tournois entre équipes de morpions, joués par le moteur de jeu (model/game_engine.py).
+
+Deux formats :
+  - toutes rondes (round-robin) : chaque équipe rencontre toutes les autres (deux fois avec double=True,
+    en inversant l'équipe qui commence), calendrier calculé d'avance par la méthode du cercle ;
+  - système suisse : à chaque ronde, les équipes sont appariées selon leur classement, sans revanche
+    tant que c'est possible ; le nombre de rondes est choisi (par défaut, log2 du nombre d'équipes, arrondi au-dessus).
+
+Les parties d'une ronde sont jouées en parallèle dans un groupe de processus. Chaque partie a sa propre
+graine (graine du tournoi, ronde, numéro de partie) : les résultats ne dépendent ni du nombre de processus,
+ni de l'ordre dans lequel les parties se terminent. Les parties terminées, avec leur enregistrement binaire
+(coups joués, voir model/game_record.py), sont transmises par lots à une fonction d'enregistrement
+(par exemple model_pg.insert_games).
+"""
+
+import math
+import os
+import random
+from datetime import datetime, timedelta
+from multiprocessing import Pool
+from time import perf_counter
+
+from logzero import logger
+
+from model.game_engine import play_game
+from model.game_record import encode_game
+from model.ai_player import PLAYERS
+
+FORMATS = ("round-robin", "swiss")
+POINTS = {"win": 3, "draw": 1, "loss": 0}
+GAMES_BATCH_SIZE = 1000  # nombre de parties enregistrées par transaction
+SECONDS_PER_ACTION = 5  # durée simulée d'une action (dates de début et de fin des parties enregistrées)
+
+
+def round_robin_rounds(team_ids, double=False):
+    """
+    Calendrier toutes rondes par la méthode du cercle : avec n équipes, n - 1 rondes (n si n est impair,
+    une équipe étant alors exemptée à chaque ronde), chaque équipe jouant au plus une partie par ronde.
+    double : si True, matchs aller et retour (l'équipe qui commence est inversée au retour).
+
+    Résultat : liste de rondes, chacune étant une liste de couples (équipe qui commence, autre équipe)
+    """
+    teams = list(team_ids)
+    if len(teams) % 2:
+        teams.append(None)  # exempt
+    n = len(teams)
+    rounds = []
+    for r in range(n - 1):
+        pairs = []
+        for i in range(n // 2):
+            home, away = teams[i], teams[n - 1 - i]
+            if home is not None and away is not None:
+                pairs.append((home, away) if (r + i) % 2 == 0 else (away, home))  # alternance de l'équipe qui commence
+        rounds.append(pairs)
+        teams.insert(1, teams.pop())  # rotation autour de la première équipe, fixe
+    if double:
+        rounds += [[(away, home) for home, away in pairs] for pairs in rounds]
+    return rounds
+
+
+def swiss_pairings(standings, played):
+    """
+    Appariements d'une ronde du système suisse : les équipes sont classées (points, puis victoires, puis id),
+    et chacune rencontre la suivante dans le classement qu'elle n'a pas encore affrontée
+    (ou la suivante tout court si elle les a toutes affrontées). Avec un nombre impair d'équipes,
+    la dernière non appariée est exemptée.
+
+    standings : dictionnaire {id_team: dictionnaire des résultats (voir Tournament.standings)}
+    played : ensemble des paires déjà jouées (frozenset de deux id_team)
+
+    Résultat : liste de couples (équipe qui commence, autre équipe)
+    """
+    order = sorted(standings, key=lambda team: (-standings[team]["points"], -standings[team]["wins"], team))
+    unpaired = list(order)
+    pairs = []
+    while len(unpaired) >= 2:
+        team = unpaired.pop(0)
+        opponent = next((other for other in unpaired if frozenset((team, other)) not in played), unpaired[0])
+        unpaired.remove(opponent)
+        pairs.append((team, opponent))
+    return pairs
+
+
+def play_match(task):
+    """
+    Joue une partie (fonction exécutée dans les processus du groupe).
+
+    task : tuple (numéro de la partie, morpions de l'équipe qui commence, morpions de l'autre équipe,
+           taille de grille, nombre maximal de tours, graine, noms des stratégies des deux équipes (voir ai_player.PLAYERS))
+    Résultat : tuple (numéro de la partie, vainqueur 0, 1 ou None, nombre d'actions jouées, enregistrement de la partie)
+    """
+    match_no, team1, team2, grid_size, max_turns, seed, players = task
+    record = []
+    state = play_game(team1, team2, grid_size, max_turns, random.Random(seed), (PLAYERS[players[0]], PLAYERS[players[1]]), record)
+    times = [(i + 1) * SECONDS_PER_ACTION * 1000 for i in range(len(record))]
+    return match_no, state.winner, state.actions, encode_game(team1, team2, grid_size, max_turns, record, times)
+
+
+class Tournament:
+    """
+    Tournoi entre des équipes sur une configuration de partie.
+
+    teams : dictionnaire {id_team: tuple de morpions (hp, attack, mana, accuracy)} (voir model_pg.get_team_compositions)
+    config : dictionnaire id_config, grid_size, max_turns (voir model_pg.get_config)
+    tournament_format : "round-robin" ou "swiss"
+    rounds : nombre de rondes du système suisse (par défaut, log2 du nombre d'équipes arrondi au-dessus)
+    double : matchs aller et retour (toutes rondes)
+    seed : graine du tournoi
+    players : noms des stratégies de l'équipe qui commence et de l'autre équipe (voir ai_player.PLAYERS)
+    """
+
+    def __init__(self, teams, config, tournament_format="round-robin", rounds=None, double=False, seed=0, players=("greedy", "greedy")):
+        if tournament_format not in FORMATS:
+            raise ValueError(f"Format de tournoi inconnu : {tournament_format} (formats : {', '.join(FORMATS)})")
+        if len(teams) < 2:
+            raise ValueError("Au moins 2 équipes (avec des morpions) sont nécessaires pour un tournoi")
+        self.teams = teams
+        self.config = config
+        self.format = tournament_format
+        self.seed = seed
+        self.players = tuple(players)
+        self.standings = {team: {"team_id": team, "played": 0, "wins": 0, "draws": 0, "losses": 0, "points": 0} for team in sorted(teams)}
+        self.played = set()
+        if tournament_format == "round-robin":
+            self.schedule = round_robin_rounds(sorted(teams), double)
+            self.nb_rounds = len(self.schedule)
+        else:
+            self.schedule = None
+            self.nb_rounds = rounds or max(1, math.ceil(math.log2(len(teams))))
+
+    @property
+    def nb_games(self):
+        """
+        Nombre total de parties du tournoi.
+        """
+        if self.schedule is not None:
+            return sum(len(pairs) for pairs in self.schedule)
+        return self.nb_rounds * (len(self.teams) // 2)
+
+    def pairs(self, round_no):
+        """
+        Retourne les parties de la ronde round_no (à partir de 0) : couples (équipe qui commence, autre équipe).
+        Pour le système suisse, les rondes précédentes doivent avoir été enregistrées (record_round).
+        """
+        if self.schedule is not None:
+            return self.schedule[round_no]
+        return swiss_pairings(self.standings, self.played)
+
+    def tasks(self, round_no, pairs):
+        """
+        Retourne les tâches (voir play_match) des parties pairs de la ronde round_no.
+        """
+        grid_size, max_turns = self.config["grid_size"], self.config["max_turns"]
+        return [(match_no, self.teams[home], self.teams[away], grid_size, max_turns, f"{self.seed}-{round_no}-{match_no}", self.players)
+                for match_no, (home, away) in enumerate(pairs)]
+
+    def record_round(self, pairs, results):
+        """
+        Met à jour le classement avec les résultats d'une ronde.
+        results : liste de tuples (numéro de la partie, vainqueur 0, 1 ou None, nombre d'actions, enregistrement), dans l'ordre des parties
+        """
+        for (home, away), (_, winner, _, _) in zip(pairs, results):
+            self.played.add(frozenset((home, away)))
+            for side, team in enumerate((home, away)):
+                line = self.standings[team]
+                line["played"] += 1
+                outcome = "draw" if winner is None else ("win" if winner == side else "loss")
+                line[{"win": "wins", "draw": "draws", "loss": "losses"}[outcome]] += 1
+                line["points"] += POINTS[outcome]
+
+    def ranking(self):
+        """
+        Retourne le classement : liste des lignes de standings triées par points, victoires puis id_team.
+        """
+        return sorted(self.standings.values(), key=lambda line: (-line["points"], -line["wins"], line["team_id"]))
+
+    def run(self, workers=None, save=None, progress=None, batch_size=GAMES_BATCH_SIZE):
+        """
+        Joue toutes les rondes du tournoi.
+
+        workers : nombre de processus (par défaut, le nombre de processeurs ; 1 : pas de groupe de processus)
+        save : fonction optionnelle save(parties, enregistrements) appelée par lots d'au plus batch_size parties terminées, chaque partie
+               étant un tuple (team1_id, team2_id, config_id, started_at, ended_at, winner_team_id ou None), et enregistrements
+               la liste des enregistrements binaires des parties (voir model_pg.insert_games)
+               (si save retourne None, l'enregistrement a échoué et le tournoi est interrompu)
+        progress : fonction optionnelle progress(fait, total, message) appelée après chaque ronde (par exemple Job.progress)
+
+        Résultat : le classement final (voir ranking)
+        """
+        started = datetime.now()
+        pending = []  # parties terminées non enregistrées : couples (partie, enregistrement)
+        round_duration = timedelta(seconds=2 * self.config["max_turns"] * SECONDS_PER_ACTION)
+        pool = Pool(workers) if workers != 1 else None
+        try:
+            for round_no in range(self.nb_rounds):
+                round_started = perf_counter()
+                pairs = self.pairs(round_no)
+                tasks = self.tasks(round_no, pairs)
+                if pool is not None:
+                    chunksize = max(1, len(tasks) // (4 * (workers or os.cpu_count() or 1)))
+                    results = sorted(pool.imap_unordered(play_match, tasks, chunksize))
+                else:
+                    results = [play_match(task) for task in tasks]
+                self.record_round(pairs, results)
+                begin = started + round_no * round_duration
+                for (home, away), (_, winner, actions, record) in zip(pairs, results):
+                    pending.append(((home, away, self.config["id_config"], begin, begin + timedelta(seconds=actions * SECONDS_PER_ACTION),
+                                     None if winner is None else (home, away)[winner]), record))
+                while save is not None and len(pending) >= batch_size:
+                    self._save(save, pending[:batch_size])
+                    pending = pending[batch_size:]
+                message = f"ronde {round_no + 1}/{self.nb_rounds} : {len(pairs)} parties en {perf_counter() - round_started:.2f} s"
+                logger.info(f"Tournoi {self.format} : {message}")
+                if progress is not None:
+                    progress(round_no + 1, self.nb_rounds, message)
+            if save is not None and pending:
+                self._save(save, pending)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        return self.ranking()
+
+    @staticmethod
+    def _save(save, games):
+        """
+        Enregistre un lot de parties (couples (partie, enregistrement)) avec la fonction save, en interrompant le tournoi si elle échoue.
+        """
+        if save([game for game, _ in games], [record for _, record in games]) is None:
+            raise RuntimeError(f"Échec de l'enregistrement de {len(games)} parties : tournoi interrompu")
@@ -52,6 +52,10 @@ ALTER TABLE JOUER ADD FOREIGN KEY (numinsee) REFERENCES ACTRICES (numinsee);
 ALTER TABLE JOUER ADD FOREIGN KEY (idsaison, numéro) REFERENCES EPISODES (idsaison, numéro);
 ALTER TABLE EPISODES ADD FOREIGN KEY (idsaison) REFERENCES SAISONS (idsaison);
 
+/* Index de la page d'une série (saisons et critiques d'une série) */
+CREATE INDEX idx_saisons_nomserie ON SAISONS (nomsérie);
+CREATE INDEX idx_critiques_nomserie ON CRITIQUES (nomsérie, datecritique DESC NULLS LAST, idcritique DESC);
+
 /* Inserting instances */ 
  
 INSERT INTO SERIES VALUES('The Big Bang Theory');
@@ -1,8 +1,9 @@
-from model.model_pg import get_instances, get_episodes_for_num
+from model.model_pg import get_instances, get_episodes_for_nums
 from controleurs.includes import add_activity
 
 add_activity(SESSION['HISTORIQUE'], "affichage des données")
 
+# la page est mise en cache (voir routes.toml) : ce contrôleur n'est exécuté que si elle n'est pas en cache
 # récupérer les séries
 REQUEST_VARS['series'] = get_instances(SESSION['CONNEXION'], 'series')
 
@@ -15,7 +16,6 @@ Vous pourrez plus tard améliorer le code en affichant chaque série avec les
 critiques qui la concernent !
 """
 
-# récupérer les épisodes 1 et 2
-REQUEST_VARS['episodes1'] = get_episodes_for_num(SESSION['CONNEXION'], 1)
-REQUEST_VARS['episodes2'] = get_episodes_for_num(SESSION['CONNEXION'], 2)
-
+# récupérer les épisodes 1 et 2 (une seule requête pour les deux numéros)
+REQUEST_VARS['numeros_episodes'] = (1, 2)
+REQUEST_VARS['episodes'] = get_episodes_for_nums(SESSION['CONNEXION'], REQUEST_VARS['numeros_episodes']) or {}
@@ -1,19 +1,24 @@
-from model.model_pg import get_serie_by_name, insert_serie
-from tempfile import mkstemp
-from os.path import isfile, basename
-from controleurs.includes import add_activity
+from os.path import isfile, join
+from controleurs.includes import add_activity, write_historique
 from os import access, R_OK
 
 add_activity(SESSION['HISTORIQUE'], "consultation de l'historique")
 
-if POST and 'bouton_generer' in POST:  # formulaire soumis
-    filepath = mkstemp(suffix='.txt', dir=SESSION['DIR_HISTORIQUE'])[1]  # mkstemp retourne un tuple
-    with open(filepath, 'w') as fp:  # écriture de l'historique dans le fichier temporaire
-        for d, a in SESSION['HISTORIQUE'].items():
-            fp.write(f"{d} - {a}\n")
-    if isfile(filepath) and access(filepath, R_OK):
-        REQUEST_VARS['fichier_genere'] = basename(filepath)
+if POST and 'bouton_generer' in POST:  # formulaire soumis : génération du fichier en tâche de fond
+    job = SESSION['JOBS'].submit("Génération du fichier historique", write_historique, SESSION['DIR_HISTORIQUE'], list(SESSION['HISTORIQUE'].items()))
+    if job is not None:
+        REQUEST_VARS['job'] = job.id
+    else:
+        REQUEST_VARS['message'] = "Erreur : trop de tâches en cours, réessayez dans quelques instants."
+        REQUEST_VARS['message_class'] = "alert-error"
+elif 'job' in GET:  # retour sur la page une fois la tâche terminée
+    # état lu dans le répertoire des tâches : la tâche a pu être lancée par un autre processus du serveur
+    status = SESSION['JOBS'].status(GET['job'][0])
+    if status is not None and status['finished'] and status['error'] is None and status['result'] \
+            and isfile(join(SESSION['DIR_HISTORIQUE'], status['result'])) and access(join(SESSION['DIR_HISTORIQUE'], status['result']), R_OK):
+        REQUEST_VARS['fichier_genere'] = status['result']
+    elif status is not None and not status['finished']:
+        REQUEST_VARS['job'] = status['id']
     else:
         REQUEST_VARS['message'] = f"Erreur : le fichier d'historique n'est pas disponible."
         REQUEST_VARS['message_class'] = "alert-error"
-
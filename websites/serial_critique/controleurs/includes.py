@@ -2,11 +2,30 @@
 Ficher includes chargé avant chaque requête (ex, fonctions utilisées par différents controleurs)
 """
 
+from datetime import datetime
+from os import fdopen
+from os.path import basename
+from tempfile import mkstemp
+
+
 def add_activity(session_histo, activity):
     """
     Ajoute l'activité activity dans l'historique de session avec la date courante (comme clé)
     """
-    from datetime import datetime
     d = datetime.now()
     session_histo[d] = activity
 
+
+
+def write_historique(job, directory, activities):
+    """
+    Tâche de fond (SESSION['JOBS']) : écrit l'historique dans un nouveau fichier du répertoire directory
+    activities : liste de couples (date, activité), copiée depuis la session au moment de la demande
+    Retourne le nom du fichier généré
+    """
+    fd, filepath = mkstemp(suffix='.txt', dir=directory)  # mkstemp retourne un tuple
+    with fdopen(fd, 'w') as fp:  # écriture de l'historique dans le fichier temporaire
+        for i, (d, a) in enumerate(activities):
+            fp.write(f"{d} - {a}\n")
+            job.progress(i + 1, len(activities))
+    return basename(filepath)
@@ -0,0 +1,15 @@
+from model.model_pg import get_serie_details
+from controleurs.includes import add_activity
+
+nom_serie = REQUEST_VARS['route_params']['nom']
+add_activity(SESSION['HISTORIQUE'], f"consultation de la série {nom_serie}")
+
+# récupérer la série avec ses saisons, épisodes, casting et dernières critiques (une seule requête)
+serie = get_serie_details(SESSION['CONNEXION'], nom_serie)
+REQUEST_VARS['serie'] = serie or None
+if serie is None:  # erreur de la requête
+    REQUEST_VARS['message'] = f"Erreur lors de la récupération de la série {nom_serie}."
+    REQUEST_VARS['message_class'] = "alert-error"
+elif not serie:  # pas de série avec ce nom
+    REQUEST_VARS['message'] = f"Aucune série ne s'appelle {nom_serie}."
+    REQUEST_VARS['message_class'] = "alert-warning"
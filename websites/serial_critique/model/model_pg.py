@@ -1,3 +1,4 @@
+import functools
 import psycopg
 from psycopg import sql
 from logzero import logger
@@ -30,6 +31,23 @@ def execute_other_query(connexion, query, params=[]):
             logger.error(e)
     return None
 
+def memoize_read(*tables):
+    """
+    Décorateur mémoïsant une fonction de lecture pendant la requête HTTP en cours (connexion.memo du serveur) :
+    les appels suivants avec les mêmes arguments ne sont pas renvoyés à la BD,
+    jusqu'à une écriture (ex : insert_serie) sur une des tables indiquées (sur n'importe quelle table si aucune)
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(connexion, *args, **kwargs):
+            memo = getattr(connexion, 'memo', None)
+            if memo is None:  # connexion sans mémoïsation (ex : script hors serveur)
+                return function(connexion, *args, **kwargs)
+            return memo.call(function, tables or None, connexion, args, kwargs)
+        return wrapper
+    return decorator
+
+@memoize_read()
 def get_instances(connexion, nom_table):
     """
     Retourne les instances de la table nom_table
@@ -38,6 +56,7 @@ def get_instances(connexion, nom_table):
     query = sql.SQL('SELECT * FROM {table}').format(table=sql.Identifier(nom_table), )
     return execute_select_query(connexion, query)
 
+@memoize_read()
 def count_instances(connexion, nom_table):
     """
     Retourne le nombre d'instances de la table nom_table
@@ -46,6 +65,7 @@ def count_instances(connexion, nom_table):
     query = sql.SQL('SELECT COUNT(*) AS nb FROM {table}').format(table=sql.Identifier(nom_table))
     return execute_select_query(connexion, query)
 
+@memoize_read('episodes')
 def get_episodes_for_num(connexion, numero):
     """
     Retourne le titre des épisodes numérotés numero
@@ -54,6 +74,93 @@ def get_episodes_for_num(connexion, numero):
     query = 'SELECT titre FROM episodes where numéro=%s'
     return execute_select_query(connexion, query, [numero])
 
+@memoize_read('episodes')
+def get_episodes_for_nums(connexion, numeros):
+    """
+    Retourne le titre des épisodes de chacun des numéros de numeros, en une seule requête
+    List numeros : numéros des épisodes (ex : [1, 2])
+    Retourne un dictionnaire {numéro: liste de tuples (titre,)} (liste vide pour un numéro sans épisode), ou None
+    """
+    query = 'SELECT numéro, titre FROM episodes WHERE numéro = ANY(%s) ORDER BY numéro, idsaison'
+    result = execute_select_query(connexion, query, [list(numeros)])
+    if result is None:
+        return None
+    episodes = {numero: [] for numero in numeros}
+    for numero, titre in result:
+        episodes[numero].append((titre,))
+    return episodes
+
+SERIE_NB_CRITIQUES = 10  # nombre de critiques (les plus récentes) affichées sur la page d'une série
+
+SERIE_DETAILS_QUERY = """
+    SELECT json_build_object(
+        'nomsérie', s.nomsérie,
+        'saisons', COALESCE((
+            SELECT json_agg(json_build_object(
+                'idsaison', sa.idsaison,
+                'datelancement', sa.datelancement,
+                'episodes', COALESCE((
+                    SELECT json_agg(json_build_object(
+                        'numéro', e.numéro,
+                        'titre', e.titre,
+                        'casting', COALESCE((
+                            SELECT json_agg(json_build_object('numinsee', a.numinsee, 'nom', a.nom, 'prénom', a.prénom, 'salaire', j.salaire)
+                                            ORDER BY a.nom, a.prénom)
+                            FROM jouer j JOIN actrices a ON a.numinsee = j.numinsee
+                            WHERE j.idsaison = e.idsaison AND j.numéro = e.numéro), '[]')
+                    ) ORDER BY e.numéro)
+                    FROM episodes e
+                    WHERE e.idsaison = sa.idsaison), '[]')
+            ) ORDER BY sa.datelancement, sa.idsaison)
+            FROM saisons sa
+            WHERE sa.nomsérie = s.nomsérie), '[]'),
+        'actrices', COALESCE((
+            SELECT json_agg(json_build_object('numinsee', a.numinsee, 'nom', a.nom, 'prénom', a.prénom,
+                                              'nb_episodes', c.nb_episodes, 'salaire_total', c.salaire_total)
+                            ORDER BY c.salaire_total DESC NULLS LAST, a.nom)
+            FROM (SELECT j.numinsee, COUNT(*) AS nb_episodes, SUM(j.salaire) AS salaire_total
+                  FROM saisons sa JOIN jouer j ON j.idsaison = sa.idsaison
+                  WHERE sa.nomsérie = s.nomsérie
+                  GROUP BY j.numinsee) c
+            JOIN actrices a ON a.numinsee = c.numinsee), '[]'),
+        'critiques', COALESCE((
+            SELECT json_agg(json_build_object('idcritique', cr.idcritique, 'datecritique', cr.datecritique,
+                                              'pseudo', cr.pseudo, 'texte', cr.texte)
+                            ORDER BY cr.datecritique DESC NULLS LAST, cr.idcritique DESC)
+            FROM (SELECT * FROM critiques
+                  WHERE nomsérie = s.nomsérie
+                  ORDER BY datecritique DESC NULLS LAST, idcritique DESC
+                  LIMIT %s) cr), '[]'),
+        'nb_critiques', (SELECT COUNT(*) FROM critiques WHERE nomsérie = s.nomsérie)
+    )
+    FROM series s
+    WHERE s.nomsérie = %s
+"""
+
+@memoize_read('series', 'saisons', 'episodes', 'jouer', 'actrices', 'critiques')
+def get_serie_details(connexion, nom_serie, nb_critiques=SERIE_NB_CRITIQUES):
+    """
+    Retourne la série nom_serie avec ses saisons, leurs épisodes, le casting de chaque épisode (avec les salaires),
+    les actrices de la série (nombre d'épisodes et salaire total) et ses dernières critiques,
+    en une seule requête (objet JSON imbriqué construit par PostgreSQL), quel que soit le nombre de saisons
+    String nom_serie : nom de la série
+    Integer nb_critiques : nombre de critiques (les plus récentes) retournées
+    Retourne un dictionnaire (dates au format texte), ex :
+      {"nomsérie": "Game of Thrones",
+       "saisons": [{"idsaison": 3, "datelancement": "2011-04-17",
+                    "episodes": [{"numéro": 1, "titre": "Winter is coming",
+                                  "casting": [{"numinsee": 111, "nom": "Bean", "prénom": "Sean", "salaire": 8437}, ...]}, ...]}, ...],
+       "actrices": [{"numinsee": 111, "nom": "Bean", "prénom": "Sean", "nb_episodes": 2, "salaire_total": 8437}, ...],
+       "critiques": [{"idcritique": 2, "datecritique": "2016-11-25T15:42:06", "pseudo": "welshman", "texte": "..."}, ...],
+       "nb_critiques": 1}
+    ou {} si la série n'existe pas, None en cas d'erreur
+    """
+    result = execute_select_query(connexion, SERIE_DETAILS_QUERY, [nb_critiques, nom_serie])
+    if result is None:
+        return None
+    return result[0][0] if result else {}
+
+@memoize_read('series')
 def get_serie_by_name(connexion, nom_serie):
     """
     Retourne les informations sur la série nom_serie (utilisé pour vérifier qu'une série existe)